@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Measure the cost of inserting 50k glyph-sized regions into a TextureAtlas.
+
+No GL context is needed: the GLIR commands of the atlas are never sent. The
+first run fills a large atlas; the second run uses a small atlas that must
+evict least recently used regions to make room. The time per insert should
+stay roughly constant as the atlas fills up.
+"""
+from __future__ import division
+
+from timeit import default_timer
+
+import numpy as np
+
+from vispy.gloo import TextureAtlas
+
+
+def bench(shape, n_glyphs=50000, chunk=10000):
+    rng = np.random.RandomState(0)
+    # Glyph sizes (including SDF border) of a few font sizes
+    sizes = rng.randint(10, 28, (n_glyphs, 2))
+    live = set()
+    atlas = TextureAtlas(shape, evict=live.remove)
+    recent = []
+    n_evicted = 0
+    times = []
+    t0 = default_timer()
+    for i, (w, h) in enumerate(sizes):
+        n_live = len(live)
+        region = atlas.get_free_region(w, h)
+        assert region is not None
+        n_evicted += n_live - len(live)
+        live.add(region)
+        # Keep using a working set of recent glyphs
+        recent = recent[-99:] + [region]
+        region = recent[rng.randint(len(recent))]
+        if region in live:
+            atlas.use_region(region)
+        if (i + 1) % chunk == 0:
+            t1 = default_timer()
+            times.append((t1 - t0) / chunk)
+            t0 = t1
+    return times, n_evicted
+
+
+if __name__ == '__main__':
+    for shape in ((4096, 4096), (1024, 1024)):
+        times, n_evicted = bench(shape)
+        print('%s atlas, %i regions evicted' % (shape, n_evicted))
+        for i, t in enumerate(times):
+            print('  inserts %5i-%5i: %5.1f us per insert'
+                  % (i * 10000, (i + 1) * 10000, 1e6 * t))
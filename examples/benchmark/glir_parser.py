@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Measure the cost of flushing a small batch of GLIR commands as a function
+of the number of live GL objects known to the parser.
+
+No GL context is needed: the parser is filled with light stand-in objects,
+so that only the bookkeeping of the parser itself is measured. The time per
+flush should not depend on the number of live objects.
+"""
+from __future__ import division
+
+from timeit import default_timer
+
+from vispy.gloo.glir import GlirParser
+
+
+class StandInObject(object):
+    """ Object that accepts GLIR commands without calling GL """
+
+    def delete(self):
+        pass
+
+    def set_data(self, offset, data):
+        pass
+
+    def set_uniform(self, name, type_, value):
+        pass
+
+
+def bench(n_objects, n_flushes=1000):
+    parser = GlirParser()
+    for i in range(n_objects):
+        parser._objects[i] = StandInObject()
+    next_id = n_objects
+    t0 = default_timer()
+    for j in range(n_flushes):
+        # Create and delete a few objects, and touch a few others
+        commands = []
+        for k in range(5):
+            parser._objects[next_id] = StandInObject()
+            commands.append(('DELETE', next_id))
+            next_id += 1
+            commands.append(('DATA', k, 0, None))
+            commands.append(('UNIFORM', k, 'u_foo', 'float', 1.0))
+        parser.parse(commands)
+    return (default_timer() - t0) / n_flushes
+
+
+if __name__ == '__main__':
+    for n in (100, 1000, 10000, 50000):
+        print('%6i live objects: %7.1f us per flush' % (n, 1e6 * bench(n)))
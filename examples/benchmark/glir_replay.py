@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Replay a binary GLIR recording and report the time and bytes spent per
+type of GLIR command.
+
+Record a session by running any vispy application with
+``--vispy-glir-file=session.glirb``, then replay it without the
+application code, e.g. on a headless machine::
+
+    python glir_replay.py --vispy-backend=osmesa session.glirb
+
+Use ``--dummy`` to replay the recording with a GLIR parser whose GL calls
+do nothing. This measures the overhead of decoding the recording and
+dispatching the commands in the parser without a GL driver, and shows the
+amount of data that gets sent per command type.
+"""
+from __future__ import division
+
+import sys
+import argparse
+import itertools
+
+from vispy import app, gloo
+from vispy.gloo import gl
+from vispy.gloo.gl import BaseGLProxy, _copy_gl_functions
+from vispy.gloo.glir import GlirParser, replay_glir
+
+
+class NullProxy(BaseGLProxy):
+    """ GL functions that do nothing. Queries return values that let the
+    GlirParser continue as if all calls succeeded.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def __call__(self, funcname, returns, *args):
+        if not returns:
+            return None
+        if funcname == 'glGetProgramParameter':
+            if args[1] in (gl.GL_ACTIVE_ATTRIBUTES, gl.GL_ACTIVE_UNIFORMS):
+                return 0
+            return True
+        if funcname == 'glGetShaderParameter':
+            return True
+        if funcname == 'glGetParameter':
+            return '2.1 null' if args[0] == gl.GL_VERSION else 8192
+        if funcname == 'glGetError':
+            return gl.GL_NO_ERROR
+        if funcname == 'glCheckFramebufferStatus':
+            return gl.GL_FRAMEBUFFER_COMPLETE
+        return next(self._ids)  # object handles and variable locations
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('filename', help='the .glirb file to replay')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of times to replay the recording')
+    parser.add_argument('--dummy', action='store_true',
+                        help='replay with GL calls that do nothing')
+    args, _ = parser.parse_known_args(argv)
+
+    if args.dummy:
+        gloo.gl.use_gl('dummy')
+        _copy_gl_functions(NullProxy(), gl)
+        glir_parser = GlirParser()
+    else:
+        canvas = app.Canvas(show=False)
+        canvas.set_current()
+        glir_parser = canvas.context.shared.parser
+
+    for i in range(args.repeat):
+        stats = replay_glir(args.filename, glir_parser)
+        flush = stats.pop('FLUSH', dict(count=0, nbytes=0, time=0.))
+        print('Run %i: %i flushes, %.1f kB, %.1f ms' %
+              (i + 1, flush['count'], flush['nbytes'] / 1024.,
+               1000 * flush['time']))
+        print('  %-14s %8s %12s %10s' % ('command', 'count', 'kB', 'ms'))
+        key = lambda cmd: -(stats[cmd]['time'] or 0.)  # noqa
+        for cmd in sorted(stats, key=key):
+            s = stats[cmd]
+            time = '-' if s['time'] is None else '%.2f' % (1000 * s['time'])
+            print('  %-14s %8i %12.1f %10s' %
+                  (cmd, s['count'], s['nbytes'] / 1024., time))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
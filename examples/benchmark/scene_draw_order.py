@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Measure the cost of keeping the draw order of a scene up to date while
+nodes are added, removed and reordered, as a function of the scene size.
+
+No canvas is needed: the draw order is connected to the scene the same
+way as in SceneCanvas. Each operation is timed separately, and compared
+with generating the draw order of the whole scene again (which is what
+SceneCanvas used to do on every change). The last columns give the cost
+per operation relative to the smallest scene: the splices only touch the
+changed subtree and its siblings (whose sizes are kept fixed), so they
+should stay close to 1 while the scene grows.
+"""
+from __future__ import division
+
+from timeit import default_timer
+
+from vispy.scene.node import Node
+from vispy.scene.canvas import _DrawOrder, _subtree_draw_order
+
+
+def bench(n_nodes, n_changes=200, group_size=50):
+    # The number of groups grows with the scene, so that the changed
+    # subtrees and their siblings have the same size for all scenes
+    n_groups = n_nodes // group_size
+    root = Node()
+    draw_order = _DrawOrder(root)
+    root.events.children_change.connect(draw_order.update)
+    groups = [Node(parent=root) for i in range(n_groups)]
+    for i in range(n_nodes - n_groups):
+        Node(parent=groups[i % n_groups])
+    draw_order.order  # generate once
+    churn = [Node() for i in range(n_changes)]
+    times = {}
+
+    # Add and remove nodes (e.g. markers or labels)
+    t0 = default_timer()
+    for i, node in enumerate(churn):
+        node.parent = groups[i % n_groups]
+    times['add'] = (default_timer() - t0) / n_changes
+    t0 = default_timer()
+    for i, node in enumerate(churn):
+        node.order = i % 3 - 1
+    times['reorder'] = (default_timer() - t0) / n_changes
+    t0 = default_timer()
+    for node in churn:
+        node.parent = None
+    times['remove'] = (default_timer() - t0) / n_changes
+    assert draw_order.order == _subtree_draw_order(root)
+
+    # Full generation for comparison
+    t0 = default_timer()
+    for i in range(10):
+        _subtree_draw_order(root)
+    times['full'] = (default_timer() - t0) / 10
+    return times
+
+
+if __name__ == '__main__':
+    ops = ('add', 'remove', 'reorder')
+    print('Scene size | ' + ' | '.join('%7s (us)' % op for op in ops) +
+          ' | full (ms) | ' + ' | '.join('%7s (x)' % op for op in ops))
+    first = None
+    for n in (1000, 5000, 20000, 100000):
+        times = bench(n)
+        first = first or times
+        print('%10i | ' % n +
+              ' | '.join('%12.1f' % (1e6 * times[op]) for op in ops) +
+              ' | %9.1f | ' % (1e3 * times['full']) +
+              ' | '.join('%11.2f' % (times[op] / first[op]) for op in ops))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Measure the construction time and memory use of scene graph nodes, e.g.
+for scenes with many annotation nodes.
+
+Nodes are created as children of a few group nodes. The events, transform
+system, transform and clipper dictionary of a node are only created when
+first used; the last column shows the memory per node once they have
+been used.
+"""
+from __future__ import division
+
+import gc
+import tracemalloc
+from timeit import default_timer
+
+from vispy.scene.node import Node
+
+
+def create_nodes(n_nodes, groups):
+    return [Node(parent=groups[i % len(groups)]) for i in range(n_nodes)]
+
+
+def bench(n_nodes, n_groups=100, n_used=1000):
+    root = Node()
+    groups = [Node(parent=root) for i in range(n_groups)]
+
+    # Construction time
+    t0 = default_timer()
+    nodes = create_nodes(n_nodes, groups)
+    t_create = (default_timer() - t0) / n_nodes
+    del nodes
+    for group in groups:
+        group.parent = None
+    groups = [Node(parent=root) for i in range(n_groups)]
+    gc.collect()
+
+    # Memory of new nodes, and of (fewer) nodes whose events and transforms
+    # have been used
+    tracemalloc.start()
+    try:
+        nodes = create_nodes(n_nodes, groups)
+        mem_lazy = tracemalloc.get_traced_memory()[0] / n_nodes
+        del nodes
+        gc.collect()
+        mem0 = tracemalloc.get_traced_memory()[0]
+        nodes = create_nodes(n_used, groups)
+        for node in nodes:
+            node.events
+            node.transforms
+            node.transform
+        mem_used = (tracemalloc.get_traced_memory()[0] - mem0) / n_used
+    finally:
+        tracemalloc.stop()
+    return t_create, mem_lazy, mem_used
+
+
+if __name__ == '__main__':
+    print('    Nodes | construction | memory per node | after first use')
+    for n in (10000, 100000):
+        t_create, mem_lazy, mem_used = bench(n)
+        print('%9i | %9.1f us | %11.0f B   | %11.0f B'
+              % (n, 1e6 * t_create, mem_lazy, mem_used))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Compare the throughput of BaseTransform.map() with the bulk mapping API
+(map_bulk) when mapping many points, e.g. for hit testing or label
+placement.
+
+The bulk variants write float32 results to a new array, map a caller-owned
+float32 buffer in place, and map in place in chunks of 100k points to
+bound the size of temporary arrays.
+
+Usage: python transform_bulk_map.py [number of points]
+"""
+from __future__ import division
+
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+from vispy.visuals.transforms import (STTransform, MatrixTransform,
+                                      LogTransform, PolarTransform,
+                                      ChainTransform)
+
+
+def timed(func, *args, **kwargs):
+    t0 = default_timer()
+    func(*args, **kwargs)
+    return default_timer() - t0
+
+
+def bench(tr, pos):
+    n = len(pos)
+    buf = np.empty((n, 4), dtype=np.float32)
+    buf[:, :3] = pos
+    buf[:, 3] = 1
+    times = [
+        timed(tr.map, pos),
+        timed(tr.map_bulk, pos, dtype=np.float32),
+        timed(tr.map_bulk, buf, out=buf),
+        timed(tr.map_bulk, buf, out=buf, chunk_size=100000),
+    ]
+    return [n / t / 1e6 for t in times]
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    pos = np.random.uniform(1, 10, size=(n, 3)).astype(np.float32)
+    m = MatrixTransform()
+    m.rotate(30, (0, 0, 1))
+    st = STTransform(scale=(2, 3, 1), translate=(10, 20, 0))
+    transforms = [
+        ('STTransform', st),
+        ('MatrixTransform', m),
+        ('LogTransform', LogTransform(base=(10, 10, 0))),
+        ('PolarTransform', PolarTransform()),
+        ('ChainTransform', ChainTransform(st, PolarTransform(), m)),
+    ]
+    print('Mapping %i points (million points per second)' % n)
+    print('%-16s | %8s | %8s | %8s | %8s'
+          % ('', 'map', 'float32', 'in place', 'chunked'))
+    for name, tr in transforms:
+        print('%-16s | %8.1f | %8.1f | %8.1f | %8.1f'
+              % ((name,) + tuple(bench(tr, pos))))
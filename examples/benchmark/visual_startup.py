@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# vispy: testskip
+# -----------------------------------------------------------------------------
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Measure the time needed to create visuals of mixed types and build their
+shader programs, as happens when a scene with many visuals is first shown.
+
+No OpenGL context is required: the programs are compiled to GLSL but never
+sent to the GPU. The benchmark is run once with the GLSL parse caches
+cleared before each visual (every shader is parsed from scratch) and once
+with the caches shared by all visuals.
+
+Usage: python visual_startup.py [number of visuals]
+"""
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+from vispy import visuals
+from vispy.gloo import program as gloo_program
+from vispy.visuals.shaders import parsing
+from vispy.visuals.shaders import program as shaders_program
+from vispy.visuals.transforms import TransformSystem
+
+
+pos = np.random.normal(size=(100, 2)).astype(np.float32)
+vertices = np.random.normal(size=(30, 3)).astype(np.float32)
+faces = np.arange(30).reshape(10, 3)
+image = np.random.normal(size=(10, 10)).astype(np.float32)
+
+
+def clear_caches():
+    parsing._parse_cache.clear()
+    gloo_program._code_variables_cache.clear()
+    shaders_program._code_cache.clear()
+
+
+def build(visual):
+    for sub in getattr(visual, '_subvisuals', []):
+        build(sub)
+    if hasattr(visual, '_program'):
+        if visual._prepare_draw(view=visual) is not False:
+            visual._program.build_if_needed()
+
+
+def make_visual(i):
+    kind = i % 4
+    if kind == 0:
+        visual = visuals.MarkersVisual()
+        visual.set_data(pos, face_color=(1, 0, 0, 1))
+    elif kind == 1:
+        visual = visuals.LineVisual(pos=pos, color=(0, 1, 0, 1))
+    elif kind == 2:
+        visual = visuals.MeshVisual(vertices=vertices, faces=faces,
+                                    color='w')
+    else:
+        visual = visuals.ImageVisual(image)
+    visual.transforms = TransformSystem(None)
+    build(visual)
+    return visual
+
+
+def bench(n, cached):
+    clear_caches()
+    t0 = default_timer()
+    for i in range(n):
+        if not cached:
+            clear_caches()
+        make_visual(i)
+    return default_timer() - t0
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    make_visual(0)  # import-time work
+    print('Creating %i visuals (Markers, Line, Mesh, Image)' % n)
+    for name, cached in (('uncached', False), ('cached', True)):
+        t = bench(n, cached)
+        print('%-10s | %6.3f s | %6.3f ms per visual'
+              % (name, t, 1000 * t / n))
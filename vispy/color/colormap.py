@@ -156,6 +156,18 @@ def _glsl_step(controls=None):
     return """vec4 colormap(float t) {\n%s\n}""" % s
 
 
+# Number of colors in the lookup table of a colormap, see
+# BaseColormap.texture_lut().
+LUT_SIZE = 256
+
+# GLSL function that maps t to a color by sampling the lookup table of a
+# colormap, stored in a (1, LUT_SIZE) texture bound to $lut. The code is the
+# same for all colormaps.
+_glsl_lut = """vec4 colormap(float t) {
+    return texture2D($lut, vec2(%.8f * clamp(t, 0.0, 1.0) + %.8f, 0.5));
+}""" % ((LUT_SIZE - 1.) / LUT_SIZE, 0.5 / LUT_SIZE)
+
+
 # Mini GLSL template system for colors.
 def _process_glsl_template(template, colors):
     """Replace $color_i by color #i in the GLSL template."""
@@ -196,6 +208,15 @@ class BaseColormap(object):
     # GLSL string with a function implementing the color map.
     glsl_map = None
 
+    # GLSL string with a function implementing the color map with a lookup
+    # table texture (see texture_lut), bound to the $lut template variable.
+    glsl_lut_map = _glsl_lut
+
+    # Interpolation of the lookup table texture.
+    lut_interpolation = 'linear'
+
+    _lut = None
+
     def __init__(self, colors=None):
         # Ensure the colors are arrays.
         if colors is not None:
@@ -235,6 +256,27 @@ class BaseColormap(object):
         """
         raise NotImplementedError()
 
+    def texture_lut(self):
+        """Return the lookup table of the colormap.
+
+        Returns
+        -------
+        lut : ndarray
+            The colors at LUT_SIZE regularly spaced values in [0, 1], as a
+            float32 array of shape (LUT_SIZE, 4). The first and last colors
+            are those of 0 and 1.
+
+        Notes
+        -----
+        Visuals can use the lookup table as a texture with `glsl_lut_map`
+        instead of `glsl_map`. The shader code is then the same for all
+        colormaps.
+        """
+        if self._lut is None:
+            lut = self[np.linspace(0., 1., LUT_SIZE)].rgba
+            self._lut = lut.astype(np.float32)
+        return self._lut
+
     def __getitem__(self, item):
         if isinstance(item, tuple):
             raise ValueError('ColorArray indexing is only allowed along '
@@ -290,11 +332,13 @@ _interpolation_info = {
         'ncontrols': lambda ncolors: ncolors,  # take ncolors as argument
         'glsl_map': _glsl_mix,  # take 'controls' as argument
         'map': mix,
+        'lut_interpolation': 'linear',
     },
     'zero': {
         'ncontrols': lambda ncolors: (ncolors+1),
         'glsl_map': _glsl_step,
         'map': step,
+        'lut_interpolation': 'nearest',
     }
 }
 
@@ -358,7 +402,9 @@ class Colormap(BaseColormap):
         self._ncontrols = info['ncontrols']
         # Python map function.
         self._map_function = info['map']
+        self.lut_interpolation = info['lut_interpolation']
         self._interpolation = val
+        self._lut = None
 
     def map(self, x):
         """The Python mapping function from the [0,1] interval to a
@@ -331,6 +331,28 @@ def test_colormap():
         assert colors.rgba.max() <= 1
 
 
+def test_colormap_lut():
+    """Test the lookup tables of colormaps."""
+    from vispy.color.colormap import LUT_SIZE
+    for name in get_colormaps():
+        colormap = get_colormap(name)
+        Function(colormap.glsl_lut_map)
+        lut = colormap.texture_lut()
+        assert lut.shape == (LUT_SIZE, 4)
+        assert lut.dtype == np.float32
+        assert colormap.texture_lut() is lut
+        x = np.linspace(0., 1., LUT_SIZE)
+        assert_allclose(lut[[0, 100, -1]], colormap[x[[0, 100, -1]]].rgba,
+                        1e-6, 1e-6)
+        assert colormap.glsl_lut_map == get_colormap('grays').glsl_lut_map
+
+    cm = Colormap(['r', 'g', 'b'])
+    assert cm.lut_interpolation == 'linear'
+    cm = Colormap(['r', 'g', 'b'], interpolation='zero')
+    assert cm.lut_interpolation == 'nearest'
+    assert_array_equal(cm.texture_lut()[[0, -1]], [[1, 0, 0, 1], [0, 0, 1, 1]])
+
+
 def test_normalize():
     """Test the _normalize() function."""
     from vispy.color.colormap import _normalize
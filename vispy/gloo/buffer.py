@@ -391,13 +391,18 @@ class DataBufferView(DataBuffer):
     def offset(self):
         """ Buffer offset (in bytes) relative to base """
 
-        return self._offset
+        return self._offset + self._base.offset
 
     @property
     def base(self):
         """Buffer base if this buffer is a view on another buffer. """
         return self._base
     
+    @property
+    def divisor(self):
+        """ The attribute divisor of the base buffer """
+        return getattr(self._base, 'divisor', 0)
+    
     def resize_bytes(self, size):
         raise RuntimeError("Cannot resize buffer view.")
 
@@ -420,10 +425,28 @@ class VertexBuffer(DataBuffer):
     ----------
     data : ndarray
         Buffer data (optional)
+    divisor : int
+        The attribute divisor for instanced drawing. If zero (default),
+        the attribute advances once per vertex. Otherwise it advances
+        once per ``divisor`` instances.
     """
 
     _GLIR_TYPE = 'VertexBuffer'
 
+    def __init__(self, data=None, divisor=0):
+        divisor = int(divisor)
+        if divisor < 0:
+            raise ValueError('divisor must be >= 0, not %s' % divisor)
+        self._divisor = divisor
+        DataBuffer.__init__(self, data)
+
+    @property
+    def divisor(self):
+        """ The attribute divisor for instanced drawing (0 means that
+        the attribute advances per vertex)
+        """
+        return self._divisor
+
     def _prepare_data(self, data, convert=False):
         # Build a structured view of the data if:
         #  -> it is not already a structured array
@@ -454,6 +477,117 @@ class VertexBuffer(DataBuffer):
         return data
 
 
+# --------------------------------------------- StreamingVertexBuffer class ---
+class StreamingVertexBuffer(VertexBuffer):
+    """ Vertex buffer for data that is replaced every frame
+
+    The GPU buffer has room for ``segments`` copies of the data. Each call
+    to ``set_data`` writes into the next segment, so that the upload does
+    not have to wait for draws that still read from the previous segment.
+    When writing wraps around to the first segment, the buffer storage is
+    orphaned (reallocated), so that the driver can hand out fresh memory
+    instead of stalling. Programs that use this buffer automatically read
+    from the segment that was written last.
+
+    Parameters
+    ----------
+    data : ndarray
+        Buffer data (optional)
+    segments : int
+        The number of segments in the buffer (3 by default).
+    divisor : int
+        The attribute divisor for instanced drawing.
+    """
+
+    _GLIR_TYPE = 'StreamingVertexBuffer'
+
+    def __init__(self, data=None, segments=3, divisor=0):
+        segments = int(segments)
+        if segments < 1:
+            raise ValueError('segments must be >= 1, not %s' % segments)
+        self._segments = segments
+        self._segment = 0  # the segment that was written last
+        self._segment_nbytes = 0  # the capacity of each segment
+        VertexBuffer.__init__(self, data, divisor)
+
+    @property
+    def segments(self):
+        """ The number of segments in the buffer """
+        return self._segments
+
+    @property
+    def segment(self):
+        """ The index of the segment that was written last """
+        return self._segment
+
+    @property
+    def offset(self):
+        """ Offset (in bytes) of the current segment """
+        return self._segment * self._segment_nbytes
+
+    def set_data(self, data, copy=False, **kwargs):
+        """ Write data into the next segment (deferred operation)
+
+        Parameters
+        ----------
+        data : ndarray
+            Data to be uploaded
+        copy: bool
+            Since the operation is deferred, data may change before
+            data is actually uploaded to GPU memory.
+            Asking explicitly for a copy will prevent this behavior.
+        **kwargs : dict
+            Additional arguments.
+        """
+        data = np.array(self._prepare_data(data, **kwargs), copy=copy)
+        nbytes = data.nbytes
+        self._dtype = data.dtype
+        self._stride = data.strides[-1]
+        self._itemsize = self._dtype.itemsize
+        if nbytes > self._segment_nbytes:
+            # Grow: allocate new storage for all segments
+            self._segment_nbytes = nbytes
+            Buffer.resize_bytes(self, nbytes * self._segments)
+            self._segment = 0
+        else:
+            self._segment += 1
+            if self._segment >= self._segments:
+                # Wrap around: orphan the storage that may still be in use
+                self._glir.command('SIZE', self._id, self._nbytes)
+                self._segment = 0
+        self._size = nbytes // self._itemsize if self._itemsize else 0
+        if nbytes:
+            self._glir.command('DATA', self._id, self.offset, data)
+
+    def set_subdata(self, data, offset=0, copy=False, **kwargs):
+        """ Set a sub-region of the current segment (deferred operation).
+
+        Parameters
+        ----------
+        data : ndarray
+            Data to be uploaded
+        offset: int
+            Offset (in elements) in the current segment where to start
+            copying data.
+        copy: bool
+            Since the operation is deferred, data may change before
+            data is actually uploaded to GPU memory.
+            Asking explicitly for a copy will prevent this behavior.
+        **kwargs : dict
+            Additional keyword arguments.
+        """
+        data = np.array(self._prepare_data(data, **kwargs), copy=copy)
+        if offset < 0:
+            raise ValueError("Offset must be positive")
+        elif offset * self.itemsize + data.nbytes > self.size * self.itemsize:
+            raise ValueError("Data does not fit into segment")
+        self._glir.command('DATA', self._id,
+                           self.offset + offset * self.itemsize, data)
+
+    def resize_bytes(self, size):
+        raise RuntimeError("Cannot resize a streaming buffer, use set_data.")
+
+
 def _last_stack_str():
     """Print stack trace from call that didn't originate from here"""
     stack = extract_stack()
@@ -19,9 +19,11 @@ an OpenGL context.
 from copy import deepcopy
 import weakref
 
-from .glir import GlirQueue, BaseGlirParser, GlirParser, glir_logger
+from .glir import (GlirQueue, BaseGlirParser, GlirParser, glir_logger,
+                   glir_recorder)
 from .wrappers import BaseGlooFunctions
 from .. import config
+from ..ext.six import string_types
 
 _default_dict = dict(red_size=8, green_size=8, blue_size=8, alpha_size=8,
                      depth_size=24, stencil_size=0, double_buffer=True,
@@ -85,6 +87,15 @@ def forget_canvas(canvas):
     canvasses[:] = [weakref.ref(c) for c in cc]
 
 
+def _is_binary_glir_file(glir_file):
+    """ Whether GLIR commands should be recorded in the binary format,
+    i.e. for filenames ending with .glirb and files opened in binary mode.
+    """
+    if isinstance(glir_file, string_types):
+        return glir_file.endswith('.glirb')
+    return 'b' in getattr(glir_file, 'mode', '')
+
+
 class GLContext(BaseGlooFunctions):
     """An object encapsulating data necessary for a OpenGL context
 
@@ -103,6 +114,8 @@ class GLContext(BaseGlooFunctions):
         self._glir = GlirQueue()
         self._do_CURRENT_command = False  # flag that CURRENT cmd must be given
         self._last_viewport = None
+        self._gl_state = {}  # GL state that was set via the gloo functions
+        self._premultiplied_alpha = False
 
     def __repr__(self):
         return "<GLContext at 0x%x>" % id(self)
@@ -151,6 +164,24 @@ class GLContext(BaseGlooFunctions):
         """
         return self._shared
 
+    @property
+    def premultiplied_alpha(self):
+        """ Whether blending keeps premultiplied colors in the framebuffer
+
+        When True, ``set_blend_func`` calls without alpha factors use
+        alpha factors that make the alpha of the framebuffer the fraction
+        of the background that is covered, for the destination color
+        factors 'one_minus_src_alpha' and 'one'. The result can then be
+        drawn over another image with ``('one', 'one_minus_src_alpha')``
+        to get the same colors as drawing directly on that image. This is
+        meant for rendering to a transparent framebuffer. Default False.
+        """
+        return self._premultiplied_alpha
+
+    @premultiplied_alpha.setter
+    def premultiplied_alpha(self, value):
+        self._premultiplied_alpha = bool(value)
+
     @property
     def capabilities(self):
         """ The OpenGL capabilities
@@ -198,7 +229,10 @@ class GLShared(object):
 
         parser_cls = GlirParser
         if glir_file:
-            parser_cls = glir_logger(parser_cls, glir_file)
+            if _is_binary_glir_file(glir_file):
+                parser_cls = glir_recorder(parser_cls, glir_file)
+            else:
+                parser_cls = glir_logger(parser_cls, glir_file)
 
         self._parser = parser_cls()
         self._name = None
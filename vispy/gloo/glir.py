@@ -11,14 +11,18 @@ Implementation to execute GL Intermediate Representation (GLIR)
 import os
 import sys
 import re
+import ast
 import json
+import struct
 import weakref
+from timeit import default_timer
 from distutils.version import LooseVersion
 
 import numpy as np
 
 from . import gl
 from ..ext.six import string_types
+from ..ext.ordereddict import OrderedDict
 from ..util import logger
 
 # TODO: expose these via an extension space in .gl?
@@ -54,6 +58,11 @@ _internalformats = dict([(enum.name, enum) for enum in _internalformats])
 # gets deleted, A gets bound to B.
 JUST_DELETED = 'JUST_DELETED'
 
+# Number of converted shaders kept per queue, and number of linked programs
+# without users that a parser keeps for reuse
+CONVERTED_SHADERS_CACHE_SIZE = 256
+IDLE_PROGRAMS_CACHE_SIZE = 32
+
 
 def as_enum(enum):
     """ Turn a possibly string enum into an integer enum.
@@ -93,6 +102,10 @@ class _GlirQueueShare(object):
         self._verbose = False
         # queues that have been merged with this one
         self._associations = weakref.WeakKeyDictionary({queue: None})
+        # number of DATA commands and bytes saved by coalescing
+        self._coalesce_stats = dict(calls=0, bytes=0)
+        # recently converted shaders: {(convert, shaders): converted shaders}
+        self._converted_shaders = OrderedDict()
     
     def command(self, *args):
         """ Send a command. See the command spec at:
@@ -163,10 +176,161 @@ class _GlirQueueShare(object):
             elif command[0] == 'SIZE':
                 resized.add(command[1])
             commands2.append(command)
-        return list(reversed(commands2))
+        return self._coalesce(list(reversed(commands2)))
+
+    def _coalesce(self, commands):
+        """ Merge DATA commands that write to overlapping or adjacent
+        regions of the same object into a single DATA command. Bytes that
+        are overwritten by a later DATA command are dropped. Commands that
+        may read the data (e.g. DRAW) act as a barrier.
+        """
+        out = []
+        pending = {}  # id -> list of _DataRegion, in order of arrival
+
+        def flush_pending(id_=None):
+            ids = list(pending.keys()) if id_ is None else [id_]
+            for i in ids:
+                for region in pending.pop(i, ()):
+                    out[region.index] = region.command()
+
+        for command in commands:
+            cmd = command[0]
+            if cmd == 'DATA' and len(command) == 4 and \
+                    isinstance(command[3], np.ndarray):
+                id_ = command[1]
+                region = _DataRegion(len(out), command)
+                regions = pending.get(id_, [])
+                # A partial overlap that cannot be merged means that the
+                # order of the uploads matters, so we emit what we have
+                for other in regions:
+                    if region.intersects(other) and not (
+                            region.covers(other) or region.touches(other)):
+                        flush_pending(id_)
+                        regions = []
+                        break
+                # Drop regions that the new region completely overwrites,
+                # merge with regions that it touches
+                keep = []
+                for other in regions:
+                    if region.covers(other):
+                        self._count_saved(other.nbytes)
+                        out[other.index] = None
+                    elif region.touches(other):
+                        nbytes = region.nbytes + other.nbytes
+                        out[other.index] = None
+                        region = other.merge(region, len(out))
+                        self._count_saved(nbytes - region.nbytes)
+                    else:
+                        keep.append(other)
+                keep.append(region)
+                pending[id_] = keep
+                out.append(None)  # placeholder, filled in on flush
+            else:
+                if cmd in _DATA_BARRIERS or cmd not in _GLIR_COMMANDS:
+                    flush_pending()
+                elif command[1] in pending:
+                    flush_pending(command[1])
+                out.append(command)
+        flush_pending()
+        return [command for command in out if command is not None]
+
+    def _count_saved(self, nbytes):
+        # Each merge or drop saves exactly one DATA command
+        self._coalesce_stats['bytes'] += nbytes
+        self._coalesce_stats['calls'] += 1
 
     def _convert_shaders(self, convert, shaders):
-        return convert_shaders(convert, shaders)
+        key = (convert, tuple(shaders))
+        converted = self._converted_shaders.pop(key, None)
+        if converted is None:
+            converted = convert_shaders(convert, shaders)
+            if len(self._converted_shaders) >= CONVERTED_SHADERS_CACHE_SIZE:
+                self._converted_shaders.popitem(last=False)
+        self._converted_shaders[key] = converted
+        return converted
+
+
+# All GLIR commands, and those that may read data that is pending in DATA
+# commands of another object (i.e. act as a barrier for coalescing)
+_GLIR_COMMANDS = ('CURRENT', 'FUNC', 'CREATE', 'DELETE', 'DRAW', 'TEXTURE',
+                  'UNIFORM', 'ATTRIBUTE', 'DATA', 'SIZE', 'ATTACH',
+                  'FRAMEBUFFER', 'SHADERS', 'WRAPPING', 'INTERPOLATION')
+_DATA_BARRIERS = ('CURRENT', 'FUNC', 'DRAW', 'ATTACH', 'FRAMEBUFFER')
+
+
+class _DataRegion(object):
+    """ Region of a buffer or texture written by one or more DATA commands.
+
+    For buffers, the offset is in bytes and the data is handled as bytes.
+    For textures, regions can only be merged along the first axis, and
+    only if they span the same range along the other axes.
+    """
+
+    def __init__(self, index, command):
+        self.index = index  # position in the output command list
+        self._command = command
+        _, self._id, offset, data = command
+        self.is_buffer = not isinstance(offset, (tuple, list))
+        if self.is_buffer:
+            self.data = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+            self.start = (int(offset),)
+        else:
+            self.data = data
+            self.start = tuple(int(o) for o in offset)
+        self.stop = tuple(o + s for o, s in zip(self.start, self.data.shape))
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def _compatible(self, other):
+        return (self.is_buffer == other.is_buffer and
+                len(self.start) == len(other.start) and
+                self.data.dtype == other.data.dtype and
+                self.data.shape[len(self.start):] ==
+                other.data.shape[len(other.start):])
+
+    def intersects(self, other):
+        """ Whether this region and the other region share any elements.
+        """
+        return (self.is_buffer == other.is_buffer and
+                len(self.start) == len(other.start) and
+                all(a < d and c < b for a, b, c, d in
+                    zip(self.start, self.stop, other.start, other.stop)))
+
+    def covers(self, other):
+        """ Whether this region completely overwrites the other region.
+        """
+        return (self.is_buffer == other.is_buffer and
+                len(self.start) == len(other.start) and
+                all(a <= b for a, b in zip(self.start, other.start)) and
+                all(a >= b for a, b in zip(self.stop, other.stop)))
+
+    def touches(self, other):
+        """ Whether this region overlaps with or is adjacent to the other
+        region, such that the union is again a single region.
+        """
+        return (self._compatible(other) and
+                self.start[1:] == other.start[1:] and
+                self.stop[1:] == other.stop[1:] and
+                self.start[0] <= other.stop[0] and
+                other.start[0] <= self.stop[0])
+
+    def merge(self, other, index):
+        """ Return a region that is the union of this region and a later
+        region. Data of the later region takes precedence.
+        """
+        start = min(self.start[0], other.start[0])
+        stop = max(self.stop[0], other.stop[0])
+        data = np.empty((stop - start,) + self.data.shape[1:],
+                        self.data.dtype)
+        for region in (self, other):
+            data[region.start[0] - start:region.stop[0] - start] = region.data
+        offset = start if self.is_buffer else (start,) + self.start[1:]
+        return _DataRegion(index, ('DATA', self._id, offset, data))
+
+    def command(self):
+        return self._command
 
 
 class GlirQueue(object):
@@ -230,6 +394,13 @@ class GlirQueue(object):
         """ Flush all current commands to the GLIR interpreter.
         """
         self._shared.flush(parser)
+
+    @property
+    def coalesce_stats(self):
+        """ Dict with the number of DATA commands ('calls') and bytes
+        ('bytes') that were saved by merging DATA commands upon flushing.
+        """
+        return dict(self._shared._coalesce_stats)
     
         
 def convert_shaders(convert, shaders):
@@ -348,9 +519,27 @@ class GlirParser(BaseGlirParser):
         super(GlirParser, self).__init__()
         self._objects = {}
         self._invalid_objects = set()
+        # Ids of objects deleted in the current parsing round; they map to
+        # JUST_DELETED in self._objects until the next round.
+        self._just_deleted = set()
+
+        # Number of GL calls that GLIR objects skipped because the value
+        # to set was equal to what was set before
+        self.skipped_calls = dict(uniform=0, attribute=0, texture=0)
+
+        # Linked GL programs, shared by all programs with the same source:
+        # {(vert, frag): _LinkedProgram}. Linked programs without users are
+        # kept in _idle_programs (least recently used first) until evicted,
+        # so that switching back to a previous source does not relink.
+        self._linked_programs = {}
+        self._idle_programs = OrderedDict()
+        # Compiled shader objects, shared by the linked programs that use
+        # them: {(type, code): _CompiledShader}
+        self._compiled_shaders = {}
 
         self._classmap = {'Program': GlirProgram,
                           'VertexBuffer': GlirVertexBuffer,
+                          'StreamingVertexBuffer': GlirStreamingVertexBuffer,
                           'IndexBuffer': GlirIndexBuffer,
                           'Texture1D': GlirTexture1D,
                           'Texture2D': GlirTexture2D,
@@ -359,12 +548,35 @@ class GlirParser(BaseGlirParser):
                           'FrameBuffer': GlirFrameBuffer,
                           }
 
+        # Commands that are handled by the parser itself
+        self._parser_commands = {'CURRENT': self._parse_current,
+                                 'FUNC': self._parse_func,
+                                 'CREATE': self._parse_create,
+                                 'DELETE': self._parse_delete,
+                                 }
+
         # We keep a dict that the GLIR objects use for storing
         # per-context information. This dict is cleared each time
         # that the context is made current. This seems necessary for
         # when two Canvases share a context.
         self.env = {}
 
+    # Commands that are handled by a GLIR object, and the method to call
+    _object_commands = {'DRAW': 'draw',  # Program
+                        'TEXTURE': 'set_texture',  # Program
+                        'UNIFORM': 'set_uniform',  # Program
+                        'ATTRIBUTE': 'set_attribute',  # Program
+                        'DATA': 'set_data',  # VertexBuffer, IndexBuffer,
+                                             # Texture
+                        'SIZE': 'set_size',  # VertexBuffer, IndexBuffer,
+                                             # Texture, RenderBuffer
+                        'ATTACH': 'attach',  # FrameBuffer
+                        'FRAMEBUFFER': 'set_framebuffer',  # FrameBuffer
+                        'SHADERS': 'set_shaders',  # Program
+                        'WRAPPING': 'set_wrapping',  # Texture
+                        'INTERPOLATION': 'set_interpolation',  # Texture
+                        }
+
     def is_remote(self):
         return False
     
@@ -374,72 +586,60 @@ class GlirParser(BaseGlirParser):
         else:
             return 'desktop'
 
+    def _parse_current(self, id_, args):
+        # This context is made current
+        self.env.clear()
+        self._gl_initialize()
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+
+    def _parse_func(self, id_, args):
+        # GL function call
+        args = [as_enum(a) for a in args]
+        try:
+            getattr(gl, id_)(*args)
+        except AttributeError:
+            logger.warning('Invalid gl command: %r' % id_)
+
+    def _parse_create(self, id_, args):
+        # Creating an object
+        if args[0] is not None:
+            klass = self._classmap[args[0]]
+            self._objects[id_] = klass(self, id_)
+        else:
+            self._invalid_objects.add(id_)
+
+    def _parse_delete(self, id_, args):
+        # Deleting an object
+        ob = self._objects.get(id_, None)
+        if ob is not None and ob is not JUST_DELETED:
+            self._objects[id_] = JUST_DELETED
+            self._just_deleted.add(id_)
+            ob.delete()
+
     def _parse(self, command):
         """ Parse a single command.
         """
         cmd, id_, args = command[0], command[1], command[2:]
-            
-        if cmd == 'CURRENT':
-            # This context is made current
-            self.env.clear()
-            self._gl_initialize()
-            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
-        elif cmd == 'FUNC':
-            # GL function call
-            args = [as_enum(a) for a in args]
-            try:
-                getattr(gl, id_)(*args)
-            except AttributeError:
-                logger.warning('Invalid gl command: %r' % id_)
-        elif cmd == 'CREATE':
-            # Creating an object
-            if args[0] is not None:
-                klass = self._classmap[args[0]]
-                self._objects[id_] = klass(self, id_)
-            else:
-                self._invalid_objects.add(id_)
-        elif cmd == 'DELETE':
-            # Deleting an object
-            ob = self._objects.get(id_, None)
-            if ob is not None:
-                self._objects[id_] = JUST_DELETED
-                ob.delete()
+
+        handler = self._parser_commands.get(cmd, None)
+        if handler is not None:
+            handler(id_, args)
+            return
+
+        # Doing somthing to an object
+        ob = self._objects.get(id_, None)
+        if ob is JUST_DELETED:
+            return
+        if ob is None:
+            if id_ not in self._invalid_objects:
+                raise RuntimeError('Cannot %s object %i because it '
+                                   'does not exist' % (cmd, id_))
+            return
+        method = self._object_commands.get(cmd, None)
+        if method is None:
+            logger.warning('Invalid GLIR command %r' % cmd)
         else:
-            # Doing somthing to an object
-            ob = self._objects.get(id_, None)
-            if ob == JUST_DELETED:
-                return
-            if ob is None:
-                if id_ not in self._invalid_objects:
-                    raise RuntimeError('Cannot %s object %i because it '
-                                       'does not exist' % (cmd, id_))
-                return
-            # Triage over command. Order of commands is set so most
-            # common ones occur first.
-            if cmd == 'DRAW':  # Program
-                ob.draw(*args)
-            elif cmd == 'TEXTURE':  # Program
-                ob.set_texture(*args)
-            elif cmd == 'UNIFORM':  # Program
-                ob.set_uniform(*args)
-            elif cmd == 'ATTRIBUTE':  # Program
-                ob.set_attribute(*args)
-            elif cmd == 'DATA':  # VertexBuffer, IndexBuffer, Texture
-                ob.set_data(*args)
-            elif cmd == 'SIZE':  # VertexBuffer, IndexBuffer,
-                ob.set_size(*args)  # Texture[1D, 2D, 3D], RenderBuffer
-            elif cmd == 'ATTACH':  # FrameBuffer
-                ob.attach(*args)
-            elif cmd == 'FRAMEBUFFER':  # FrameBuffer
-                ob.set_framebuffer(*args)
-            elif cmd == 'SHADERS':  # Program
-                ob.set_shaders(*args)
-            elif cmd == 'WRAPPING':  # Texture1D, Texture2D, Texture3D
-                ob.set_wrapping(*args)
-            elif cmd == 'INTERPOLATION':  # Texture1D, Texture2D, Texture3D
-                ob.set_interpolation(*args)
-            else:
-                logger.warning('Invalid GLIR command %r' % cmd)
+            getattr(ob, method)(*args)
 
     def parse(self, commands):
         """ Parse a list of commands.
@@ -447,12 +647,9 @@ class GlirParser(BaseGlirParser):
         
         # Get rid of dummy objects that represented deleted objects in
         # the last parsing round.
-        to_delete = []
-        for id_, val in self._objects.items():
-            if val == JUST_DELETED:
-                to_delete.append(id_)
-        for id_ in to_delete:
-            self._objects.pop(id_)
+        for id_ in self._just_deleted:
+            self._objects.pop(id_, None)
+        self._just_deleted.clear()
         
         for command in commands:
             self._parse(command)
@@ -474,6 +671,8 @@ class GlirParser(BaseGlirParser):
             GL_POINT_SPRITE = 34913
             gl.glEnable(GL_VERTEX_PROGRAM_POINT_SIZE)
             gl.glEnable(GL_POINT_SPRITE)
+        # Identifies the context if it supports vertex array objects
+        self.env['vao_context'] = _get_vao_context()
         if self.capabilities['max_texture_size'] is None:  # only do once
             self.capabilities['gl_version'] = gl.glGetParameter(gl.GL_VERSION)
             self.capabilities['max_texture_size'] = \
@@ -517,6 +716,249 @@ def glir_logger(parser_cls, file_or_filename):
     return cls
 
 
+## Binary GLIR stream format
+
+# A binary GLIR stream starts with a header, followed by one block per
+# call to parser.parse(). Each block starts with b'B' and the number of
+# commands, followed by the commands. A command is stored as a tuple
+# value; values are stored as a one-byte tag followed by the payload.
+# Arrays are stored as raw bytes, together with their dtype and shape.
+# All numbers are little endian.
+
+_GLIR_STREAM_MAGIC = b'GLIRB'
+_GLIR_STREAM_VERSION = 1
+
+
+def _write_glir_value(file, value):
+    if value is None:
+        file.write(b'N')
+    elif isinstance(value, (bool, np.bool_)):
+        file.write(b'?' + struct.pack('<B', bool(value)))
+    elif isinstance(value, (int, np.integer)):
+        file.write(b'i' + struct.pack('<q', int(value)))
+    elif isinstance(value, (float, np.floating)):
+        file.write(b'd' + struct.pack('<d', float(value)))
+    elif isinstance(value, string_types):
+        data = value.encode('utf-8')
+        file.write(b's' + struct.pack('<I', len(data)) + data)
+    elif isinstance(value, bytes):
+        file.write(b'b' + struct.pack('<I', len(value)) + value)
+    elif isinstance(value, (tuple, list)):
+        file.write((b't' if isinstance(value, tuple) else b'l') +
+                   struct.pack('<I', len(value)))
+        for item in value:
+            _write_glir_value(file, item)
+    elif isinstance(value, np.ndarray):
+        dtype = value.dtype
+        descr = repr(dtype.descr if dtype.fields else dtype.str)
+        descr = descr.encode('ascii')
+        file.write(b'a' + struct.pack('<I', len(descr)) + descr)
+        file.write(struct.pack('<I', value.ndim))
+        file.write(struct.pack('<%iQ' % value.ndim, *value.shape))
+        file.write(np.ascontiguousarray(value).tobytes())
+    else:
+        raise TypeError('Cannot write %r to GLIR stream' % type(value))
+
+
+def _read_exactly(file, n):
+    data = file.read(n)
+    if len(data) != n:
+        raise ValueError('Unexpected end of GLIR stream')
+    return data
+
+
+def _read_glir_value(file):
+    tag = _read_exactly(file, 1)
+    if tag == b'N':
+        return None
+    elif tag == b'?':
+        return bool(struct.unpack('<B', _read_exactly(file, 1))[0])
+    elif tag == b'i':
+        return struct.unpack('<q', _read_exactly(file, 8))[0]
+    elif tag == b'd':
+        return struct.unpack('<d', _read_exactly(file, 8))[0]
+    elif tag in (b's', b'b'):
+        n = struct.unpack('<I', _read_exactly(file, 4))[0]
+        data = _read_exactly(file, n)
+        return data.decode('utf-8') if tag == b's' else data
+    elif tag in (b't', b'l'):
+        n = struct.unpack('<I', _read_exactly(file, 4))[0]
+        items = [_read_glir_value(file) for i in range(n)]
+        return tuple(items) if tag == b't' else items
+    elif tag == b'a':
+        n = struct.unpack('<I', _read_exactly(file, 4))[0]
+        descr = ast.literal_eval(_read_exactly(file, n).decode('ascii'))
+        dtype = np.dtype(descr)
+        ndim = struct.unpack('<I', _read_exactly(file, 4))[0]
+        shape = struct.unpack('<%iQ' % ndim, _read_exactly(file, 8 * ndim))
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        data = np.frombuffer(_read_exactly(file, nbytes), dtype)
+        return data.reshape(shape)
+    raise ValueError('Invalid tag %r in GLIR stream' % tag)
+
+
+def write_glir(file, commands):
+    """ Write a block of GLIR commands to a binary GLIR stream.
+
+    The header is written if the file is at position zero.
+
+    Parameters
+    ----------
+    file : file-like
+        A file opened in binary mode.
+    commands : list
+        The list of GLIR commands that were parsed together.
+    """
+    if file.tell() == 0:
+        file.write(_GLIR_STREAM_MAGIC +
+                   struct.pack('<H', _GLIR_STREAM_VERSION))
+    file.write(b'B' + struct.pack('<I', len(commands)))
+    for command in commands:
+        _write_glir_value(file, tuple(command))
+
+
+def _iter_glir_blocks(file):
+    """ Yield blocks of (command, nbytes) tuples from a binary GLIR stream.
+    """
+    magic = file.read(len(_GLIR_STREAM_MAGIC))
+    if magic != _GLIR_STREAM_MAGIC:
+        raise ValueError('Not a binary GLIR stream')
+    version = struct.unpack('<H', _read_exactly(file, 2))[0]
+    if version > _GLIR_STREAM_VERSION:
+        raise ValueError('Unsupported GLIR stream version %i' % version)
+    while True:
+        tag = file.read(1)
+        if not tag:
+            return
+        if tag != b'B':
+            raise ValueError('Invalid block in GLIR stream')
+        n = struct.unpack('<I', _read_exactly(file, 4))[0]
+        block = []
+        for i in range(n):
+            pos = file.tell()
+            command = _read_glir_value(file)
+            block.append((command, file.tell() - pos))
+        yield block
+
+
+def read_glir(file_or_filename):
+    """ Read a binary GLIR stream.
+
+    Parameters
+    ----------
+    file_or_filename : str | file-like
+        The filename or a file opened in binary mode.
+
+    Returns
+    -------
+    blocks : list
+        A list with one list of GLIR commands for each recorded call to
+        parser.parse().
+    """
+    if isinstance(file_or_filename, string_types):
+        with open(file_or_filename, 'rb') as file:
+            return read_glir(file)
+    return [[command for command, nbytes in block]
+            for block in _iter_glir_blocks(file_or_filename)]
+
+
+def glir_recorder(parser_cls, file_or_filename):
+    """ Create a subclass of the given parser class that records all
+    parsed commands to a binary GLIR stream.
+
+    Parameters
+    ----------
+    parser_cls : subclass of BaseGlirParser
+        The parser class to extend.
+    file_or_filename : str | file-like
+        The filename or a file opened in binary mode.
+
+    Returns
+    -------
+    cls : subclass of parser_cls
+        The recording parser class.
+    """
+
+    class cls(parser_cls):
+        def __init__(self, *args, **kwargs):
+            parser_cls.__init__(self, *args, **kwargs)
+
+            if isinstance(file_or_filename, string_types):
+                self._file = open(file_or_filename, 'wb')
+            else:
+                self._file = file_or_filename
+
+        def parse(self, commands):
+            write_glir(self._file, commands)
+            self._file.flush()
+            parser_cls.parse(self, commands)
+
+    return cls
+
+
+def replay_glir(file_or_filename, parser):
+    """ Replay a binary GLIR stream with the given parser and measure
+    the time spent on each type of command.
+
+    Parameters
+    ----------
+    file_or_filename : str | file-like
+        The filename or a file opened in binary mode.
+    parser : instance of BaseGlirParser
+        The parser to execute the commands with. For a GlirParser, the
+        corresponding GL context must be current.
+
+    Returns
+    -------
+    stats : dict
+        A dict that maps each command type to a dict with the number of
+        commands ('count'), their size in the stream ('nbytes') and the
+        time spent executing them in seconds ('time'). The time is None if
+        the parser does not allow timing individual commands. The special
+        key 'FLUSH' contains the same information for whole blocks.
+    """
+    if isinstance(file_or_filename, string_types):
+        with open(file_or_filename, 'rb') as file:
+            return replay_glir(file, parser)
+
+    stats = {}
+    per_command = hasattr(parser, '_parse')
+
+    def add(cmd, nbytes, time):
+        s = stats.setdefault(cmd, dict(count=0, nbytes=0, time=None))
+        s['count'] += 1
+        s['nbytes'] += nbytes
+        if time is not None:
+            s['time'] = (s['time'] or 0.) + time
+
+    if per_command:
+        # Time each command via the hook that parse() calls per command
+        sizes = {}
+        parse_command = parser._parse
+
+        def timed_parse(command):
+            t0 = default_timer()
+            parse_command(command)
+            add(command[0], sizes.get(id(command), 0), default_timer() - t0)
+        parser._parse = timed_parse
+
+    try:
+        for block in _iter_glir_blocks(file_or_filename):
+            commands = [command for command, nbytes in block]
+            if per_command:
+                sizes = dict((id(c), n) for c, n in block)
+            else:
+                for command, nbytes in block:
+                    add(command[0], nbytes, None)
+            t0 = default_timer()
+            parser.parse(commands)
+            add('FLUSH', sum(n for c, n in block), default_timer() - t0)
+    finally:
+        if per_command:
+            del parser._parse
+    return stats
+
+
 ## GLIR objects
 
 class GlirObject(object):
@@ -578,7 +1020,10 @@ class GlirProgram(GlirObject):
     }
     
     def create(self):
-        self._handle = gl.glCreateProgram()
+        # The GL program is shared by all programs with the same source; it
+        # is created or looked up when the shaders are set.
+        self._handle = -1
+        self._linked_program = None
         self._validated = False
         self._linked = False
         # Keeping track of uniforms/attributes
@@ -586,11 +1031,57 @@ class GlirProgram(GlirObject):
         self._unset_variables = set()
         # Store samplers in buffers that are bount to uniforms/attributes
         self._samplers = {}  # name -> (tex-target, tex-handle, unit)
-        self._attributes = {}  # name -> (vbo-handle, attr-handle, func, args)
+        # name -> (vbo, attr-handle, func, args, divisor), with vbo the
+        # GlirVertexBuffer (not its GL name, which GL can reuse) or 0
+        self._attributes = {}
         self._known_invalid = set()  # variables that we know are invalid
+        # Shadow copy of uploaded uniform values, to skip redundant calls
+        self._uniform_values = {}  # name -> (type, bytes) or unit
+        self._uniform_elements = {}  # array name -> names of set elements
+        # The uniform values of this program, which are uploaded again when
+        # the GL program was used by another program in the meantime
+        self._uniforms = OrderedDict()  # name -> (kind, key, func, args)
+        # Vertex array objects that capture the attribute bindings
+        self._vaos = {}  # context -> vao-handle
+        self._valid_vaos = set()  # contexts whose VAO matches _attributes
+        # context -> attribute handles with a non-zero divisor in the VAO
+        self._vao_divisors = {}
     
     def delete(self):
-        gl.glDeleteProgram(self._handle)
+        self._delete_vaos()
+        self._release_linked_program()
+
+    def _release_linked_program(self):
+        linked = self._linked_program
+        if linked is None:
+            return
+        self._linked_program = None
+        if linked.owner is self:
+            linked.owner = None
+        linked.users -= 1
+        if linked.users == 0:
+            idle = self._parser._idle_programs
+            idle[linked.key] = linked
+            while len(idle) > IDLE_PROGRAMS_CACHE_SIZE:
+                self._delete_linked_program(idle.popitem(last=False)[1])
+
+    def _delete_linked_program(self, linked):
+        self._parser._linked_programs.pop(linked.key, None)
+        if self._parser.env.get('current_program', 0) == linked.handle:
+            self._parser.env['current_program'] = 0
+        gl.glDeleteProgram(linked.handle)
+        for shader in linked.shaders:
+            self._release_shader(shader)
+    
+    def _delete_vaos(self):
+        # We can only delete the VAO of the current context, the others
+        # are dropped (VAOs cannot be shared between contexts)
+        vao = self._vaos.pop(self._parser.env.get('vao_context'), None)
+        if vao is not None:
+            glDeleteVertexArray(vao)
+        self._vaos = {}
+        self._valid_vaos.clear()
+        self._vao_divisors = {}
     
     def activate(self):
         """ Avoid overhead in calling glUseProgram with same arg.
@@ -614,42 +1105,89 @@ class GlirProgram(GlirObject):
         """ This function takes care of setting the shading code and
         compiling+linking it into a working program object that is ready
         to use.
+
+        Programs with the same code share one linked GL program; each
+        program keeps its own uniform values.
         """
         self._linked = False
-        # Create temporary shader objects
-        vert_handle = gl.glCreateShader(gl.GL_VERTEX_SHADER)
-        frag_handle = gl.glCreateShader(gl.GL_FRAGMENT_SHADER)
-        # For both vertex and fragment shader: set source, compile, check
-        for code, handle, type_ in [(vert, vert_handle, 'vertex'), 
-                                    (frag, frag_handle, 'fragment')]:
+        self._release_linked_program()
+        linked = self._parser._linked_programs.get((vert, frag), None)
+        if linked is None:
+            linked = self._link(vert, frag)
+            self._parser._linked_programs[linked.key] = linked
+        self._parser._idle_programs.pop(linked.key, None)
+        linked.users += 1
+        self._linked_program = linked
+        self._handle = linked.handle
+        # Now we know what variables will be used by the program
+        self._unset_variables = set(linked.variables)
+        self._handles = linked.handles
+        self._known_invalid = linked.known_invalid
+        self._uniform_values = linked.uniform_values
+        self._uniform_elements = linked.uniform_elements
+        self._uniforms = OrderedDict()
+        self._delete_vaos()  # attribute locations may have changed
+        self._linked = True
+
+    def _link(self, vert, frag):
+        """ Link a new GL program, compiling the shaders that are not
+        compiled yet.
+        """
+        self._handle = gl.glCreateProgram()
+        shaders = []
+        try:
+            for code, type_ in [(vert, 'vertex'), (frag, 'fragment')]:
+                shaders.append(self._get_shader(type_, code))
+            self._attach_and_link(shaders)
+        except Exception:
+            for shader in shaders:
+                self._release_shader(shader)
+            gl.glDeleteProgram(self._handle)
+            self._handle = -1
+            raise
+        variables = self._get_active_attributes_and_uniforms()
+        return _LinkedProgram((vert, frag), self._handle, variables, shaders)
+
+    def _get_shader(self, type_, code):
+        """ Get the compiled shader object of the given type and code.
+        """
+        shader = self._parser._compiled_shaders.get((type_, code), None)
+        if shader is None:
+            gltype = {'vertex': gl.GL_VERTEX_SHADER,
+                      'fragment': gl.GL_FRAGMENT_SHADER}[type_]
+            handle = gl.glCreateShader(gltype)
             gl.glShaderSource(handle, code)
             gl.glCompileShader(handle)
             status = gl.glGetShaderParameter(handle, gl.GL_COMPILE_STATUS)
             if not status:
                 errors = gl.glGetShaderInfoLog(handle)
+                gl.glDeleteShader(handle)
                 errormsg = self._get_error(code, errors, 4)
                 raise RuntimeError("Shader compilation error in %s:\n%s" % 
                                    (type_ + ' shader', errormsg))
-        # Attach shaders
-        gl.glAttachShader(self._handle, vert_handle)
-        gl.glAttachShader(self._handle, frag_handle)
+            shader = _CompiledShader((type_, code), handle)
+            self._parser._compiled_shaders[shader.key] = shader
+        shader.users += 1
+        return shader
+
+    def _release_shader(self, shader):
+        shader.users -= 1
+        if shader.users == 0:
+            self._parser._compiled_shaders.pop(shader.key, None)
+            gl.glDeleteShader(shader.handle)
+
+    def _attach_and_link(self, shaders):
+        for shader in shaders:
+            gl.glAttachShader(self._handle, shader.handle)
         # Link the program and check
         gl.glLinkProgram(self._handle)
         if not gl.glGetProgramParameter(self._handle, gl.GL_LINK_STATUS):
             raise RuntimeError('Program linking error:\n%s'
                                % gl.glGetProgramInfoLog(self._handle))
-        # Now we can remove the shaders. We no longer need them and it
-        # frees up precious GPU memory:
-        # http://gamedev.stackexchange.com/questions/47910
-        gl.glDetachShader(self._handle, vert_handle)
-        gl.glDetachShader(self._handle, frag_handle)
-        gl.glDeleteShader(vert_handle)
-        gl.glDeleteShader(frag_handle)
-        # Now we know what variables will be used by the program
-        self._unset_variables = self._get_active_attributes_and_uniforms()
-        self._handles = {}
-        self._known_invalid = set()
-        self._linked = True
+        # The shader objects are no longer needed by this program; they are
+        # deleted when no other linked program uses them.
+        for shader in shaders:
+            gl.glDetachShader(self._handle, shader.handle)
         
     def _get_active_attributes_and_uniforms(self):
         """ Retrieve active attributes and uniforms to be able to check that
@@ -734,20 +1272,18 @@ class GlirProgram(GlirObject):
         """
         if not self._linked:
             raise RuntimeError('Cannot set uniform when program has no code')
+        self._unset_variables.discard(name)  # Mark as set
         # Get handle for the uniform, first try cache
         handle = self._handles.get(name, -1)
         if handle < 0:
             if name in self._known_invalid:
                 return
             handle = gl.glGetUniformLocation(self._handle, name)
-            self._unset_variables.discard(name)  # Mark as set
             self._handles[name] = handle  # Store in cache
             if handle < 0:
                 self._known_invalid.add(name)
                 logger.info('Variable %s is not an active uniform' % name)
                 return
-        # Program needs to be active in order to set uniforms
-        self.activate()
         if True:
             # Sampler: the value is the id of the texture
             tex = self._parser.get_object(value)
@@ -759,60 +1295,98 @@ class GlirProgram(GlirObject):
             if name in self._samplers:
                 unit = self._samplers[name][-1]  # Use existing unit            
             self._samplers[name] = tex._target, tex.handle, unit
-            gl.glUniform1i(handle, unit)
+            # The texture is bound at draw time, the uniform only needs
+            # to be set if the unit changed.
+            self._set_uniform_value(name, 'texture', unit, gl.glUniform1i,
+                                    (handle, unit))
 
     def set_uniform(self, name, type_, value):
         """ Set a uniform value. Value is assumed to have been checked.
         """
         if not self._linked:
             raise RuntimeError('Cannot set uniform when program has no code')
-        # Get handle for the uniform, first try cache
+        # Get handle for the uniform, first try cache (the cache is shared
+        # with other programs that have the same code)
         handle = self._handles.get(name, -1)
+        if handle < 0 and name in self._known_invalid:
+            return
         count = 1
-        if handle < 0:
-            if name in self._known_invalid:
-                return
-            handle = gl.glGetUniformLocation(self._handle, name)
+        if not type_.startswith('mat'):
+            count = value.nbytes // (4 * self.ATYPEINFO[type_][0])
+        if self._unset_variables:
             self._unset_variables.discard(name)  # Mark as set
             # if we set a uniform_array, mark all as set
-            if not type_.startswith('mat'):
-                count = value.nbytes // (4 * self.ATYPEINFO[type_][0])
             if count > 1:
                 for ii in range(count):
-                    if '%s[%s]' % (name, ii) in self._unset_variables:
-                        self._unset_variables.discard('%s[%s]' % (name, ii))
-
+                    self._unset_variables.discard('%s[%s]' % (name, ii))
+        if handle < 0:
+            handle = gl.glGetUniformLocation(self._handle, name)
             self._handles[name] = handle  # Store in cache
             if handle < 0:
                 self._known_invalid.add(name)
                 logger.info('Variable %s is not an active uniform' % name)
                 return
+        key = type_, np.asarray(value).tobytes()
         # Look up function to call
         funcname = self.UTYPEMAP[type_]
         func = getattr(gl, funcname)
-        # Program needs to be active in order to set uniforms
-        self.activate()
         # Triage depending on type 
         if type_.startswith('mat'):
             # Value is matrix, these gl funcs have alternative signature
             transpose = False  # OpenGL ES 2.0 does not support transpose
-            func(handle, 1, transpose, value)
+            args = handle, 1, transpose, value
         else:
             # Regular uniform
-            func(handle, count, value)
+            args = handle, count, value
+        self._set_uniform_value(name, 'uniform', key, func, args)
+
+    def _set_uniform_value(self, name, kind, key, func, args):
+        """ Store the value of a uniform, and upload it unless another
+        program is using the (shared) GL program. *key* identifies the
+        value; *func(\*args)* uploads it.
+        """
+        # Move to the end, so that uniforms are uploaded in the order in
+        # which they were set (arrays and their elements may overlap)
+        self._uniforms.pop(name, None)
+        self._uniforms[name] = kind, key, func, args
+        linked = self._linked_program
+        if linked is not None:
+            if linked.owner is not None and linked.owner is not self:
+                return  # uploaded in _pre_draw
+            linked.owner = self
+        self._upload_uniform(name, kind, key, func, args)
+
+    def _upload_uniform(self, name, kind, key, func, args):
+        # Skip if the value is equal to what was uploaded last time
+        if self._uniform_values.get(name, None) == key:
+            self._parser.skipped_calls[kind] += 1
+            return
+        self._uniform_values[name] = key
+        # Setting an element of an array invalidates the whole array,
+        # and vice versa
+        if '[' in name:
+            base = name.split('[')[0]
+            self._uniform_values.pop(base, None)
+            self._uniform_elements.setdefault(base, set()).add(name)
+        else:
+            for element in self._uniform_elements.pop(name, ()):
+                self._uniform_values.pop(element, None)
+        # Program needs to be active in order to set uniforms
+        self.activate()
+        func(*args)
     
     def set_attribute(self, name, type_, value):
         """ Set an attribute value. Value is assumed to have been checked.
         """
         if not self._linked:
             raise RuntimeError('Cannot set attribute when program has no code')
+        self._unset_variables.discard(name)  # Mark as set
         # Get handle for the attribute, first try cache
         handle = self._handles.get(name, -1)
         if handle < 0:
             if name in self._known_invalid:
                 return
             handle = gl.glGetAttribLocation(self._handle, name)
-            self._unset_variables.discard(name)  # Mark as set
             self._handles[name] = handle  # Store in cache
             if handle < 0:
                 self._known_invalid.add(name)
@@ -820,18 +1394,17 @@ class GlirProgram(GlirObject):
                     return  # Probably an unused element in a structured VBO
                 logger.info('Variable %s is not an active attribute' % name)
                 return
-        # Program needs to be active in order to set uniforms
-        self.activate()
         # Triage depending on VBO or tuple data
         if value[0] == 0:
             # Look up function call
             funcname = self.ATYPEMAP[type_]
             func = getattr(gl, funcname)
             # Set data
-            self._attributes[name] = 0, handle, func, value[1:]
+            attribute = 0, handle, func, tuple(value[1:]), 0
         else:
             # Get meta data
-            vbo_id, stride, offset = value
+            vbo_id, stride, offset = value[:3]
+            divisor = value[3] if len(value) > 3 else 0
             size, gtype, dtype = self.ATYPEINFO[type_]
             # Get associated VBO
             vbo = self._parser.get_object(vbo_id)
@@ -842,28 +1415,75 @@ class GlirProgram(GlirObject):
             # Set data
             func = gl.glVertexAttribPointer
             args = size, gtype, gl.GL_FALSE, stride, offset
-            self._attributes[name] = vbo.handle, handle, func, args
+            attribute = vbo, handle, func, args, divisor
+        # Skip if the binding is equal to the current one
+        if self._attributes.get(name, None) == attribute:
+            self._parser.skipped_calls['attribute'] += 1
+            return
+        self._attributes[name] = attribute
+        self._valid_vaos.clear()  # the VAOs must record the new binding
     
     def _pre_draw(self):
         self.activate()
+        # Upload our uniforms if another program used the GL program
+        linked = self._linked_program
+        if linked is not None and linked.owner is not self:
+            linked.owner = self
+            for name, value in self._uniforms.items():
+                self._upload_uniform(name, *value)
         # Activate textures
         for tex_target, tex_handle, unit in self._samplers.values():
             gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
             gl.glBindTexture(tex_target, tex_handle)
         # Activate attributes
-        for vbo_handle, attr_handle, func, args in self._attributes.values():
-            if vbo_handle:
-                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vbo_handle)
+        context = self._parser.env.get('vao_context')
+        if context is None:
+            # No VAOs (e.g. ES2): set all attribute pointers for each draw
+            self._set_attributes()
+        else:
+            vao = self._vaos.get(context)
+            if vao is None:
+                vao = self._vaos[context] = glGenVertexArray()
+            glBindVertexArray(vao)
+            if context in self._valid_vaos:
+                # The VAO holds the pointers, but constant attribute
+                # values are not part of the VAO state
+                for vbo, attr_handle, func, args, divisor in \
+                        self._attributes.values():
+                    if not vbo:
+                        func(attr_handle, *args)
+            else:
+                self._set_attributes(
+                    self._vao_divisors.setdefault(context, set()))
+                self._valid_vaos.add(context)
+        # Validate. We need to validate after textures units get assigned
+        if not self._validated:
+            self._validated = True
+            self._validate()
+    
+    def _set_attributes(self, instanced=None):
+        """Set the attribute bindings. When recording a VAO, *instanced* is
+        the set of attribute handles with a non-zero divisor in the VAO,
+        which is updated. Divisors are part of the VAO state, so those of
+        attributes that are no longer instanced are reset to 0.
+        """
+        for vbo, attr_handle, func, args, divisor in \
+                self._attributes.values():
+            if vbo:
+                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vbo.handle)
                 gl.glEnableVertexAttribArray(attr_handle)
                 func(attr_handle, *args)
             else:
                 gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
                 gl.glDisableVertexAttribArray(attr_handle)
                 func(attr_handle, *args)
-        # Validate. We need to validate after textures units get assigned
-        if not self._validated:
-            self._validated = True
-            self._validate()
+            if divisor:
+                glVertexAttribDivisor(attr_handle, divisor)
+                if instanced is not None:
+                    instanced.add(attr_handle)
+            elif instanced and attr_handle in instanced:
+                glVertexAttribDivisor(attr_handle, 0)
+                instanced.discard(attr_handle)
     
     def _validate(self):
         # Validate ourselves
@@ -878,6 +1498,15 @@ class GlirProgram(GlirObject):
                                % gl.glGetProgramInfoLog(self._handle))
     
     def _post_draw(self):
+        # Unbind our VAO, so that it is not affected by other GL calls
+        if self._parser.env.get('vao_context') is not None:
+            glBindVertexArray(0)
+        else:
+            # Without VAO, the divisors would affect other programs
+            for vbo, attr_handle, func, args, divisor in \
+                    self._attributes.values():
+                if divisor:
+                    glVertexAttribDivisor(attr_handle, 0)
         # No need to deactivate each texture/buffer, just set to 0
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
         gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
@@ -889,9 +1518,9 @@ class GlirProgram(GlirObject):
         #apps it would not even make sense.
         #self.deactivate()
     
-    def draw(self, mode, selection):
+    def draw(self, mode, selection, instances=None):
         """ Draw program in given mode, with given selection (IndexBuffer or
-        first, count).
+        first, count). If instances is given, draw that many instances.
         """
         if not self._linked:
             raise RuntimeError('Cannot draw program if code has not been set')
@@ -899,26 +1528,124 @@ class GlirProgram(GlirObject):
         gl.check_error('Check before draw')
         mode = as_enum(mode)
         # Draw
-        if len(selection) == 3:
+        if instances is not None and not instances:
+            pass  # zero instances, nothing to draw
+        elif len(selection) == 3:
             # Selection based on indices
             id_, gtype, count = selection
             if count:
                 self._pre_draw()
                 ibuf = self._parser.get_object(id_)
                 ibuf.activate()
-                gl.glDrawElements(mode, count, as_enum(gtype), None)
+                if instances is None:
+                    gl.glDrawElements(mode, count, as_enum(gtype), None)
+                else:
+                    glDrawElementsInstanced(mode, count, as_enum(gtype),
+                                            instances)
                 ibuf.deactivate()
         else:
             # Selection based on start and count
             first, count = selection
             if count:
                 self._pre_draw()
-                gl.glDrawArrays(mode, first, count)
+                if instances is None:
+                    gl.glDrawArrays(mode, first, count)
+                else:
+                    glDrawArraysInstanced(mode, first, count, instances)
         # Wrap up
         gl.check_error('Check after draw')
         self._post_draw()
 
 
+class _LinkedProgram(object):
+    """ A linked GL program, shared by the GlirPrograms that have the same
+    source code. The uniform state of the GL program is that of its
+    *owner*, the GlirProgram that last uploaded uniforms.
+    """
+
+    def __init__(self, key, handle, variables, shaders):
+        self.key = key  # (vert, frag)
+        self.handle = handle
+        self.variables = variables  # names of active attributes/uniforms
+        self.shaders = shaders  # the _CompiledShader objects
+        self.users = 0
+        self.owner = None
+        self.handles = {}  # cache with handles to attributes/uniforms
+        self.known_invalid = set()
+        self.uniform_values = {}  # name -> (type, bytes) or unit
+        self.uniform_elements = {}  # array name -> names of set elements
+
+
+class _CompiledShader(object):
+    """ A compiled GL shader object, shared by the linked programs that
+    use the same shader code.
+    """
+
+    def __init__(self, key, handle):
+        self.key = key  # (type, code)
+        self.handle = handle
+        self.users = 0
+
+
+def _check_pyopengl_instancing():
+    """Helper to ensure users have OpenGL for instanced drawing"""
+    try:
+        import OpenGL.GL as _gl
+    except ImportError:
+        raise ImportError('PyOpenGL is required for instanced drawing')
+    return _gl
+
+
+def glVertexAttribDivisor(index, divisor):
+    _gl = _check_pyopengl_instancing()
+    _gl.glVertexAttribDivisor(index, divisor)
+
+
+def glDrawArraysInstanced(mode, first, count, instances):
+    _gl = _check_pyopengl_instancing()
+    _gl.glDrawArraysInstanced(mode, first, count, instances)
+
+
+def glDrawElementsInstanced(mode, count, type, instances):
+    _gl = _check_pyopengl_instancing()
+    _gl.glDrawElementsInstanced(mode, count, type, None, instances)
+
+
+def _get_vao_context():
+    """Get an identifier for the current context if it supports vertex
+    array objects (via PyOpenGL), or None otherwise.
+    """
+    name = gl.current_backend.__name__
+    if '.es' in name or 'dummy' in name:
+        return None  # ES2 has no VAOs
+    try:
+        import OpenGL.GL as _gl
+        from OpenGL import contextdata
+    except ImportError:
+        return None
+    try:
+        if not bool(_gl.glGenVertexArrays):
+            return None  # not supported by this context
+        return contextdata.getContext() or None
+    except Exception:
+        return None  # no valid context
+
+
+def glGenVertexArray():
+    import OpenGL.GL as _gl
+    return _gl.glGenVertexArrays(1)
+
+
+def glBindVertexArray(vao):
+    import OpenGL.GL as _gl
+    _gl.glBindVertexArray(vao)
+
+
+def glDeleteVertexArray(vao):
+    import OpenGL.GL as _gl
+    _gl.glDeleteVertexArrays(1, [vao])
+
+
 class GlirBuffer(GlirObject):
     _target = None
     _usage = gl.GL_DYNAMIC_DRAW  # STATIC_DRAW, STREAM_DRAW or DYNAMIC_DRAW
@@ -976,6 +1703,18 @@ class GlirVertexBuffer(GlirBuffer):
     _target = gl.GL_ARRAY_BUFFER
     
 
+class GlirStreamingVertexBuffer(GlirVertexBuffer):
+    _usage = gl.GL_STREAM_DRAW
+    
+    def set_size(self, nbytes):  # in bytes
+        # Always reallocate, also when the size does not change. This
+        # orphans the old storage, so the driver does not have to wait
+        # for pending draws that still use it.
+        self.activate()
+        gl.glBufferData(self._target, nbytes, self._usage)
+        self._buffer_size = nbytes
+
+
 class GlirIndexBuffer(GlirBuffer):
     _target = gl.GL_ELEMENT_ARRAY_BUFFER
 
@@ -8,6 +8,10 @@ import re
 from .. import glsl
 from ..util import logger
 
+# Preprocessed code of recently used sources: {code: preprocessed code}
+_preprocess_cache = {}
+_PREPROCESS_CACHE_SIZE = 1024
+
 
 def remove_comments(code):
     """Remove C-style comment from GLSL code string."""
@@ -64,7 +68,13 @@ def merge_includes(code):
 def preprocess(code):
     """Preprocess a code by removing comments, version and merging includes."""
 
-    if code:
-        #code = remove_comments(code)
-        code = merge_includes(code)
-    return code
+    if not code:
+        return code
+    result = _preprocess_cache.get(code, None)
+    if result is None:
+        #result = remove_comments(code)
+        result = merge_includes(code)
+        if len(_preprocess_cache) >= _PREPROCESS_CACHE_SIZE:
+            _preprocess_cache.clear()
+        _preprocess_cache[code] = result
+    return result
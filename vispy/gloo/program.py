@@ -40,6 +40,60 @@ from .context import get_current_canvas
 from .preprocessor import preprocess
 
 
+# Regexp to look for variable names
+_var_regexp = ("\s*VARIABLE\s+"  # kind of variable
+               "((highp|mediump|lowp)\s+)?"  # Precision (optional)
+               "(?P<type>\w+)\s+"  # type
+               "(?P<name>\w+)\s*"  # name
+               "(\[(?P<size>\d+)\])?"  # size (optional)
+               "(\s*\=\s*[0-9.]+)?"  # default value (optional)
+               "\s*;"  # end
+               )
+_var_regexps = [(kind, re.compile(_var_regexp.replace('VARIABLE', kind),
+                                  flags=re.MULTILINE))
+                for kind in ('uniform', 'attribute', 'varying', 'const')]
+
+# The variables parsed from recently used shaders: {(vert, frag): dict}.
+# Many programs share the same code, e.g. all instances of a visual.
+_code_variables_cache = {}
+_CODE_VARIABLES_CACHE_SIZE = 1024
+
+
+def _parse_code_variables(shaders):
+    """ Return {name: (kind, type, name, size)} for the uniforms, attributes,
+    varyings and constants declared in the (vert, frag) *shaders*. The
+    returned dict must not be modified.
+    """
+    code_variables = _code_variables_cache.get(shaders, None)
+    if code_variables is not None:
+        return code_variables
+
+    # Get one string of code with comments removed
+    code = '\n\n'.join(shaders)
+    code = re.sub(r'(.*)(//.*)', r'\1', code, re.M)
+
+    # Parse uniforms, attributes and varyings
+    code_variables = {}
+    for kind, regex in _var_regexps:
+        for m in re.finditer(regex, code):
+            gtype = m.group('type')
+            size = int(m.group('size')) if m.group('size') else -1
+            this_kind = kind
+            if size >= 1:
+                # uniform arrays get added both as individuals and full
+                for i in range(size):
+                    name = '%s[%d]' % (m.group('name'), i)
+                    code_variables[name] = kind, gtype, name, -1
+                this_kind = 'uniform_array'
+            name = m.group('name')
+            code_variables[name] = this_kind, gtype, name, size
+
+    if len(_code_variables_cache) >= _CODE_VARIABLES_CACHE_SIZE:
+        _code_variables_cache.clear()
+    _code_variables_cache[shaders] = code_variables
+    return code_variables
+
+
 # ----------------------------------------------------------- Program class ---
 class Program(GLObject):
     """ Shader program object
@@ -104,6 +158,8 @@ class Program(GLObject):
         self._user_variables = {}  # name -> data / buffer / texture
         # Init pending user-defined data
         self._pending_variables = {}  # name -> data
+        # Byte offsets of buffers as last sent in an ATTRIBUTE command
+        self._attribute_offsets = {}  # name -> offset
         
         # NOTE: we *could* allow vert and frag to be a tuple/list of shaders,
         # but that would complicate the GLIR implementation, and it seems 
@@ -184,38 +240,9 @@ class Program(GLObject):
     def _parse_variables_from_code(self):
         """ Parse uniforms, attributes and varyings from the source code.
         """
-        
-        # Get one string of code with comments removed
-        code = '\n\n'.join(self._shaders)
-        code = re.sub(r'(.*)(//.*)', r'\1', code, re.M)
-        
-        # Regexp to look for variable names
-        var_regexp = ("\s*VARIABLE\s+"  # kind of variable
-                      "((highp|mediump|lowp)\s+)?"  # Precision (optional)
-                      "(?P<type>\w+)\s+"  # type
-                      "(?P<name>\w+)\s*"  # name
-                      "(\[(?P<size>\d+)\])?"  # size (optional)
-                      "(\s*\=\s*[0-9.]+)?"  # default value (optional)
-                      "\s*;"  # end
-                      )
-        
-        # Parse uniforms, attributes and varyings
-        self._code_variables = {}
-        for kind in ('uniform', 'attribute', 'varying', 'const'):
-            regex = re.compile(var_regexp.replace('VARIABLE', kind),
-                               flags=re.MULTILINE)
-            for m in re.finditer(regex, code):
-                gtype = m.group('type')
-                size = int(m.group('size')) if m.group('size') else -1
-                this_kind = kind
-                if size >= 1:
-                    # uniform arrays get added both as individuals and full
-                    for i in range(size):
-                        name = '%s[%d]' % (m.group('name'), i)
-                        self._code_variables[name] = kind, gtype, name, -1
-                    this_kind = 'uniform_array'
-                name = m.group('name')
-                self._code_variables[name] = this_kind, gtype, name, size
+        # The parsed variables are cached by code and shared with other
+        # programs; the dict is never modified
+        self._code_variables = _parse_code_variables(self._shaders)
 
         # Now that our code variables are up-to date, we can process
         # the variables that were set but yet unknown.
@@ -362,7 +389,11 @@ class Program(GLObject):
                                              'not %s for %s'
                                              % (numel, data._last_dim, name))
                     self._user_variables[name] = data
+                    self._attribute_offsets[name] = data.offset
                     value = (data.id, data.stride, data.offset)
+                    divisor = getattr(data, 'divisor', 0)
+                    if divisor:
+                        value += (divisor, )
                     self.glir.associate(data.glir)
                     self._glir.command('ATTRIBUTE', self._id,
                                        name, type_, value)
@@ -391,6 +422,15 @@ class Program(GLObject):
     def __contains__(self, key):
         return key in self._code_variables
 
+    @property
+    def pending_upload_nbytes(self):
+        """ The number of bytes that textures of this program still need
+        to upload progressively (see ``BaseTexture.upload_budget``)
+        """
+        return sum(data.pending_upload_nbytes
+                   for data in self._user_variables.values()
+                   if isinstance(data, BaseTexture))
+
     def __getitem__(self, name):
         """ Get user-defined data for attributes and uniforms.
         """
@@ -401,7 +441,8 @@ class Program(GLObject):
         else:
             raise KeyError("Unknown uniform or attribute %s" % name)
     
-    def draw(self, mode='triangles', indices=None, check_error=True):
+    def draw(self, mode='triangles', indices=None, check_error=True,
+             instances=None):
         """ Draw the attribute arrays in the specified mode.
 
         Parameters
@@ -413,6 +454,10 @@ class Program(GLObject):
             Array of indices to draw.
         check_error:
             Check error after draw.
+        instances : int | None
+            If given, draw this many instances of the geometry. Attributes
+            with a VertexBuffer that has a nonzero ``divisor`` then provide
+            per-instance data. Requires OpenGL 3.3 or ES 3.0.
         
         """
         
@@ -431,9 +476,19 @@ class Program(GLObject):
             logger.warn('Variable %r is given but not known.' % name)
         self._pending_variables = {}
         
+        # Streaming buffers move to another segment when data is set;
+        # update the attribute pointers of buffers that have moved
+        for name, data in list(self._user_variables.items()):
+            if (isinstance(data, DataBuffer) and
+                    self._attribute_offsets.get(name) != data.offset):
+                self[name] = data
+        
         # Check attribute sizes
         attributes = [vbo for vbo in self._user_variables.values() 
                       if isinstance(vbo, DataBuffer)]
+        # Per-instance attributes have their own size
+        instanced = [a for a in attributes if getattr(a, 'divisor', 0)]
+        attributes = [a for a in attributes if a not in instanced]
         sizes = [a.size for a in attributes]
         if len(attributes) < 1:
             raise RuntimeError('Must have at least one attribute')
@@ -441,11 +496,28 @@ class Program(GLObject):
             msg = '\n'.join(['%s: %s' % (str(a), a.size) for a in attributes])
             raise RuntimeError('All attributes must have the same size, got:\n'
                                '%s' % msg)
+        if instances is not None:
+            instances = int(instances)
+            if instances < 0:
+                raise ValueError('instances must be >= 0, not %s' % instances)
+            for a in instanced:
+                if a.size * a.divisor < instances:
+                    raise RuntimeError('Per-instance attribute %s is too '
+                                       'small for %i instances'
+                                       % (a, instances))
+        elif instanced:
+            raise RuntimeError('Per-instance attributes require the '
+                               'instances argument')
         
         # Get the glir queue that we need now
         canvas = get_current_canvas()
         assert canvas is not None
         
+        # Send the next chunk of progressive texture uploads
+        for data in self._user_variables.values():
+            if isinstance(data, BaseTexture) and data.pending_upload_nbytes:
+                data.upload_pending()
+        
         # Associate canvas
         canvas.context.glir.associate(self.glir)
         
@@ -457,14 +529,17 @@ class Program(GLObject):
                        np.dtype(np.uint16): 'UNSIGNED_SHORT',
                        np.dtype(np.uint32): 'UNSIGNED_INT'}
             selection = indices.id, gltypes[indices.dtype], indices.size
-            canvas.context.glir.command('DRAW', self._id, mode, selection)
         elif indices is None:
             selection = 0, attributes[0].size
             logger.debug("Program drawing %r with %r" % (mode, selection))
-            canvas.context.glir.command('DRAW', self._id, mode, selection)
         else:
             raise TypeError("Invalid index: %r (must be IndexBuffer)" %
                             indices)
+        if instances is None:
+            canvas.context.glir.command('DRAW', self._id, mode, selection)
+        else:
+            canvas.context.glir.command('DRAW', self._id, mode, selection,
+                                        instances)
         
         # Process GLIR commands
         canvas.context.flush_commands()
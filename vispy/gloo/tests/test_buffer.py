@@ -8,7 +8,8 @@ import numpy as np
 
 from vispy.testing import run_tests_if_main
 from vispy.gloo.buffer import (Buffer, DataBuffer, DataBufferView, 
-                               VertexBuffer, IndexBuffer)
+                               VertexBuffer, IndexBuffer,
+                               StreamingVertexBuffer)
 
 
 # -----------------------------------------------------------------------------
@@ -507,6 +508,50 @@ class VertexBufferTest(unittest.TestCase):
         assert C.glsl_type == ('attribute', 'vec4')
 
 
+# -----------------------------------------------------------------------------
+class StreamingVertexBufferTest(unittest.TestCase):
+
+    def test_segments(self):
+        data = np.zeros((10, 2), np.float32)
+        B = StreamingVertexBuffer(data, segments=3)
+        assert B.segments == 3
+        assert B.nbytes == 3 * data.nbytes
+        assert B.size == 10
+        glir_cmds = B._glir.clear()
+        assert glir_cmds[-2] == ('SIZE', B.id, 3 * data.nbytes)
+        assert glir_cmds[-1][:3] == ('DATA', B.id, 0)
+
+        # Each set_data writes into the next segment
+        for i in (1, 2):
+            B.set_data(data)
+            assert B.segment == i
+            assert B.offset == i * data.nbytes
+            assert B[1:].offset == i * data.nbytes + 8
+            glir_cmds = B._glir.clear()
+            assert len(glir_cmds) == 1
+            assert glir_cmds[0][:3] == ('DATA', B.id, i * data.nbytes)
+
+        # Wrapping around orphans the storage
+        B.set_data(data[:5])
+        assert B.segment == 0 and B.size == 5
+        glir_cmds = B._glir.clear()
+        assert glir_cmds[0] == ('SIZE', B.id, 3 * data.nbytes)
+        assert glir_cmds[1][:3] == ('DATA', B.id, 0)
+
+        # Sub data goes into the current segment
+        B.set_data(data[:5])
+        B._glir.clear()
+        B.set_subdata(data[:2], offset=3)
+        assert B._glir.clear()[0][:3] == ('DATA', B.id, 80 + 3 * 8)
+        self.assertRaises(ValueError, B.set_subdata, data[:2], offset=4)
+
+        # Larger data reallocates all segments
+        B.set_data(np.zeros((20, 2), np.float32))
+        assert B.segment == 0 and B.nbytes == 3 * 20 * 8
+        self.assertRaises(RuntimeError, B.resize_bytes, 10)
+        self.assertRaises(ValueError, StreamingVertexBuffer, segments=0)
+
+
 # -----------------------------------------------------------------------------
 class IndexBufferTest(unittest.TestCase):
 
@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import io
 import json
 import tempfile
 
+import numpy as np
+from numpy.testing import assert_array_equal
+
 from vispy import config
 from vispy.app import Canvas
 from vispy.gloo import glir
-from vispy.testing import requires_application, run_tests_if_main
+from vispy.testing import (requires_application, run_tests_if_main,
+                           assert_raises)
 
 
 def test_queue():
@@ -48,6 +53,481 @@ def test_queue():
     shader3 = q._shared._convert_shaders('es2', ['', shader2])[1]
     assert 'precision highp float;' in shader3
 
+    # Converted shaders are reused
+    assert q._shared._convert_shaders('es2', ('', shader2))[1] is shader3
+    assert len(q._shared._converted_shaders) == 2
+
+
+def test_coalesce():
+    q = glir.GlirQueue()
+    parser = glir.GlirParser()
+    data = np.arange(10, dtype=np.float32)
+
+    # Adjacent and overlapping buffer writes get merged, later data wins
+    cmds1 = [('DATA', 1, 0, data[:4]), ('UNIFORM', 2, 'u', 'float', 1.0),
+             ('DATA', 1, 16, data[4:]), ('DATA', 1, 8, data[:2] + 100)]
+    cmds2 = q._shared._filter(cmds1, parser)
+    assert [c[0] for c in cmds2] == ['UNIFORM', 'DATA']
+    assert cmds2[1][2] == 0
+    merged = cmds2[1][3].view(np.float32)
+    expected = data.copy()
+    expected[2:4] = 100, 101
+    assert_array_equal(merged, expected)
+    assert q.coalesce_stats == dict(calls=2, bytes=8)
+
+    # Writes that are completely overwritten are dropped, disjoint
+    # writes are left alone, and a DRAW acts as a barrier
+    cmds1 = [('DATA', 1, 0, data[:2]), ('DATA', 1, 24, data[:2]),
+             ('DATA', 1, 0, data[:4]), ('DRAW', 3, 'triangles', (0, 3)),
+             ('DATA', 1, 0, data[:4])]
+    cmds2 = q._shared._filter(cmds1, parser)
+    assert [c[0] for c in cmds2] == ['DATA', 'DATA', 'DRAW', 'DATA']
+    assert cmds2[0] is cmds1[1]
+    assert cmds2[1] is cmds1[2]
+    assert cmds2[3] is cmds1[4]
+    assert q.coalesce_stats == dict(calls=3, bytes=16)
+
+    # Texture rows are merged along the first axis
+    im = np.arange(4 * 3 * 2, dtype=np.uint8).reshape(4, 3, 2)
+    cmds1 = [('DATA', 1, (0, 0), im[:1]), ('DATA', 1, (1, 0), im[1:3]),
+             ('DATA', 1, (3, 0), im[3:])]
+    cmds2 = q._shared._filter(cmds1, parser)
+    assert len(cmds2) == 1
+    assert cmds2[0][2] == (0, 0)
+    assert_array_equal(cmds2[0][3], im)
+
+    # Partial overlap with a different width keeps order intact
+    cmds1 = [('DATA', 1, (0, 0), im[:2]), ('DATA', 1, (1, 1), im[:1, :1]),
+             ('DATA', 1, (2, 0), im[2:])]
+    cmds2 = q._shared._filter(cmds1, parser)
+    assert [c[2] for c in cmds2] == [(0, 0), (1, 1), (2, 0)]
+
+
+class _DummyGlirObject(object):
+    def __init__(self):
+        self.calls = []
+
+    def delete(self):
+        self.calls.append('delete')
+
+    def set_data(self, offset, data):
+        self.calls.append(('set_data', offset, data))
+
+
+def test_parser_dispatch_and_delete():
+    parser = glir.GlirParser()
+    obs = dict((i, _DummyGlirObject()) for i in range(1, 5))
+    parser._objects.update(obs)
+
+    # Commands are dispatched to the object methods
+    parser.parse([('DATA', 1, 0, 'x'), ('DELETE', 2), ('DATA', 2, 0, 'y'),
+                  ('DELETE', 2)])
+    assert obs[1].calls == [('set_data', 0, 'x')]
+    assert obs[2].calls == ['delete']  # deleted once, DATA is ignored
+    assert parser._objects[2] is glir.JUST_DELETED
+    assert parser._just_deleted == set([2])
+
+    # Placeholders are removed in the next round, other objects stay
+    parser.parse([('DELETE', 3)])
+    assert 2 not in parser._objects
+    assert parser._objects[3] is glir.JUST_DELETED
+    assert parser._just_deleted == set([3])
+    assert len(parser._objects) == 3
+    parser.parse([])
+    assert parser._just_deleted == set()
+    assert sorted(parser._objects) == [1, 4]
+
+    # Unknown objects raise, unless known to be invalid
+    assert_raises(RuntimeError, parser.parse, [('DATA', 9, 0, 'x')])
+    parser.parse([('CREATE', 9, None), ('DATA', 9, 0, 'x')])
+
+
+def test_program_state_cache():
+    """Test that GlirProgram skips setting unchanged values
+    """
+    # Record GL calls instead of executing them
+    calls = []
+    names = ('glCreateProgram', 'glCreateTexture', 'glUseProgram',
+             'glUniform1i', 'glUniform3fv', 'glUniform4fv', 'glVertexAttrib2f')
+    orig_funcs = dict((name, getattr(glir.gl, name)) for name in names)
+
+    def make_func(name):
+        def func(*args):
+            if not name.startswith('glCreate'):
+                calls.append(name)
+            return 1
+        return func
+    for name in names:
+        setattr(glir.gl, name, make_func(name))
+    try:
+        parser = glir.GlirParser()
+        prog = glir.GlirProgram(parser, 1)
+        prog._linked = True  # pretend that shaders were set
+        prog._handles = dict(u_color=1, u_colors=2, s_tex=3, a_pos=4)
+
+        color = np.array([1, 0, 0, 1], np.float32)
+        prog.set_uniform('u_color', 'vec4', color)
+        prog.set_uniform('u_color', 'vec4', color.copy())
+        assert calls == ['glUseProgram', 'glUniform4fv']
+        assert parser.skipped_calls['uniform'] == 1
+        prog.set_uniform('u_color', 'vec4', color[::-1].copy())
+        assert calls[-1] == 'glUniform4fv'
+
+        # Setting an element of an array invalidates the array
+        colors = np.ones(6, np.float32)
+        prog.set_uniform('u_colors', 'vec3', colors)
+        prog._handles['u_colors[1]'] = 5
+        prog.set_uniform('u_colors[1]', 'vec3', np.zeros(3, np.float32))
+        del calls[:]
+        prog.set_uniform('u_colors', 'vec3', colors)
+        prog.set_uniform('u_colors[1]', 'vec3', np.zeros(3, np.float32))
+        assert calls == ['glUniform3fv', 'glUniform3fv']
+
+        # The sampler uniform only needs to be set once
+        for id_ in (7, 8):
+            parser._objects[id_] = glir.GlirTexture2D(parser, id_)
+        del calls[:]
+        prog.set_texture('s_tex', 7)
+        prog.set_texture('s_tex', 8)
+        assert calls == ['glUniform1i']
+        assert parser.skipped_calls['texture'] == 1
+
+        # Unchanged attributes are skipped
+        prog.set_attribute('a_pos', 'vec2', (0, 1., 2.))
+        prog.set_attribute('a_pos', 'vec2', (0, 1., 2.))
+        assert parser.skipped_calls['attribute'] == 1
+        prog.set_attribute('a_pos', 'vec2', (0, 1., 3.))
+        assert parser.skipped_calls['attribute'] == 1
+    finally:
+        for name, func in orig_funcs.items():
+            setattr(glir.gl, name, func)
+
+
+def test_program_sharing():
+    """Test that GlirPrograms with the same code share a GL program, but
+    keep their own uniform values
+    """
+    calls = []
+    names = ('glCreateProgram', 'glCreateShader', 'glShaderSource',
+             'glCompileShader', 'glGetShaderParameter', 'glAttachShader',
+             'glLinkProgram', 'glGetProgramParameter', 'glDetachShader',
+             'glDeleteShader', 'glDeleteProgram', 'glUseProgram',
+             'glGetUniformLocation', 'glUniform4fv')
+    orig_funcs = dict((name, getattr(glir.gl, name)) for name in names)
+    handles = iter(range(10, 100))
+
+    def make_func(name):
+        def func(*args):
+            calls.append((name, ) + args)
+            if name == 'glCreateProgram':
+                return next(handles)
+            if name == 'glGetProgramParameter':
+                return args[1] == glir.gl.GL_LINK_STATUS
+            return 1
+        return func
+    for name in names:
+        setattr(glir.gl, name, make_func(name))
+
+    def count(name):
+        return len([c for c in calls if c[0] == name])
+    try:
+        parser = glir.GlirParser()
+        progs = [glir.GlirProgram(parser, i) for i in range(3)]
+        progs[0].set_shaders('vert', 'frag')
+        progs[1].set_shaders('vert', 'frag')
+        progs[2].set_shaders('vert2', 'frag')
+        assert count('glLinkProgram') == 2
+        assert count('glCompileShader') == 3  # 'frag' is compiled once
+        assert progs[0].handle == progs[1].handle != progs[2].handle
+        for prog in progs:
+            prog._validated = True
+
+        # Uniforms of a program are uploaded when it uses the GL program
+        red = np.array([1, 0, 0, 1], np.float32)
+        blue = np.array([0, 0, 1, 1], np.float32)
+        del calls[:]
+        progs[0].set_uniform('u_color', 'vec4', red)
+        progs[1].set_uniform('u_color', 'vec4', blue)
+        uploads = [c[3] for c in calls if c[0] == 'glUniform4fv']
+        assert len(uploads) == 1 and uploads[0] is red
+        for prog, color in [(progs[1], blue), (progs[0], red)]:
+            del calls[:]
+            prog._pre_draw()
+            uploads = [c[3] for c in calls if c[0] == 'glUniform4fv']
+            assert len(uploads) == 1 and uploads[0] is color
+        del calls[:]
+        progs[0]._pre_draw()
+        progs[1].set_uniform('u_color', 'vec4', red.copy())
+        progs[1]._pre_draw()  # same value as progs[0]
+        assert count('glUniform4fv') == 0
+
+        # The GL program is kept for reuse after its last user is deleted
+        del calls[:]
+        progs[0].delete()
+        progs[1].delete()
+        assert count('glDeleteProgram') == 0
+        assert list(parser._idle_programs) == [('vert', 'frag')]
+        handle = progs[0].handle
+        progs[2].set_shaders('vert', 'frag')  # e.g. a filter is removed
+        progs[2].set_shaders('vert2', 'frag')  # and added again
+        assert progs[2].handle != handle
+        progs[2].set_shaders('vert', 'frag')
+        assert progs[2].handle == handle
+        assert count('glLinkProgram') == 0
+        assert count('glCompileShader') == 0
+
+        # Idle programs are deleted when evicted, and so are their shaders
+        # once no other linked program uses them
+        orig_size = glir.IDLE_PROGRAMS_CACHE_SIZE
+        glir.IDLE_PROGRAMS_CACHE_SIZE = 1
+        try:
+            progs[2].set_shaders('vert3', 'frag')
+            assert count('glDeleteProgram') == 1
+            assert count('glDeleteShader') == 1  # 'vert2'
+            assert list(parser._idle_programs) == [('vert', 'frag')]
+            progs[2].set_shaders('vert4', 'frag')
+            assert count('glDeleteProgram') == 2
+            assert count('glDeleteShader') == 2  # 'frag' is still used
+            assert list(parser._idle_programs) == [('vert3', 'frag')]
+            assert sorted(parser._linked_programs) == [('vert3', 'frag'),
+                                                       ('vert4', 'frag')]
+            assert sorted(parser._compiled_shaders) == [
+                ('fragment', 'frag'), ('vertex', 'vert3'),
+                ('vertex', 'vert4')]
+        finally:
+            glir.IDLE_PROGRAMS_CACHE_SIZE = orig_size
+    finally:
+        for name, func in orig_funcs.items():
+            setattr(glir.gl, name, func)
+
+
+def test_program_vao():
+    """Test that GlirProgram records attribute bindings in a VAO
+    """
+    # Record GL calls instead of executing them
+    calls = []
+    names = ('glCreateProgram', 'glCreateBuffer', 'glUseProgram',
+             'glBindBuffer', 'glBindTexture', 'glEnableVertexAttribArray',
+             'glDisableVertexAttribArray', 'glVertexAttribPointer',
+             'glVertexAttrib1f', 'glVertexAttrib2f',
+             'glDrawArrays', 'check_error')
+    orig_funcs = dict((name, getattr(glir.gl, name)) for name in names)
+    vao_names = ('glGenVertexArray', 'glBindVertexArray',
+                 'glDeleteVertexArray', 'glVertexAttribDivisor')
+    orig_vao_funcs = dict((name, getattr(glir, name)) for name in vao_names)
+    divisors = {}
+
+    def make_func(name):
+        def func(*args):
+            calls.append(name)
+            if name == 'glVertexAttribDivisor':
+                divisors[args[0]] = args[1]
+            return 1
+        return func
+    for name in names:
+        setattr(glir.gl, name, make_func(name))
+    for name in vao_names:
+        setattr(glir, name, make_func(name))
+    try:
+        parser = glir.GlirParser()
+        parser._objects[2] = glir.GlirVertexBuffer(parser, 2)
+        prog = glir.GlirProgram(parser, 1)
+        prog._linked = prog._validated = True  # pretend that shaders were set
+        prog._handles = dict(a_pos=1, a_size=2)
+        prog.set_attribute('a_pos', 'vec2', (2, 8, 0))
+        prog.set_attribute('a_size', 'float', (0, 3.))
+
+        # Without VAO support, the attributes are set for each draw
+        for i in range(2):
+            del calls[:]
+            prog.draw('points', (0, 10))
+            assert calls.count('glVertexAttribPointer') == 1
+            assert 'glBindVertexArray' not in calls
+
+        # With VAOs, the pointers are only set when the binding changes
+        parser.env['vao_context'] = 'ctx'
+        del calls[:]
+        prog.draw('points', (0, 10))
+        assert calls.count('glGenVertexArray') == 1
+        assert calls.count('glVertexAttribPointer') == 1
+        for i in range(2):
+            del calls[:]
+            prog.draw('points', (0, 10))
+            assert calls.count('glBindVertexArray') == 2  # bind and unbind
+            assert 'glGenVertexArray' not in calls
+            assert 'glVertexAttribPointer' not in calls
+            assert calls.count('glVertexAttrib1f') == 1  # constant value
+        prog.set_attribute('a_pos', 'vec2', (2, 8, 4))
+        del calls[:]
+        prog.draw('points', (0, 10))
+        assert 'glGenVertexArray' not in calls
+        assert calls.count('glVertexAttribPointer') == 1
+
+        # Each context has its own VAO
+        parser.env['vao_context'] = 'ctx2'
+        del calls[:]
+        prog.draw('points', (0, 10))
+        assert calls.count('glGenVertexArray') == 1
+        assert calls.count('glVertexAttribPointer') == 1
+        prog._delete_vaos()
+        assert prog._vaos == {}
+        assert calls[-1] == 'glDeleteVertexArray'
+
+        # Divisors are only set for instanced programs (the function may
+        # not be available), and the VAO records divisors of 0 for bindings
+        # that are no longer instanced, including constant values
+        del calls[:]
+        prog.draw('points', (0, 10))
+        assert 'glVertexAttribDivisor' not in calls
+        prog.set_attribute('a_pos', 'vec2', (2, 8, 0, 1))
+        prog.draw('points', (0, 10))
+        assert divisors == {1: 1}
+        prog.set_attribute('a_pos', 'vec2', (2, 8, 0))
+        prog.draw('points', (0, 10))
+        assert divisors == {1: 0}
+        prog.set_attribute('a_pos', 'vec2', (2, 8, 0, 1))
+        prog.draw('points', (0, 10))
+        prog.set_attribute('a_pos', 'vec2', (0, 1., 2.))
+        del calls[:]
+        prog.draw('points', (0, 10))
+        assert divisors == {1: 0}
+        prog.draw('points', (0, 10))
+        assert calls.count('glVertexAttribDivisor') == 1
+
+        # A new buffer that gets the GL name of a deleted one is bound
+        prog.set_attribute('a_pos', 'vec2', (2, 8, 0))
+        prog.draw('points', (0, 10))
+        parser._objects[3] = glir.GlirVertexBuffer(parser, 3)
+        assert parser._objects[3].handle == parser._objects[2].handle
+        prog.set_attribute('a_pos', 'vec2', (3, 8, 0))
+        del calls[:]
+        prog.draw('points', (0, 10))
+        assert calls.count('glVertexAttribPointer') == 1
+    finally:
+        for name, func in orig_funcs.items():
+            setattr(glir.gl, name, func)
+        for name, func in orig_vao_funcs.items():
+            setattr(glir, name, func)
+
+
+def test_program_instanced():
+    """Test attribute divisors and instanced draws in GlirProgram
+    """
+    calls = []
+    names = ('glCreateProgram', 'glCreateBuffer', 'glUseProgram',
+             'glBindBuffer', 'glBindTexture', 'glEnableVertexAttribArray',
+             'glVertexAttribPointer', 'glDrawArrays', 'check_error')
+    orig_funcs = dict((name, getattr(glir.gl, name)) for name in names)
+    glir_names = ('glVertexAttribDivisor', 'glDrawArraysInstanced')
+    orig_glir_funcs = dict((name, getattr(glir, name)) for name in glir_names)
+
+    def make_func(name):
+        def func(*args):
+            calls.append((name, ) + args)
+            return 1
+        return func
+    for name in names:
+        setattr(glir.gl, name, make_func(name))
+    for name in glir_names:
+        setattr(glir, name, make_func(name))
+    try:
+        parser = glir.GlirParser()
+        parser._objects[2] = glir.GlirVertexBuffer(parser, 2)
+        prog = glir.GlirProgram(parser, 1)
+        prog._linked = prog._validated = True  # pretend that shaders were set
+        prog._handles = dict(a_pos=1, a_offset=2)
+        prog.set_attribute('a_pos', 'vec2', (2, 8, 0))
+        prog.set_attribute('a_offset', 'vec2', (2, 8, 0, 1))
+
+        # Regular draw is unaffected
+        prog.draw('points', (0, 10))
+        assert ('glDrawArrays', glir.gl.GL_POINTS, 0, 10) in calls
+        assert ('glVertexAttribDivisor', 2, 1) in calls
+        assert ('glVertexAttribDivisor', 2, 0) in calls  # reset after draw
+        del calls[:]
+        prog.draw('points', (0, 10), 5)
+        assert ('glDrawArraysInstanced', glir.gl.GL_POINTS, 0, 10, 5) in calls
+        # Zero instances draws nothing
+        del calls[:]
+        prog.draw('points', (0, 10), 0)
+        assert not [c for c in calls if c[0].startswith('glDraw')]
+    finally:
+        for name, func in orig_funcs.items():
+            setattr(glir.gl, name, func)
+        for name, func in orig_glir_funcs.items():
+            setattr(glir, name, func)
+
+
+class _CollectingParser(glir.BaseGlirParser):
+    def __init__(self):
+        super(_CollectingParser, self).__init__()
+        self.blocks = []
+
+    def parse(self, commands):
+        self.blocks.append(list(commands))
+
+
+def test_binary_stream():
+    """Test recording and replaying binary GLIR streams
+    """
+    data = np.zeros(4, [('a_position', np.float32, 3)])
+    data['a_position'] = np.random.rand(4, 3)
+    blocks = [[('CURRENT', 0)],
+              [('CREATE', 1, 'VertexBuffer'), ('SIZE', 1, data.nbytes),
+               ('DATA', 1, 0, data),
+               ('UNIFORM', 2, 'u_scale', 'vec2',
+                np.array([1., 2.], np.float32)),
+               ('FUNC', 'glBlendFunc', 'src_alpha', 770),
+               ('DATA', 3, (0, 0), np.ones((2, 3, 1), np.uint8)),
+               ('FRAMEBUFFER', 4, True), ('SHADERS', 2, u'vert \xe9', 'frag'),
+               ('DRAW', 2, 'triangles', (0, 4)), ('FOO', None, 1.5, [1, 2])]]
+    f = io.BytesIO()
+    parser = glir.glir_recorder(_CollectingParser, f)()
+    for block in blocks:
+        parser.parse(block)
+    assert parser.blocks == blocks
+
+    f.seek(0)
+    blocks2 = glir.read_glir(f)
+    assert len(blocks2) == len(blocks)
+    for block, block2 in zip(blocks, blocks2):
+        assert len(block) == len(block2)
+        for command, command2 in zip(block, block2):
+            assert len(command) == len(command2)
+            for a, b in zip(command, command2):
+                if isinstance(a, np.ndarray):
+                    assert a.dtype == b.dtype
+                    assert_array_equal(a, b)
+                else:
+                    assert a == b
+                    assert type(a) is type(b) or isinstance(a, str)
+
+    # Replay with a parser that can only be timed per flush
+    f.seek(0)
+    parser2 = _CollectingParser()
+    stats = glir.replay_glir(f, parser2)
+    assert len(parser2.blocks) == 2
+    assert stats['DATA']['count'] == 2
+    assert stats['DATA']['nbytes'] > data.nbytes + 6
+    assert stats['DATA']['time'] is None
+    assert stats['FLUSH']['count'] == 2
+    assert stats['FLUSH']['time'] >= 0
+
+    # Replay with a parser that is timed per command
+    f = io.BytesIO()
+    glir.write_glir(f, [('DATA', 1, 0, data), ('DATA', 1, 0, data)])
+    f.seek(0)
+    parser3 = glir.GlirParser()
+    parser3._objects[1] = _DummyGlirObject()
+    stats = glir.replay_glir(f, parser3)
+    assert len(parser3._objects[1].calls) == 2
+    assert stats['DATA']['count'] == 2
+    assert stats['DATA']['time'] >= 0
+    assert '_parse' not in parser3.__dict__  # hook is removed
+
+    f = io.BytesIO(b'FOO')
+    assert_raises(ValueError, glir.read_glir, f)
+
 
 @requires_application()
 def test_log_parser():
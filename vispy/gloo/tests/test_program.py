@@ -64,7 +64,27 @@ class ProgramTest(unittest.TestCase):
         program.set_shaders('C', 'D')
         assert program.shaders[0] == "C"
         assert program.shaders[1] == "D"
-        
+
+    def test_code_variables_cache(self):
+        vert = 'uniform float A; attribute vec2 B;'
+        frag = 'uniform vec4 C[2];'
+        program1 = Program(vert, frag)
+        program2 = Program(vert, frag)
+
+        # Programs with the same code share the parsed variables
+        assert program1._code_variables is program2._code_variables
+        assert sorted(program1._code_variables) == ['A', 'B', 'C', 'C[0]',
+                                                    'C[1]']
+        program1['A'] = 1
+        program2['A'] = 2
+        assert program1['A'] == 1
+        assert program2['A'] == 2
+
+        program2.set_shaders(vert, 'uniform vec4 D;')
+        assert program2._code_variables is not program1._code_variables
+        assert 'D' in program2._code_variables
+        assert 'D' not in program1._code_variables
+
     @requires_application()
     def test_error(self):
         vert = '''
@@ -283,4 +303,84 @@ class ProgramTest(unittest.TestCase):
         finally:
             forget_canvas(dummy_canvas)
 
+    def test_draw_instanced(self):
+        program = Program("attribute float A; attribute vec2 B;", "foo")
+        program['A'] = np.zeros((10,), np.float32)
+        offsets = gloo.VertexBuffer(np.zeros((4, 2), np.float32), divisor=1)
+        assert offsets.divisor == 1
+        program['B'] = offsets
+
+        dummy_canvas = DummyCanvas()
+        glir = dummy_canvas.context.glir
+        set_current_canvas(dummy_canvas)
+        try:
+            # Per-instance attributes do not need the size of the others
+            program.draw('triangles', instances=4)
+            cmds = glir.clear()
+            attr = [c for c in cmds if c[0] == 'ATTRIBUTE' and c[2] == 'B']
+            assert attr[-1][-1] == (offsets.id, 8, 0, 1)
+            glir_cmd = cmds[-1]
+            assert glir_cmd[0] == 'DRAW'
+            assert glir_cmd[-2] == (0, 10)
+            assert glir_cmd[-1] == 4
+
+            # But they need to be large enough, and instances is required
+            self.assertRaises(RuntimeError, program.draw, 'triangles',
+                              instances=5)
+            self.assertRaises(RuntimeError, program.draw, 'triangles')
+            self.assertRaises(ValueError, program.draw, 'triangles',
+                              instances=-1)
+
+            # Plain attributes can also be drawn with instances
+            program['B'] = gloo.VertexBuffer(np.zeros((10, 2), np.float32))
+            program.draw('triangles', instances=100)
+            assert glir.clear()[-1][-1] == 100
+        finally:
+            forget_canvas(dummy_canvas)
+
+    def test_draw_streaming(self):
+        program = Program("attribute vec2 A;", "foo")
+        data = np.zeros((10, 2), np.float32)
+        vbo = gloo.StreamingVertexBuffer(data, segments=2)
+        program['A'] = vbo
+
+        dummy_canvas = DummyCanvas()
+        glir = dummy_canvas.context.glir
+        set_current_canvas(dummy_canvas)
+        try:
+            # The attribute follows the segment that was written last
+            for i, offset in enumerate((0, 80, 0)):
+                if i > 0:
+                    vbo.set_data(data)
+                program.draw('triangles')
+                cmds = glir.clear()
+                attr = [c for c in cmds if c[0] == 'ATTRIBUTE']
+                assert attr[-1][-1] == (vbo.id, 8, offset)
+            # No new attribute command if the buffer did not move
+            program.draw('triangles')
+            cmds = glir.clear()
+            assert not [c for c in cmds if c[0] == 'ATTRIBUTE']
+        finally:
+            forget_canvas(dummy_canvas)
+
+    def test_draw_progressive_upload(self):
+        program = Program("attribute float A; uniform sampler2D T;", "foo")
+        program['A'] = np.zeros((10,), np.float32)
+        tex = gloo.Texture2D(shape=(10, 10))
+        tex.upload_budget = 40  # one row
+        tex.set_data(np.zeros((10, 10), np.float32))
+        program['T'] = tex
+
+        dummy_canvas = DummyCanvas()
+        set_current_canvas(dummy_canvas)
+        try:
+            # Each draw sends the next row
+            assert program.pending_upload_nbytes == 400
+            program.draw('triangles')
+            assert program.pending_upload_nbytes == 360
+            program.draw('triangles')
+            assert tex.upload_progress == 0.2
+        finally:
+            forget_canvas(dummy_canvas)
+
 run_tests_if_main()
@@ -7,12 +7,31 @@ import unittest
 import numpy as np
 
 from vispy.gloo import Texture1D, Texture2D, Texture3D, TextureAtlas
+from vispy.gloo import context, glir
+from vispy.gloo.context import set_current_canvas, forget_canvas
 from vispy.testing import requires_pyopengl, run_tests_if_main, assert_raises
 
 # here we test some things that will be true of all Texture types:
 Texture = Texture2D
 
 
+class DummyParser(glir.BaseGlirParser):
+
+    def convert_shaders(self):
+        return 'desktop'
+
+    def parse(self, commands):
+        pass
+
+
+class DummyCanvas:
+
+    def __init__(self):
+        self.context = context.GLContext()
+        self.context.shared.parser = DummyParser()
+        self.context.glir.flush = lambda *args: None  # No flush
+
+
 # ----------------------------------------------------------------- Texture ---
 class TextureTest(unittest.TestCase):
 
@@ -434,6 +453,55 @@ def test_texture_1D():
     T.set_data(data)
 
 
+def test_texture_progressive_upload():
+    data = np.arange(10 * 20 * 30, dtype=np.float32).reshape(10, 20, 30)
+
+    # Slabs along the first axis
+    T = Texture3D(shape=(10, 20, 30))
+    T.upload_budget = 2 * 20 * 30 * 4  # two planes
+    T._glir.clear()
+    T.set_data(data)
+    glir_cmds = T._glir.clear()
+    assert [c[0] for c in glir_cmds] == ['SIZE']
+    assert T.pending_upload_nbytes == data.nbytes
+    assert T.upload_progress == 0.
+    assert T.upload_pending() == data.nbytes * 8 // 10
+    assert T.upload_progress == 0.2
+    glir_cmd = T._glir.clear()[-1]
+    assert glir_cmd[:3] == ('DATA', T.id, (0, 0, 0))
+    assert glir_cmd[3].shape == (2, 20, 30, 1)
+    while T.upload_pending():
+        pass
+    offsets = [c[2] for c in T._glir.clear()]
+    assert offsets == [(z, 0, 0) for z in (2, 4, 6, 8)]
+    assert T.upload_progress == 1.
+
+    # Tiles when a single slab exceeds the budget; partial writes are
+    # queued after the pending data
+    T = Texture2D(shape=(4, 100))
+    T.upload_budget = 160
+    T._glir.clear()
+    T.set_data(np.zeros((4, 100), np.float32))
+    T[0, :2] = np.ones((1, 2), np.float32)
+    assert T._glir.clear()[-1][0] == 'SIZE'
+    T.upload_pending(np.inf)
+    glir_cmds = T._glir.clear()
+    assert len(glir_cmds) == 4 * 3 + 1
+    assert glir_cmds[0][2] == (0, 0) and glir_cmds[1][2] == (0, 40)
+    assert glir_cmds[-1][2] == (0, 0) and glir_cmds[-1][3].shape[1] == 2
+
+    # Data within the budget is sent directly; a reset clears pending data
+    T.set_data(np.zeros((4, 100), np.float32))
+    T.set_data(np.zeros((1, 10), np.float32))
+    assert T.pending_upload_nbytes == 0
+    assert T._glir.clear()[-1][0] == 'DATA'
+    T.set_data(np.zeros((4, 100), np.float32))
+    T.upload_budget = None
+    assert T.pending_upload_nbytes == 0
+    assert len(T._glir.clear()) == 4 * 3 + 1
+    assert_raises(ValueError, setattr, T, 'upload_budget', 0)
+
+
 # --------------------------------------------------------------- Texture3D ---
 @requires_pyopengl()
 def test_texture_3D():
@@ -577,6 +645,89 @@ class TextureAtlasTest(unittest.TestCase):
         
         reg = T.get_free_region(129, 129)
         assert reg is None
+
+    def test_atlas_packing(self):
+        T = TextureAtlas((128, 128))
+        # Regions of similar height share a shelf
+        regions = [T.get_free_region(10, h) for h in (9, 10, 11, 12)]
+        assert [r[:2] for r in regions] == [(0, 0), (10, 0), (20, 0), (30, 0)]
+        assert T.get_free_region(10, 13)[:2] == (0, 12)
+        # Regions do not overlap and stay inside the atlas
+        regions = [T.get_free_region(w, h) for w in (5, 17, 30)
+                   for h in (3, 8, 20) for _ in range(4)]
+        mask = np.zeros((128, 128), int)
+        for x, y, w, h in regions:
+            mask[y:y + h, x:x + w] += 1
+        assert mask.max() == 1 and mask.sum() == sum(w * h for w in (5, 17, 30)
+                                                     for h in (3, 8, 20)) * 4
+        # Released space is reused
+        T.release_region(regions[0])
+        assert T.get_free_region(4, 3)[:2] == regions[0][:2]
+        assert T.get_free_region(128, 128) is None
+
+    def test_atlas_evict(self):
+        evicted = []
+        T = TextureAtlas((64, 64), evict=evicted.append)
+        regions = [T.get_free_region(32, 32) for _ in range(4)]
+        assert None not in regions and T.version == 0
+        T.use_region(regions[0])
+        # The least recently used region makes room
+        assert T.get_free_region(32, 32) == regions[1]
+        assert evicted == [regions[1]] and T.version == 1
+        # A new shelf height evicts the least recently used shelf only
+        assert T.get_free_region(16, 16) == (0, 32, 16, 16)
+        assert evicted == regions[1:] and T.version == 2
+        assert T.get_free_region(48, 16) == (16, 32, 48, 16)
+        assert T.get_free_region(64, 16) == (0, 48, 64, 16)
+        assert len(evicted) == 3 and T.version == 2
+        # Locked regions are not evicted
+        T.use_region(regions[0], lock=True)
+        assert T.get_free_region(64, 32) == (0, 32, 64, 32)
+        assert len(evicted) == 7 and regions[0] not in evicted
+        assert T.get_free_region(64, 64) is None
+        T.unlock_regions()
+        assert T.get_free_region(64, 64) == (0, 0, 64, 64)
+        assert len(evicted) == 9
+
+    def test_atlas_release(self):
+        T = TextureAtlas((64, 64))
+        regions = [T.get_free_region(16, 16) for _ in range(4)]
+        assert T.get_free_region(64, 48) == (0, 16, 64, 48)
+        assert T.get_free_region(32, 16) is None
+        # Adjacent free spans are merged
+        T.release_region(regions[1])
+        T.release_region(regions[2])
+        assert T.get_free_region(32, 16) == (16, 0, 32, 16)
+        # Empty shelves can be used for another height
+        T.release_region((16, 0, 32, 16))
+        T.release_region(regions[0])
+        T.release_region(regions[3])
+        assert T.get_free_region(64, 8) == (0, 0, 64, 8)
+        assert T.get_free_region(64, 8) == (0, 8, 64, 8)
+        assert T.get_free_region(1, 1) is None
+
+    def test_atlas_grow(self):
+        T = TextureAtlas((64, 64), max_shape=(128, 128))
+        assert T.get_free_region(64, 64) == (0, 0, 64, 64)
+        # Growing requires a canvas
+        assert T.get_free_region(64, 64) is None
+        canvas = DummyCanvas()
+        glir = canvas.context.glir
+        set_current_canvas(canvas)
+        try:
+            glir.clear()
+            assert T.get_free_region(64, 64) == (0, 64, 64, 64)
+            assert T.shape == (128, 64, 3) and T.version == 1
+            assert T.get_free_region(64, 64) == (64, 0, 64, 64)
+            assert T.shape == (128, 128, 3) and T.version == 2
+            assert T.get_free_region(64, 64) == (64, 64, 64, 64)
+            assert T.get_free_region(1, 1) is None
+            # The old content is copied on the GPU
+            cmds = glir.clear()
+            assert len([c for c in cmds if c[0] == 'DRAW']) == 4
+            assert ('SIZE', T.id, (128, 128, 3), 'rgb', None) in cmds
+        finally:
+            forget_canvas(canvas)
     
     
 # --------------------------------------------------------- Texture formats ---
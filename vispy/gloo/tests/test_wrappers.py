@@ -13,6 +13,7 @@ from vispy.testing import (requires_application, run_tests_if_main,
                            assert_true, assert_equal, assert_raises)
 from vispy.gloo import read_pixels
 from vispy.gloo.glir import GlirQueue
+from vispy.gloo.context import GLContext
 from vispy.gloo import wrappers
 
 
@@ -142,6 +143,90 @@ def test_wrappers_glir():
     reset_glir()
 
 
+def test_wrappers_state_tracking():
+    """ Test that a GLContext only emits GL state that changed """
+
+    context = GLContext()
+    glir = context.glir
+
+    # Enable / disable
+    context.set_state(blend=True, depth_test=False)
+    cmds = set(glir.clear())
+    assert cmds == set([('FUNC', 'glEnable', 'blend'),
+                        ('FUNC', 'glDisable', 'depth_test')])
+    context.set_state(blend=True, depth_test=False)
+    assert glir.clear() == []
+    context.set_state(blend=True, depth_test=True)
+    assert glir.clear() == [('FUNC', 'glEnable', 'depth_test')]
+
+    # Setters, also via presets
+    context.set_state('translucent')
+    cmds = glir.clear()
+    assert len(cmds) == 2  # cull_face and blend_func
+    context.set_state('translucent')
+    assert glir.clear() == []
+    context.set_depth_mask(False)
+    context.set_depth_mask(False)
+    context.set_viewport(0, 0, 10, 10)
+    context.set_viewport((0, 0, 10, 10))
+    context.set_clear_color('red')
+    context.set_clear_color((1, 0, 0, 1))
+    cmds = glir.clear()
+    assert [cmd[1] for cmd in cmds] == ['glDepthMask', 'glViewport',
+                                        'glClearColor']
+    assert context.get_viewport() == ((0, 0, 10, 10), )
+
+    # Actions are never skipped
+    context.clear()
+    context.clear()
+    assert len(glir.clear()) == 2
+
+    # Stencil functions track each face
+    context.set_stencil_mask(4)
+    context.set_stencil_mask(4)
+    assert len(glir.clear()) == 1
+    context.set_stencil_mask(5, 'front')
+    context.set_stencil_mask(5, 'front')
+    context.set_stencil_mask(4)
+    assert len(glir.clear()) == 2
+
+    # Alpha blend factors that keep premultiplied colors
+    context.premultiplied_alpha = True
+    context.set_blend_func('src_alpha', 'one')
+    context.set_blend_func('src_alpha', 'one_minus_src_alpha')
+    context.set_blend_func('src_alpha', 'one', 'one', 'one')
+    assert [cmd[2:] for cmd in glir.clear()] == [
+        ('src_alpha', 'one', 'zero', 'one'),
+        ('src_alpha', 'one_minus_src_alpha', 'one', 'one_minus_src_alpha'),
+        ('src_alpha', 'one', 'one', 'one')]
+    context.premultiplied_alpha = False
+    context.set_blend_func('src_alpha', 'one')
+    assert glir.clear()[0][2:] == ('src_alpha', 'one', 'src_alpha', 'one')
+
+    # Invalidate when GL was used directly
+    context.invalidate_gl_state()
+    context.set_state(blend=True)
+    context.set_depth_mask(False)
+    assert len(glir.clear()) == 2
+
+    # Global functions use the state of the current context
+    class StubCanvas(object):
+        pass
+    canvas = StubCanvas()
+    canvas.context = context
+    wrappers.get_current_canvas = lambda x=None: canvas
+    try:
+        gloo.set_state(blend=True, depth_mask=False)
+        assert glir.clear() == []
+        gloo.set_state(blend=False)
+        assert glir.clear() == [('FUNC', 'glDisable', 'blend')]
+        gloo.invalidate_gl_state()
+        gloo.set_state(blend=False)
+        assert glir.clear() == [('FUNC', 'glDisable', 'blend')]
+    finally:
+        reset_glir()
+
+
 def assert_cmd_raises(E, fun, *args, **kwargs):
     gloo.flush()  # no error here
     fun(*args, **kwargs)
@@ -5,6 +5,8 @@
 # -----------------------------------------------------------------------------
 
 import math
+import bisect
+from collections import deque, OrderedDict
 
 import numpy as np
 import warnings
@@ -95,6 +97,12 @@ class BaseTexture(GLObject):
         self._format = format
         self._internalformat = internalformat
 
+        # Progressive uploads (disabled by default)
+        self._upload_budget = None
+        self._pending_uploads = deque()  # (offset, data) chunks
+        self._pending_nbytes = 0
+        self._queued_nbytes = 0
+
         # Set texture parameters (before setting data)
         self.interpolation = interpolation or 'nearest'
         self.wrapping = wrapping or 'clamp_to_edge'
@@ -275,6 +283,8 @@ class BaseTexture(GLObject):
         self._internalformat = internalformat
         self._glir.command('SIZE', self._id, self._shape, self._format, 
                            self._internalformat)
+        # Pending data would be discarded by the SIZE command anyway
+        self._clear_pending_uploads()
 
     def set_data(self, data, offset=None, copy=False):
         """Set texture data
@@ -320,9 +330,87 @@ class BaseTexture(GLObject):
             if offset[i] + data.shape[i] > self._shape[i]:
                 raise ValueError("Data is too large")
         
-        # Send GLIR command
-        self._glir.command('DATA', self._id, offset, data)
+        # Send GLIR command, or queue chunks for a progressive upload
+        budget = self._upload_budget
+        if budget is None or not (self._pending_uploads or
+                                  data.nbytes > budget):
+            self._glir.command('DATA', self._id, offset, data)
+        else:
+            for chunk in _split_data(data, tuple(offset), budget):
+                self._pending_uploads.append(chunk)
+            self._pending_nbytes += data.nbytes
+            self._queued_nbytes += data.nbytes
     
+    @property
+    def upload_budget(self):
+        """ The maximum number of bytes to upload per draw, or None
+
+        When set, data that is larger than the budget is split into
+        slabs (or tiles) that are uploaded progressively, one budget's
+        worth each time the texture is drawn (see ``upload_pending()``).
+        The texture can be drawn meanwhile, showing the data that has
+        arrived so far. Default None (upload all data at once).
+        """
+        return self._upload_budget
+
+    @upload_budget.setter
+    def upload_budget(self, value):
+        if value is not None:
+            value = int(value)
+            if value <= 0:
+                raise ValueError('upload_budget must be > 0, not %s' % value)
+        self._upload_budget = value
+        if value is None:
+            self.upload_pending(np.inf)
+
+    @property
+    def pending_upload_nbytes(self):
+        """ The number of bytes that still need to be uploaded """
+        return self._pending_nbytes
+
+    @property
+    def upload_progress(self):
+        """ Fraction (0-1) of the queued data that has been uploaded """
+        if not self._queued_nbytes:
+            return 1.0
+        return ((self._queued_nbytes - self._pending_nbytes) /
+                float(self._queued_nbytes))
+
+    def upload_pending(self, nbytes=None):
+        """ Send the next chunks of a progressive upload
+
+        Parameters
+        ----------
+        nbytes : int | None
+            The maximum number of bytes to send. At least one chunk
+            is sent if data is pending. Default is ``upload_budget``.
+
+        Returns
+        -------
+        nbytes : int
+            The number of bytes that still need to be uploaded.
+        """
+        if nbytes is None:
+            nbytes = self._upload_budget or np.inf
+        sent = 0
+        while self._pending_uploads:
+            offset, data = self._pending_uploads[0]
+            if sent and sent + data.nbytes > nbytes:
+                break
+            self._pending_uploads.popleft()
+            self._glir.command('DATA', self._id, offset,
+                               np.ascontiguousarray(data))
+            sent += data.nbytes
+        self._pending_nbytes -= sent
+        if not self._pending_uploads:
+            self._clear_pending_uploads()
+        return self._pending_nbytes
+
+    def _clear_pending_uploads(self):
+        self._pending_uploads.clear()
+        self._pending_nbytes = 0
+        self._queued_nbytes = 0
+
     def __setitem__(self, key, data):
         """ x.__getitem__(y) <==> x[y] """
         
@@ -383,6 +471,35 @@ class BaseTexture(GLObject):
             self.__class__.__name__, self._shape, self._format, id(self))
 
 
+def _split_data(data, offset, budget, axis=0):
+    """ Split texture data into (offset, chunk) pairs of at most budget
+    bytes, by slicing along the first axes. A chunk is never smaller
+    than a single texel.
+    """
+    ndim = len(offset)
+    n = data.shape[axis]
+    if data.nbytes <= budget or n == 0:
+        return [(offset, data)]
+    nbytes_per = data.nbytes // n
+    chunks = []
+    if nbytes_per <= budget or axis == ndim - 1:
+        step = max(1, budget // nbytes_per)
+        for i in range(0, n, step):
+            index = (slice(None),) * axis + (slice(i, i + step),)
+            chunk_offset = offset[:axis] + (offset[axis] + i,) + \
+                offset[axis + 1:]
+            chunks.append((chunk_offset, data[index]))
+    else:
+        # A single slab is too large; split it along the next axis
+        for i in range(n):
+            index = (slice(None),) * axis + (slice(i, i + 1),)
+            chunk_offset = offset[:axis] + (offset[axis] + i,) + \
+                offset[axis + 1:]
+            chunks.extend(_split_data(data[index], chunk_offset, budget,
+                                      axis + 1))
+    return chunks
+
+
 # --------------------------------------------------------- Texture1D class ---
 class Texture1D(BaseTexture):
     """ One dimensional texture
@@ -799,19 +916,65 @@ class TextureEmulated3D(Texture2D):
 
 
 # ------------------------------------------------------ TextureAtlas class ---
+_atlas_copy_vert = """
+attribute vec2 a_position;
+varying vec2 v_texcoord;
+void main() {
+    v_texcoord = (a_position + 1.0) / 2.0;
+    gl_Position = vec4(a_position, 0.0, 1.0);
+}
+"""
+
+_atlas_copy_frag = """
+uniform sampler2D u_texture;
+varying vec2 v_texcoord;
+void main() {
+    gl_FragColor = texture2D(u_texture, v_texcoord);
+}
+"""
+
+
+def _round_atlas_shape(shape):
+    """Round an atlas shape (height, width) to powers of 2"""
+    shape = np.array(shape, int)
+    assert shape.ndim == 1 and shape.size == 2
+    return tuple(int(s) for s in 2 ** (np.log2(shape) + 0.5).astype(int))
+
+
+def _remove_sorted(items, item):
+    """Remove an item from a sorted list"""
+    del items[bisect.bisect_left(items, item)]
+
+
 class TextureAtlas(Texture2D):
     """Group multiple small data regions into a larger texture.
 
-    The algorithm is based on the article by Jukka Jylänki : "A Thousand Ways
-    to Pack the Bin - A Practical Approach to Two-Dimensional Rectangle Bin
-    Packing", February 27, 2010. More precisely, this is an implementation of
-    the Skyline Bottom-Left algorithm based on C++ sources provided by Jukka
-    Jylänki at: http://clb.demon.fi/files/RectangleBinPack/.
+    Regions are packed on shelves: horizontal strips with the height of
+    the region rounded up to a multiple of 4 pixels. For each shelf
+    height, the free spans of the shelves are kept in a list sorted by
+    width, so finding room for a region takes logarithmic time. Released
+    regions are merged with the adjacent free spans, and shelves that
+    become empty are released, so that their rows can be used for shelves
+    of another height.
+
+    When the atlas is full, it doubles in size (up to ``max_shape``),
+    alternating between height and width. The existing regions are
+    copied on the GPU, which requires a current canvas. If the atlas
+    cannot grow and ``evict`` is given, regions are evicted until the new
+    region fits: the least recently used regions (see ``use_region``) of
+    the same shelf height, or else the shelves whose regions were used
+    least recently. Locked regions are never evicted.
 
     Parameters
     ----------
     shape : tuple of int
         Texture shape (optional).
+    max_shape : tuple of int | None
+        The maximum shape the atlas can grow to. Default None (the atlas
+        does not grow).
+    evict : callable | None
+        Function that is called with the bounds of each region that is
+        evicted. Default None (regions are not evicted).
 
     Notes
     -----
@@ -822,15 +985,36 @@ class TextureAtlas(Texture2D):
         >>> bounds = atlas.get_free_region(20, 30)
         >>> atlas.set_region(bounds, np.random.rand(20, 30).T)
     """
-    def __init__(self, shape=(1024, 1024)):
-        shape = np.array(shape, int)
-        assert shape.ndim == 1 and shape.size == 2
-        shape = tuple(2 ** (np.log2(shape) + 0.5).astype(int)) + (3,)
-        self._atlas_nodes = [(0, 0, shape[1])]
-        data = np.zeros(shape, np.float32)
+    def __init__(self, shape=(1024, 1024), max_shape=None, evict=None):
+        shape = _round_atlas_shape(shape)
+        if max_shape is None:
+            self._max_shape = shape
+        else:
+            self._max_shape = tuple(max(s, m) for s, m in
+                                    zip(shape, _round_atlas_shape(max_shape)))
+        self._evict = evict
+        self._version = 0
+        self._reset_regions()
+        data = np.zeros(shape + (3,), np.uint8)
         super(TextureAtlas, self).__init__(data, interpolation='linear',
                                            wrapping='clamp_to_edge')
 
+    def _reset_regions(self):
+        self._shelves = {}  # y of each shelf -> shelf height
+        self._spans = {}  # y of each shelf -> sorted list of free (x, w)
+        self._free = {}  # shelf height -> sorted list of free (w, x, y)
+        self._rows = []  # sorted list of free (y, h) below the shelf top
+        self._shelf_top = 0  # y of the rows above all shelves
+        self._regions = OrderedDict()  # region -> shelf height, LRU order
+        self._locked = set()
+
+    @property
+    def version(self):
+        """Counter that increases when regions move in texture coordinates
+        (i.e. the atlas grows) or when regions are evicted.
+        """
+        return self._version
+
     def get_free_region(self, width, height):
         """Get a free region of given size and allocate it
 
@@ -847,66 +1031,203 @@ class TextureAtlas(Texture2D):
             A newly allocated region as (x, y, w, h) or None
             (if failed).
         """
-        best_height = best_width = np.inf
-        best_index = -1
-        for i in range(len(self._atlas_nodes)):
-            y = self._fit(i, width, height)
-            if y >= 0:
-                node = self._atlas_nodes[i]
-                if (y+height < best_height or
-                        (y+height == best_height and node[2] < best_width)):
-                    best_height = y+height
-                    best_index = i
-                    best_width = node[2]
-                    region = node[0], y, width, height
-        if best_index == -1:
+        width, height = int(width), int(height)
+        if width > self._max_shape[1] or height > self._max_shape[0]:
             return None
+        while True:
+            region = self._allocate(width, height)
+            if region is not None:
+                return region
+            if not (self._grow(width, height) or
+                    self._evict_regions(self._shelf_height(height))):
+                return None
 
-        node = region[0], region[1] + height, width
-        self._atlas_nodes.insert(best_index, node)
-        i = best_index+1
-        while i < len(self._atlas_nodes):
-            node = self._atlas_nodes[i]
-            prev_node = self._atlas_nodes[i-1]
-            if node[0] < prev_node[0]+prev_node[2]:
-                shrink = prev_node[0]+prev_node[2] - node[0]
-                x, y, w = self._atlas_nodes[i]
-                self._atlas_nodes[i] = x+shrink, y, w-shrink
-                if self._atlas_nodes[i][2] <= 0:
-                    del self._atlas_nodes[i]
-                    i -= 1
-                else:
-                    break
-            else:
-                break
-            i += 1
-
-        # Merge nodes
-        i = 0
-        while i < len(self._atlas_nodes)-1:
-            node = self._atlas_nodes[i]
-            next_node = self._atlas_nodes[i+1]
-            if node[1] == next_node[1]:
-                self._atlas_nodes[i] = node[0], node[1], node[2]+next_node[2]
-                del self._atlas_nodes[i+1]
-            else:
-                i += 1
+    def use_region(self, region, lock=False):
+        """Mark a region as used, so that it is evicted last
+
+        Parameters
+        ----------
+        region : tuple
+            The bounds (x, y, w, h) of the region.
+        lock : bool
+            If True, the region is not evicted until ``unlock_regions``
+            is called.
+        """
+        self._regions[region] = self._regions.pop(region)
+        if lock:
+            self._locked.add(region)
+
+    def unlock_regions(self):
+        """Allow all locked regions to be evicted again"""
+        self._locked.clear()
+
+    def release_region(self, region):
+        """Make the space of a region available for new regions
+
+        Parameters
+        ----------
+        region : tuple
+            The bounds (x, y, w, h) of the region.
+        """
+        del self._regions[region]
+        self._locked.discard(region)
+        if not self._regions:
+            self._reset_regions()
+        else:
+            x, y, w, h = region
+            self._free_span(y, x, w)
+
+    def _shelf_height(self, height):
+        return min(-(-height // 4) * 4, self._shape[0])
 
+    def _allocate(self, width, height):
+        """Find room for a region, or return None"""
+        if width > self._shape[1] or height > self._shape[0]:
+            return None
+        shelf_height = self._shelf_height(height)
+        free = self._free.get(shelf_height, [])
+        i = bisect.bisect_left(free, (width,))
+        if i < len(free):
+            w, x, y = free.pop(i)
+            _remove_sorted(self._spans[y], (x, w))
+        else:
+            y = self._add_shelf(shelf_height)
+            if y is None:
+                return None
+            w, x = self._shape[1], 0
+        if w > width:
+            bisect.insort(self._spans[y], (x + width, w - width))
+            bisect.insort(self._free[shelf_height], (w - width, x + width, y))
+        region = x, y, width, height
+        self._regions[region] = shelf_height
         return region
 
-    def _fit(self, index, width, height):
-        """Test if region (width, height) fit into self._atlas_nodes[index]"""
-        node = self._atlas_nodes[index]
-        x, y = node[0], node[1]
-        width_left = width
-        if x+width > self._shape[1]:
-            return -1
-        i = index
-        while width_left > 0:
-            node = self._atlas_nodes[i]
-            y = max(y, node[1])
-            if y+height > self._shape[0]:
-                return -1
-            width_left -= node[2]
-            i += 1
+    def _free_span(self, y, x, w):
+        """Make a span of a shelf free, merging it with adjacent free spans
+        """
+        spans = self._spans[y]
+        free = self._free[self._shelves[y]]
+        i = bisect.bisect_left(spans, (x,))
+        if i < len(spans) and spans[i][0] == x + w:
+            next_x, next_w = spans.pop(i)
+            _remove_sorted(free, (next_w, next_x, y))
+            w += next_w
+        if i > 0 and sum(spans[i - 1]) == x:
+            x, prev_w = spans.pop(i - 1)
+            _remove_sorted(free, (prev_w, x, y))
+            w += prev_w
+        if w == self._shape[1]:
+            self._release_shelf(y)
+        else:
+            bisect.insort(spans, (x, w))
+            bisect.insort(free, (w, x, y))
+
+    def _add_shelf(self, shelf_height):
+        """Find the rows for a new shelf, and return its y (or None)"""
+        for i, (y, h) in enumerate(self._rows):
+            if h >= shelf_height:
+                del self._rows[i]
+                if h > shelf_height:
+                    bisect.insort(self._rows, (y + shelf_height,
+                                               h - shelf_height))
+                break
+        else:
+            y = self._shelf_top
+            if y + shelf_height > self._shape[0]:
+                return None
+            self._shelf_top += shelf_height
+        self._shelves[y] = shelf_height
+        self._spans[y] = []
+        self._free.setdefault(shelf_height, [])
         return y
+
+    def _release_shelf(self, y):
+        """Make the rows of an empty shelf free for new shelves"""
+        h = self._shelves.pop(y)
+        del self._spans[y]
+        rows = self._rows
+        i = bisect.bisect_left(rows, (y,))
+        if i < len(rows) and rows[i][0] == y + h:
+            h += rows.pop(i)[1]
+        if i > 0 and sum(rows[i - 1]) == y:
+            y, prev_h = rows.pop(i - 1)
+            h += prev_h
+        if y + h == self._shelf_top:
+            self._shelf_top = y
+        else:
+            bisect.insort(rows, (y, h))
+
+    def _evict_regions(self, shelf_height):
+        """Evict the least recently used region of the given shelf height,
+        or else all regions of the least recently used shelf
+        """
+        if self._evict is None:
+            return False
+        locked_shelves = set(region[1] for region in self._locked)
+        last_used = {}
+        for i, (region, height) in enumerate(self._regions.items()):
+            if height == shelf_height and region not in self._locked:
+                regions = [region]
+                break
+            if region[1] not in locked_shelves:
+                last_used[region[1]] = i
+        else:
+            if not last_used:
+                return False
+            y = min(last_used, key=last_used.get)
+            regions = [region for region in self._regions if region[1] == y]
+        for region in regions:
+            self.release_region(region)
+        self._version += 1
+        for region in regions:
+            self._evict(region)
+        return True
+
+    def _grow(self, width, height):
+        """Double the height or width of the atlas"""
+        from .context import get_current_canvas
+        h, w = self._shape[:2]
+        max_h, max_w = self._max_shape
+        if w < max_w and (width > w or w < h or h >= max_h):
+            shape = h, 2 * w
+        elif h < max_h:
+            shape = 2 * h, w
+        else:
+            return False
+        canvas = get_current_canvas()
+        if canvas is None:
+            return False
+        self._copy_resize(shape, canvas)
+        if shape[1] > w:
+            for y in list(self._spans):
+                self._free_span(y, w, shape[1] - w)
+        self._version += 1
+        return True
+
+    def _copy_resize(self, shape, canvas):
+        """Resize the texture, while copying its contents on the GPU"""
+        from .program import Program
+        from .framebuffer import FrameBuffer
+        from .wrappers import set_state
+        old_shape = self._shape
+        viewport = canvas.context.get_viewport()
+        copy = Texture2D(shape=old_shape, interpolation='nearest')
+        program = Program(_atlas_copy_vert, _atlas_copy_frag)
+        program['a_position'] = np.array([[-1, -1], [-1, 1], [1, -1], [1, 1]],
+                                         np.float32)
+        fbo = FrameBuffer(color=copy)
+        set_state(blend=False, depth_test=False, cull_face=False)
+        for source, target in ((self, copy), (copy, self)):
+            if target is self:
+                # Allocate and clear the larger texture
+                self._set_data(np.zeros(tuple(shape) + old_shape[2:],
+                                        np.uint8))
+            program['u_texture'] = source
+            fbo.color_buffer = target
+            with fbo:
+                canvas.context.set_viewport(0, 0, old_shape[1], old_shape[0])
+                program.draw('triangle_strip')
+        if viewport is not None:
+            canvas.context.set_viewport(*viewport)
+        for ob in (fbo, program, copy):
+            ob.delete()
@@ -22,7 +22,7 @@ __all__ = ('set_viewport', 'set_depth_range', 'set_front_face',  # noqa
            'set_stencil_op', 'set_depth_func', 'set_depth_mask',  # noqa
            'set_color_mask', 'set_sample_coverage',  # noqa
            'get_state_presets', 'set_state', 'finish', 'flush',  # noqa
-           'read_pixels', 'set_hint',  # noqa
+           'read_pixels', 'set_hint', 'invalidate_gl_state',  # noqa
            'get_gl_configuration', '_check_valid',
            'GlooFunctions', 'global_gloo_functions', )
 
@@ -49,6 +49,15 @@ _gl_presets = {
 }
     
 
+# Destination RGB factor -> alpha factors that keep premultiplied colors in
+# the framebuffer (see GLContext.premultiplied_alpha): the alpha is the
+# fraction of the background that is covered
+_premultiplied_alpha_funcs = {
+    'one_minus_src_alpha': ('one', 'one_minus_src_alpha'),
+    'one': ('zero', 'one'),
+}
+
+
 def get_current_canvas():
     """ Proxy for context.get_current_canvas to avoud circular import.
     This function replaces itself with the real function the first 
@@ -84,12 +93,55 @@ def _check_conversion(key, valid_dict):
     return valid_dict[key] if key in valid_dict else key
 
 
+def _face_keys(funcname, face):
+    """Get the state keys for a stencil function applied to face"""
+    if face == 'front_and_back':
+        return (funcname + ':front', funcname + ':back')
+    return (funcname + ':' + face, )
+
+
 class BaseGlooFunctions(object):
     """ Class that provides a series of GL functions that do not fit
     in the object oriented part of gloo. An instance of this class is
     associated with each canvas.
     """
     
+    @property
+    def _context(self):
+        """ The GLContext to which the commands are sent.
+        """
+        return self
+    
+    def _state_command(self, key, funcname, *args):
+        """ Queue a FUNC command that sets a piece of GL state, unless the
+        context knows that this state already has the requested value.
+        The key identifies the piece of state (or a tuple of keys if the
+        command sets multiple pieces of state).
+        """
+        context = self._context
+        state = getattr(context, '_gl_state', None)
+        if state is not None:
+            keys = (key, ) if isinstance(key, string_types) else key
+            value = (funcname, ) + args
+            if all(state.get(k) == value for k in keys):
+                return
+            for k in keys:
+                state[k] = value
+        context.glir.command('FUNC', funcname, *args)
+    
+    def invalidate_gl_state(self):
+        """Forget the GL state that is assumed to be set in the context
+        
+        Gloo only emits GL commands for state that has changed since the
+        previous call (e.g. consecutive ``set_state(blend=True)`` calls
+        result in a single glEnable). Call this function after changing
+        GL state via raw GL calls, so that subsequent gloo calls are
+        emitted again.
+        """
+        state = getattr(self._context, '_gl_state', None)
+        if state is not None:
+            state.clear()
+    
     ##########################################################################
     # PRIMITIVE/VERTEX
     
@@ -109,7 +161,8 @@ class BaseGlooFunctions(object):
             individual components, or as a single tuple with four values.
         """
         x, y, w, h = args[0] if len(args) == 1 else args
-        self.glir.command('FUNC', 'glViewport', int(x), int(y), int(w), int(h))
+        self._state_command('glViewport', 'glViewport',
+                            int(x), int(y), int(w), int(h))
     
     def set_depth_range(self, near=0., far=1.):
         """Set depth values
@@ -121,7 +174,8 @@ class BaseGlooFunctions(object):
         far : float
             Far clipping plane.
         """
-        self.glir.command('FUNC', 'glDepthRange', float(near), float(far))
+        self._state_command('glDepthRange', 'glDepthRange',
+                            float(near), float(far))
     
     def set_front_face(self, mode='ccw'):
         """Set which faces are front-facing
@@ -131,7 +185,7 @@ class BaseGlooFunctions(object):
         mode : str
             Can be 'cw' for clockwise or 'ccw' for counter-clockwise.
         """
-        self.glir.command('FUNC', 'glFrontFace', mode)
+        self._state_command('glFrontFace', 'glFrontFace', mode)
     
     def set_cull_face(self, mode='back'):
         """Set front, back, or both faces to be culled
@@ -141,7 +195,7 @@ class BaseGlooFunctions(object):
         mode : str
             Culling mode. Can be "front", "back", or "front_and_back".
         """
-        self.glir.command('FUNC', 'glCullFace', mode)
+        self._state_command('glCullFace', 'glCullFace', mode)
     
     def set_line_width(self, width=1.):
         """Set line width
@@ -154,7 +208,7 @@ class BaseGlooFunctions(object):
         width = float(width)
         if width < 0:
             raise RuntimeError('Cannot have width < 0')
-        self.glir.command('FUNC', 'glLineWidth', width)
+        self._state_command('glLineWidth', 'glLineWidth', width)
     
     def set_polygon_offset(self, factor=0., units=0.):
         """Set the scale and units used to calculate depth values
@@ -168,8 +222,8 @@ class BaseGlooFunctions(object):
             Multiplied by an implementation-specific value to create a
             constant depth offset.
         """
-        self.glir.command('FUNC', 'glPolygonOffset', float(factor),
-                          float(units))
+        self._state_command('glPolygonOffset', 'glPolygonOffset',
+                            float(factor), float(units))
     
     ##########################################################################
     # FRAGMENT/SCREEN
@@ -222,7 +276,8 @@ class BaseGlooFunctions(object):
         alpha : float | None
             Alpha to use.
         """
-        self.glir.command('FUNC', 'glClearColor', *Color(color, alpha).rgba)
+        self._state_command('glClearColor', 'glClearColor',
+                            *Color(color, alpha).rgba)
 
     def set_clear_depth(self, depth=1.0):
         """Set the clear value for the depth buffer
@@ -234,7 +289,7 @@ class BaseGlooFunctions(object):
         depth : float
             The depth to use.
         """
-        self.glir.command('FUNC', 'glClearDepth', float(depth))
+        self._state_command('glClearDepth', 'glClearDepth', float(depth))
     
     def set_clear_stencil(self, index=0):
         """Set the clear value for the stencil buffer
@@ -246,7 +301,7 @@ class BaseGlooFunctions(object):
         index : int
             The index to use when the stencil buffer is cleared.
         """
-        self.glir.command('FUNC', 'glClearStencil', int(index))
+        self._state_command('glClearStencil', 'glClearStencil', int(index))
     
     # glBlendFunc(Separate), glBlendColor, glBlendEquation(Separate)
     
@@ -264,11 +319,22 @@ class BaseGlooFunctions(object):
             Source alpha factor. If None, ``srgb`` is used.
         dalpha : str
             Destination alpha factor. If None, ``drgb`` is used.
+
+        Notes
+        -----
+        If ``premultiplied_alpha`` is enabled on the context and no alpha
+        factors are given, the alpha factors are chosen to keep the colors
+        in the framebuffer premultiplied (see
+        ``GLContext.premultiplied_alpha``).
         """
+        if (salpha is None and dalpha is None and
+                getattr(self._context, 'premultiplied_alpha', False)):
+            salpha, dalpha = _premultiplied_alpha_funcs.get(drgb,
+                                                            (None, None))
         salpha = srgb if salpha is None else salpha
         dalpha = drgb if dalpha is None else dalpha
-        self.glir.command('FUNC', 'glBlendFuncSeparate', 
-                          srgb, drgb, salpha, dalpha)
+        self._state_command('glBlendFuncSeparate', 'glBlendFuncSeparate',
+                            srgb, drgb, salpha, dalpha)
     
     def set_blend_color(self, color):
         """Set the blend color
@@ -278,7 +344,7 @@ class BaseGlooFunctions(object):
         color : str | tuple | instance of Color
             Color to use. See vispy.color.Color for options.
         """
-        self.glir.command('FUNC', 'glBlendColor', *Color(color).rgba)
+        self._state_command('glBlendColor', 'glBlendColor', *Color(color).rgba)
     
     def set_blend_equation(self, mode_rgb, mode_alpha=None):
         """Specify the equation for RGB and alpha blending
@@ -295,8 +361,8 @@ class BaseGlooFunctions(object):
         See ``set_blend_equation`` for valid modes.
         """
         mode_alpha = mode_rgb if mode_alpha is None else mode_alpha
-        self.glir.command('FUNC', 'glBlendEquationSeparate', 
-                          mode_rgb, mode_alpha)
+        self._state_command('glBlendEquationSeparate',
+                            'glBlendEquationSeparate', mode_rgb, mode_alpha)
     
     # glScissor, glStencilFunc(Separate), glStencilMask(Separate),
     # glStencilOp(Separate),
@@ -315,7 +381,8 @@ class BaseGlooFunctions(object):
         h : int
             The height of the box.
         """
-        self.glir.command('FUNC', 'glScissor', int(x), int(y), int(w), int(h))
+        self._state_command('glScissor', 'glScissor',
+                            int(x), int(y), int(w), int(h))
     
     def set_stencil_func(self, func='always', ref=0, mask=8, 
                          face='front_and_back'):
@@ -332,8 +399,9 @@ class BaseGlooFunctions(object):
         face : str
             Can be 'front', 'back', or 'front_and_back'.
         """
-        self.glir.command('FUNC', 'glStencilFuncSeparate', 
-                          face, func, int(ref), int(mask))
+        self._state_command(_face_keys('glStencilFuncSeparate', face),
+                            'glStencilFuncSeparate',
+                            face, func, int(ref), int(mask))
     
     def set_stencil_mask(self, mask=8, face='front_and_back'):
         """Control the front or back writing of individual bits in the stencil
@@ -345,7 +413,8 @@ class BaseGlooFunctions(object):
         face : str
             Can be 'front', 'back', or 'front_and_back'.
         """
-        self.glir.command('FUNC', 'glStencilMaskSeparate', face, int(mask))
+        self._state_command(_face_keys('glStencilMaskSeparate', face),
+                            'glStencilMaskSeparate', face, int(mask))
     
     def set_stencil_op(self, sfail='keep', dpfail='keep', dppass='keep',
                        face='front_and_back'):
@@ -366,8 +435,9 @@ class BaseGlooFunctions(object):
         face : str
             Can be 'front', 'back', or 'front_and_back'.
         """
-        self.glir.command('FUNC', 'glStencilOpSeparate', 
-                          face, sfail, dpfail, dppass)
+        self._state_command(_face_keys('glStencilOpSeparate', face),
+                            'glStencilOpSeparate',
+                            face, sfail, dpfail, dppass)
     
     # glDepthFunc, glDepthMask, glColorMask, glSampleCoverage
     
@@ -380,7 +450,7 @@ class BaseGlooFunctions(object):
             The depth comparison function. Must be one of 'never', 'less', 
             'equal', 'lequal', 'greater', 'gequal', 'notequal', or 'always'.
         """
-        self.glir.command('FUNC', 'glDepthFunc', func)
+        self._state_command('glDepthFunc', 'glDepthFunc', func)
     
     def set_depth_mask(self, flag):
         """Toggle writing into the depth buffer
@@ -390,7 +460,7 @@ class BaseGlooFunctions(object):
         flag : bool
             Whether depth writing should be enabled.
         """
-        self.glir.command('FUNC', 'glDepthMask', bool(flag))
+        self._state_command('glDepthMask', 'glDepthMask', bool(flag))
     
     def set_color_mask(self, red, green, blue, alpha):
         """Toggle writing of frame buffer color components
@@ -406,8 +476,8 @@ class BaseGlooFunctions(object):
         alpha : bool
             Alpha toggle.
         """
-        self.glir.command('FUNC', 'glColorMask', bool(red), bool(green), 
-                          bool(blue), bool(alpha))
+        self._state_command('glColorMask', 'glColorMask', bool(red),
+                            bool(green), bool(blue), bool(alpha))
     
     def set_sample_coverage(self, value=1.0, invert=False):
         """Specify multisample coverage parameters
@@ -419,8 +489,8 @@ class BaseGlooFunctions(object):
         invert : bool
             Specify if the coverage masks should be inverted.
         """
-        self.glir.command('FUNC', 'glSampleCoverage', float(value), 
-                          bool(invert))
+        self._state_command('glSampleCoverage', 'glSampleCoverage',
+                            float(value), bool(invert))
     
     ##########################################################################
     # STATE
@@ -506,9 +576,9 @@ class BaseGlooFunctions(object):
             cull_face = kwargs.pop('cull_face')
             if isinstance(cull_face, bool):
                 funcname = 'glEnable' if cull_face else 'glDisable'
-                self.glir.command('FUNC', funcname, 'cull_face')
+                self._state_command('cull_face', funcname, 'cull_face')
             else:
-                self.glir.command('FUNC', 'glEnable', 'cull_face')
+                self._state_command('cull_face', 'glEnable', 'cull_face')
                 self.set_cull_face(*_to_args(cull_face))
         
         # Iterate over kwargs
@@ -524,7 +594,7 @@ class BaseGlooFunctions(object):
             else:
                 # Enable / disable
                 funcname = 'glEnable' if val else 'glDisable'
-                self.glir.command('FUNC', funcname, key)
+                self._state_command(key, funcname, key)
     
     #
     # glFinish, glFlush, glReadPixels, glHint
@@ -570,21 +640,27 @@ class BaseGlooFunctions(object):
         """
         if not all(isinstance(tm, string_types) for tm in (target, mode)):
             raise TypeError('target and mode must both be strings')
-        self.glir.command('FUNC', 'glHint', target, mode)
+        self._state_command('glHint:' + target, 'glHint', target, mode)
 
 
 class GlooFunctions(BaseGlooFunctions):
     
     @property
-    def glir(self):
-        """ The GLIR queue corresponding to the current canvas
+    def _context(self):
+        """ The GLContext of the current canvas
         """
         canvas = get_current_canvas()
         if canvas is None:
             msg = ("If you want to use gloo without vispy.app, " + 
                    "use a gloo.context.FakeCanvas.")
             raise RuntimeError('Gloo requires a Canvas to run.\n' + msg)
-        return canvas.context.glir
+        return canvas.context
+    
+    @property
+    def glir(self):
+        """ The GLIR queue corresponding to the current canvas
+        """
+        return self._context.glir
 
 
 ## Create global functions object and inject names here
@@ -5,6 +5,7 @@
 from __future__ import division
 
 import weakref
+
 import numpy as np
 
 from .. import gloo
@@ -13,6 +14,7 @@ from .visuals import VisualNode
 from ..visuals.transforms import TransformSystem
 from ..color import Color
 from ..util import logger, Frozen
+from ..ext.ordereddict import OrderedDict
 from ..util.profiler import Profiler
 from .subscene import SubScene
 from .events import SceneMouseEvent
@@ -117,7 +119,24 @@ class SceneCanvas(app.Canvas, Frozen):
         self._scene = None
         # A default widget that follows the shape of the canvas
         self._central_widget = None
-        self._draw_order = weakref.WeakKeyDictionary()
+        self._draw_order = None
+        self._culling = False
+        self._culling_margin = 4
+        self._render_queue = False
+        self._draw_stats = _new_draw_stats()
+        self._render_caches = weakref.WeakKeyDictionary()  # {node: cache}
+        self._cache_program = None
+        self._partial_redraw = False
+        self._partial_redraw_margin = 4
+        self._frame = None  # the previous frame, for partial redraws
+        self._full_redraw = True
+        self._dirty_nodes = weakref.WeakSet()
+        self._node_rects = weakref.WeakKeyDictionary()  # {node: rect}
+        self._draw_region = None
+        self._scissor_stack = []
+        self._upload_nodes = []  # drawn nodes with pending texture uploads
+        self._batch = None  # the active _UpdateBatch
+        self._replaying = False
         self._drawing = False
         self._fb_stack = []
         self._vp_stack = []
@@ -153,12 +172,15 @@ class SceneCanvas(app.Canvas, Frozen):
     def scene(self, node):
         oldscene = self._scene
         self._scene = node
+        self._draw_order = None
         if oldscene is not None:
             oldscene._set_canvas(None)
             oldscene.events.children_change.disconnect(self._update_scenegraph)
         if node is not None:
             node._set_canvas(self)
             node.events.children_change.connect(self._update_scenegraph)
+            self._draw_order = _DrawOrder(node)
+        self._full_redraw = True
 
     @property
     def central_widget(self):
@@ -169,6 +191,116 @@ class SceneCanvas(app.Canvas, Frozen):
             self._central_widget = Widget(size=self.size, parent=self.scene)
         return self._central_widget
 
+    @property
+    def culling(self):
+        """Whether to skip drawing visuals whose bounds are outside the
+        visible area.
+
+        The bounds of each visual are mapped to the framebuffer and padded
+        by ``culling_margin`` pixels. A visual is not drawn when this box
+        misses the clip volume, or the region of a clipping parent (e.g. a
+        ViewBox). The children of a culled visual are still considered.
+        Default False.
+        """
+        return self._culling
+
+    @culling.setter
+    def culling(self, culling):
+        self._culling = bool(culling)
+        self.update()
+
+    @property
+    def culling_margin(self):
+        """The margin in pixels around the bounds of visuals when
+        determining whether they are culled.
+
+        Increase this for visuals that draw beyond their bounds, such as
+        markers, thick lines and text. Default 4.
+        """
+        return self._culling_margin
+
+    @culling_margin.setter
+    def culling_margin(self, margin):
+        self._culling_margin = int(margin)
+        self.update()
+
+    @property
+    def cull_stats(self):
+        """Dict with the number of visuals that were drawn and culled
+        in the last draw.
+        """
+        return dict((key, self._draw_stats[key])
+                    for key in ('drawn', 'culled'))
+
+    @property
+    def render_queue(self):
+        """Whether to sort draw calls to reduce GL state changes.
+
+        When enabled, the visuals (and the subvisuals of compound visuals)
+        are collected in draw order and sorted by program, GL state and
+        textures. Only consecutive visuals with the same `order` value
+        are sorted, and only if the result does not depend on their order:
+        opaque visuals with depth testing, or additive visuals without
+        depth testing. Visuals with other GL states keep their place.
+        Default False.
+        """
+        return self._render_queue
+
+    @render_queue.setter
+    def render_queue(self, render_queue):
+        self._render_queue = bool(render_queue)
+        self.update()
+
+    @property
+    def render_queue_stats(self):
+        """Dict with statistics of the render queue in the last draw.
+
+        The number of queued draw items ('items'), the number of program,
+        state and texture switches between consecutive items after sorting
+        ('program_switches', 'state_switches' and 'texture_switches'), and
+        the number of switches that sorting saved ('saved_switches').
+        """
+        return dict((key, self._draw_stats[key])
+                    for key in ('items', 'program_switches', 'state_switches',
+                                'texture_switches', 'saved_switches'))
+
+    @property
+    def partial_redraw(self):
+        """Whether to redraw only the regions of the canvas that changed.
+
+        The scene is drawn into an offscreen framebuffer that is kept
+        between draws. When visuals are updated, only the nodes that
+        overlap the rectangle around their previous and new screen-space
+        bounds are drawn again, with the scissor test limiting drawing to
+        that rectangle. Any other kind of update redraws the whole scene.
+        Default False.
+        """
+        return self._partial_redraw
+
+    @partial_redraw.setter
+    def partial_redraw(self, partial):
+        self._partial_redraw = bool(partial)
+        self._frame = None
+        self._node_rects.clear()
+        self._dirty_nodes.clear()
+        self.update()
+
+    @property
+    def partial_redraw_margin(self):
+        """The margin in pixels around the bounds of visuals when
+        determining the regions to redraw.
+
+        Increase this for visuals that draw beyond their bounds, such as
+        markers and thick lines. Default 4.
+        """
+        return self._partial_redraw_margin
+
+    @partial_redraw_margin.setter
+    def partial_redraw_margin(self, margin):
+        self._partial_redraw_margin = int(margin)
+        self._full_redraw = True
+        self.update()
+
     @property
     def bgcolor(self):
         return Color(self._bgcolor)
@@ -185,11 +317,74 @@ class SceneCanvas(app.Canvas, Frozen):
         Parameters
         ----------
         node : instance of Node
-            Not used.
+            The node that changed, if any. Cached renderings of the subtrees
+            that contain this node are invalidated.
         """
-        # TODO: use node bounds to keep track of minimum drawable area
         if self._drawing:
             return
+        if self._batch is not None:
+            self._batch.updated[node] = None
+            return
+        if node is not None and len(self._render_caches) > 0:
+            self._invalidate_caches(node)
+        if self._partial_redraw:
+            if isinstance(node, VisualNode):
+                self._dirty_nodes.add(node)
+            else:
+                self._full_redraw = True
+        if not self._replaying:
+            app.Canvas.update(self)
+
+    def batch(self):
+        """Return a context manager that groups changes to the scene.
+
+        Inside the ``with`` block, updates of nodes (e.g. after setting
+        their `visible`, `order` or visual data) and changes of their
+        transforms or parents are collected instead of handled one by one.
+        When the outermost block exits, the transform systems of the
+        changed subtrees are updated once, each updated node emits its
+        update event once, and one redraw is requested.
+
+        Note that the transform systems of visuals (e.g. as used by
+        ``get_transform()``) are not up to date inside the block.
+
+        Examples
+        --------
+        ::
+
+            with canvas.batch():
+                for node, tr in zip(nodes, transforms):
+                    node.transform = tr
+        """
+        return _UpdateBatch(self)
+
+    def _end_batch(self, batch):
+        """Handle the changes collected by an _UpdateBatch.
+        """
+        # Update the transforms of each changed subtree once, while still
+        # collecting the updates that this causes
+        while batch.transformed:
+            nodes = batch.transformed
+            batch.transformed = OrderedDict()
+            for node in nodes:
+                # _update_trsys also updates the children
+                parent = node.parent
+                while parent is not None and parent not in nodes:
+                    parent = parent.parent
+                if parent is None:
+                    node._update_trsys(None)
+        self._batch = None
+        if len(batch.updated) == 0:
+            return
+        self._replaying = True
+        try:
+            for node in batch.updated:
+                if node is None:
+                    self.update()
+                else:
+                    node.update()
+        finally:
+            self._replaying = False
         app.Canvas.update(self)
 
     def on_draw(self, event):
@@ -249,9 +444,85 @@ class SceneCanvas(app.Canvas, Frozen):
     def _draw_scene(self, bgcolor=None):
         if bgcolor is None:
             bgcolor = self._bgcolor
+        if self._partial_redraw and len(self._fb_stack) == 0:
+            self._draw_scene_partial(bgcolor)
+            return
         self.context.clear(color=bgcolor, depth=True)
         self.draw_visual(self.scene)
 
+    def _draw_scene_partial(self, bgcolor):
+        """Draw the changed regions of the scene into the previous frame,
+        and show the result.
+        """
+        self.set_current()
+        shape = tuple(self.physical_size[::-1])
+        if self._frame is None or self._frame.shape != shape:
+            self._frame = _RenderCache(shape)
+            self._full_redraw = True
+        region = None if self._full_redraw else self._dirty_region()
+        self._full_redraw = False
+        self._dirty_nodes.clear()
+
+        # Avoid that updates caused by pushing the framebuffer schedule
+        # another draw
+        drawing = self._drawing
+        self._drawing = True
+        try:
+            self.push_fbo(self._frame.fbo, (0, 0), self.size)
+            try:
+                if region is None:
+                    self.context.clear(color=bgcolor, depth=True)
+                    self.draw_visual(self.scene)
+                    self._measure_nodes()
+                elif region[2] > region[0] and region[3] > region[1]:
+                    self._push_scissor(region)
+                    self._draw_region = region
+                    try:
+                        self.context.clear(color=bgcolor, depth=True)
+                        self.draw_visual(self.scene)
+                    finally:
+                        self._draw_region = None
+                        self._pop_scissor()
+            finally:
+                self.pop_fbo()
+        finally:
+            self._drawing = drawing
+        self._draw_texture(self._frame.texture, (0, 0, 1, 1), blend=False)
+        if not drawing:
+            self._update_upload_nodes()
+
+    def _dirty_region(self):
+        """Return the (x0, y0, x1, y1) framebuffer rectangle that covers the
+        previous and new bounds of all updated visuals, or None if the
+        whole scene must be redrawn.
+        """
+        region = (0, 0, 0, 0)
+        margin = self._partial_redraw_margin
+        for node in list(self._dirty_nodes):
+            old = self._node_rects.get(node)
+            new = _node_rect(node, margin)
+            if old is None or new is None or node.canvas is not self:
+                return None
+            self._node_rects[node] = new
+            region = _rect_union(_rect_union(region, old), new)
+        # Snap to whole pixels inside the framebuffer
+        w, h = self.physical_size
+        return (max(0, int(np.floor(region[0]))),
+                max(0, int(np.floor(region[1]))),
+                min(w, int(np.ceil(region[2]))),
+                min(h, int(np.ceil(region[3]))))
+
+    def _measure_nodes(self):
+        """Store the framebuffer rectangles of all visual nodes.
+        """
+        self._node_rects.clear()
+        margin = self._partial_redraw_margin
+        for node, start in self._draw_order.order:
+            if start and isinstance(node, VisualNode):
+                rect = _node_rect(node, margin)
+                if rect is not None:
+                    self._node_rects[node] = rect
+
     def draw_visual(self, visual, event=None):
         """ Draw a visual and its children to the canvas or currently active
         framebuffer.
@@ -269,33 +540,241 @@ class SceneCanvas(app.Canvas, Frozen):
         # make sure this canvas's context is active
         self.set_current()
         
+        drawing = self._drawing
         try:
             self._drawing = True
             # get order to draw visuals
-            if visual not in self._draw_order:
-                self._draw_order[visual] = self._generate_draw_order()
-            order = self._draw_order[visual]
-            
-            # draw (while avoiding branches with visible=False)
-            stack = []
-            invisible_node = None
-            for node, start in order:
-                if start:
-                    stack.append(node)
-                    if invisible_node is None:
-                        if not node.visible:
-                            # disable drawing until we exit this node's subtree
-                            invisible_node = node
+            order = self._draw_order.order
+            stats = _new_draw_stats()
+            self._draw_nodes(order, stats, prof)
+            self._draw_stats = stats
+        finally:
+            self._drawing = drawing
+        if not drawing:
+            self._update_upload_nodes()
+
+    def _update_upload_nodes(self):
+        """Schedule another draw for the nodes that were drawn while their
+        textures were being uploaded progressively.
+        """
+        nodes, self._upload_nodes = self._upload_nodes, []
+        for node in nodes:
+            self.update(node)
+
+    def _draw_nodes(self, order, stats, prof, cached=None):
+        """Draw the nodes in a draw order, skipping branches with
+        visible=False and drawing cached branches from their texture.
+
+        *cached* is the node whose subtree is being rendered to its cache.
+        """
+        stack = []
+        skip_node = None
+        scissored = []  # nodes that pushed a scissor rectangle
+        drawn = []
+        culling = self._culling
+        margin = self._culling_margin
+        region = self._draw_region
+        queue = [] if self._render_queue else None
+        for node, start in order:
+            if start:
+                stack.append(node)
+                if skip_node is None:
+                    if not node.visible:
+                        # disable drawing until we exit this node's subtree
+                        skip_node = node
+                        continue
+                    if (node.cache and node is not cached and
+                            not node.picking):
+                        if queue:
+                            self._draw_queue(queue, stats, prof)
+                            queue = []
+                        self._draw_cached(node, stats, prof)
+                        skip_node = node
+                        continue
+                    if node._scissor_clip and node.clipper is not None:
+                        # clip the subtree with the scissor test
+                        if queue:
+                            self._draw_queue(queue, stats, prof)
+                            queue = []
+                        bounds = node.clipper.bounds
+                        self._push_scissor((bounds.left, bounds.bottom,
+                                            bounds.right, bounds.top))
+                        scissored.append(node)
+                    if hasattr(node, 'draw'):
+                        if culling and (_is_culled(node, margin) or
+                                        self._is_scissored(node)):
+                            stats['culled'] += 1
+                            continue
+                        if region is not None:
+                            rect = self._node_rects.get(node)
+                            if (rect is not None and
+                                    not _rects_intersect(rect, region)):
+                                stats['culled'] += 1
+                                continue
+                        stats['drawn'] += 1
+                        drawn.append(node)
+                        if queue is None:
+                            node.draw()
+                            prof.mark(str(node))
+                        elif hasattr(node, '_draw_items'):
+                            queue.extend((v, node.order)
+                                         for v in node._draw_items())
                         else:
-                            if hasattr(node, 'draw'):
-                                node.draw()
-                                prof.mark(str(node))
+                            queue.append((node, node.order))
+            else:
+                if node is skip_node:
+                    skip_node = None
+                if scissored and scissored[-1] is node:
+                    if queue:
+                        self._draw_queue(queue, stats, prof)
+                        queue = []
+                    scissored.pop()
+                    self._pop_scissor()
+                stack.pop()
+        if queue:
+            self._draw_queue(queue, stats, prof)
+        # Updates are ignored while drawing, so progressive texture uploads
+        # schedule their next draw when drawing is done
+        self._upload_nodes.extend(node for node in drawn
+                                  if _has_pending_uploads(node))
+
+    def _draw_queue(self, queue, stats, prof):
+        """Sort and draw a list of (visual, order) draw items.
+        """
+        presets = self.context.get_state_presets()
+        visuals, before, after = _sort_draw_queue(queue, presets)
+        for visual in visuals:
+            visual.draw()
+            prof.mark(str(visual))
+        stats['items'] += len(visuals)
+        for name, n_before, n_after in zip(('program', 'state', 'texture'),
+                                           before, after):
+            stats[name + '_switches'] += n_after
+            stats['saved_switches'] += n_before - n_after
+
+    def _draw_cached(self, node, stats, prof):
+        """Draw the subtree of *node* from its cached rendering, rendering
+        it first if the cache is not valid.
+        """
+        fb, origin, csize = self._current_framebuffer()
+        if fb is None:
+            shape = tuple(self.physical_size[::-1])
+        else:
+            shape = fb.color_buffer.shape[:2]
+        if len(self._vp_stack) > 0:
+            vp = tuple(self._vp_stack[-1])
+        else:
+            vp = (0, 0) + tuple(self.physical_size)
+        key = (vp, tuple(origin), tuple(csize))
+
+        cache = self._render_caches.get(node)
+        if cache is None or cache.shape != shape:
+            cache = self._render_caches[node] = _RenderCache(shape)
+        if not cache.valid or cache.key != key:
+            # Render the whole subtree (also during a partial redraw or
+            # inside a scissor-clipped node) with the same transforms as the
+            # canvas
+            region = self._draw_region
+            scissor_stack = self._scissor_stack
+            premultiplied = self.context.premultiplied_alpha
+            self._draw_region = None
+            self._scissor_stack = []
+            self._set_scissor(None)
+            self.context.premultiplied_alpha = True
+            self.push_fbo(cache.fbo, origin, csize)
+            try:
+                self.push_viewport(vp)
+                try:
+                    self.context.clear(color=(0, 0, 0, 0), depth=True)
+                    self._draw_nodes(_subtree_draw_order(node), stats, prof,
+                                     cached=node)
+                finally:
+                    self.pop_viewport()
+            finally:
+                self.pop_fbo()
+                self.context.premultiplied_alpha = premultiplied
+                self._draw_region = region
+                self._scissor_stack = scissor_stack
+                self._set_scissor(scissor_stack[-1] if scissor_stack
+                                  else None)
+            cache.key = key
+            cache.valid = True
+
+        # Composite the texture in the current viewport
+        h, w = shape
+        region = (vp[0] / w, vp[1] / h,
+                  (vp[0] + vp[2]) / w, (vp[1] + vp[3]) / h)
+        self._draw_texture(cache.texture, region, blend=True,
+                           blend_func=('one', 'one_minus_src_alpha'))
+        prof.mark(str(node))
+
+    def _push_scissor(self, rect):
+        """Limit drawing to the part of a (x0, y0, x1, y1) framebuffer
+        rectangle that is inside the current scissor rectangle.
+        """
+        if len(self._scissor_stack) > 0:
+            rect = _rect_intersection(self._scissor_stack[-1], rect)
+        self._scissor_stack.append(rect)
+        self._set_scissor(rect)
+
+    def _pop_scissor(self):
+        """Restore the scissor rectangle from before the last push.
+        """
+        rect = self._scissor_stack.pop()
+        self._set_scissor(self._scissor_stack[-1] if self._scissor_stack
+                          else None)
+        return rect
+
+    def _set_scissor(self, rect):
+        """Set the scissor box to the pixels whose centers are inside a
+        (x0, y0, x1, y1) framebuffer rectangle, or disable the scissor test
+        if *rect* is None.
+        """
+        if rect is None:
+            self.context.set_state(scissor_test=False)
+            return
+        x0, y0 = [int(np.ceil(v - 0.5)) for v in rect[:2]]
+        x1, y1 = [int(np.floor(v - 0.5)) + 1 for v in rect[2:]]
+        self.context.set_scissor(x0, y0, max(0, x1 - x0), max(0, y1 - y0))
+        self.context.set_state(scissor_test=True)
+
+    def _is_scissored(self, node):
+        """Whether the bounds of a visual node (plus the culling margin) are
+        outside the current scissor rectangle.
+        """
+        if len(self._scissor_stack) == 0:
+            return False
+        rect = _node_rect(node, self._culling_margin)
+        return rect is not None and not _rects_intersect(
+            rect, self._scissor_stack[-1])
+
+    def _draw_texture(self, texture, region, **state):
+        """Draw a region (x0, y0, x1, y1) of a texture, in normalized
+        texture coordinates, to the current viewport.
+        """
+        if self._cache_program is None:
+            self._cache_program = gloo.Program(_cache_vert, _cache_frag)
+            self._cache_program['a_position'] = np.array(
+                [(-1, -1), (1, -1), (-1, 1), (1, 1)], np.float32)
+        program = self._cache_program
+        program['u_texture'] = texture
+        program['u_region'] = region
+        self.context.set_state(depth_test=False, **state)
+        program.draw('triangle_strip')
+
+    def _invalidate_caches(self, node):
+        """Invalidate the cached renderings of all subtrees that contain
+        *node*.
+        """
+        caches = self._render_caches
+        while node is not None:
+            cache = caches.get(node)
+            if cache is not None:
+                if node.cache:
+                    cache.valid = False
                 else:
-                    if node is invisible_node:
-                        invisible_node = None
-                    stack.pop()
-        finally:
-            self._drawing = False
+                    del caches[node]
+            node = node.parent
 
     def _generate_draw_order(self, node=None):
         """Return a list giving the order to draw visuals.
@@ -305,18 +784,15 @@ class SceneCanvas(app.Canvas, Frozen):
         """
         if node is None:
             node = self._scene
-        order = [(node, True)]
-        children = node.children
-        children.sort(key=lambda ch: ch.order)
-        for ch in children:
-            order.extend(self._generate_draw_order(ch))
-        order.append((node, False))
-        return order
+        return _subtree_draw_order(node)
 
     def _update_scenegraph(self, event):
         """Called when topology of scenegraph has changed.
         """
-        self._draw_order.clear()
+        self._draw_order.update(event)
+        self._full_redraw = True
+        if len(self._render_caches) > 0:
+            self._invalidate_caches(event.sources[0])
         self.update()
 
     def _process_mouse_event(self, event):
@@ -471,6 +947,7 @@ class SceneCanvas(app.Canvas, Frozen):
             The resize event.
         """
         self._update_transforms()
+        self._full_redraw = True
         
         if self._central_widget is not None:
             self._central_widget.size = self.size
@@ -601,3 +1078,367 @@ class SceneCanvas(app.Canvas, Frozen):
         
         self.transforms.configure(viewport=viewport, fbo_size=fb_size,
                                   fbo_rect=fb_rect)
+
+
+_cache_vert = """
+attribute vec2 a_position;
+uniform vec4 u_region;
+varying vec2 v_texcoord;
+void main() {
+    gl_Position = vec4(a_position, 0.0, 1.0);
+    v_texcoord = mix(u_region.xy, u_region.zw, (a_position + 1.0) / 2.0);
+}
+"""
+
+_cache_frag = """
+uniform sampler2D u_texture;
+varying vec2 v_texcoord;
+void main() {
+    gl_FragColor = texture2D(u_texture, v_texcoord);
+}
+"""
+
+
+class _UpdateBatch(object):
+    """Context manager that collects the changes to the scene of a canvas,
+    see SceneCanvas.batch().
+
+    Parameters
+    ----------
+    canvas : SceneCanvas
+        The canvas.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.transformed = OrderedDict()  # nodes whose transforms changed
+        self.updated = OrderedDict()  # nodes that were updated
+        self._outer = None
+
+    def __enter__(self):
+        self._outer = self.canvas._batch
+        if self._outer is None:
+            self.canvas._batch = self
+        return self
+
+    def __exit__(self, *args):
+        if self._outer is None:
+            self.canvas._end_batch(self)
+
+
+class _RenderCache(object):
+    """The texture that a cached subtree is rendered to.
+
+    The subtree is rendered over a transparent background with the
+    ``premultiplied_alpha`` option of the context, so drawing the texture
+    with ('one', 'one_minus_src_alpha') gives the same result as drawing
+    the subtree directly, for visuals that blend with 'one_minus_src_alpha'
+    or 'one'.
+    """
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.texture = gloo.Texture2D(shape=shape + (4,),
+                                      interpolation='nearest')
+        self.fbo = gloo.FrameBuffer(color=self.texture,
+                                    depth=gloo.RenderBuffer(shape))
+        self.key = None
+        self.valid = False
+
+
+def _has_pending_uploads(visual):
+    """Whether a visual (or one of its subvisuals) has textures that are
+    being uploaded progressively.
+    """
+    for sub in getattr(visual, '_subvisuals', ()):
+        if _has_pending_uploads(sub):
+            return True
+    program = getattr(visual, '_program', None)
+    return bool(getattr(program, 'pending_upload_nbytes', 0))
+
+
+def _new_draw_stats():
+    return dict(drawn=0, culled=0, items=0, program_switches=0,
+                state_switches=0, texture_switches=0, saved_switches=0)
+
+
+def _draw_item_key(visual, presets):
+    """Return (kind, key) for a queued draw item.
+
+    *kind* is 'opaque' or 'additive' for visuals that can be drawn in any
+    order with others of the same kind, and None otherwise. *key* is the
+    (program, state, textures) tuple to sort on, or None if unknown. Each
+    visual has its own program object, so programs are compared by their
+    shader source (as last built), which is also what the GL program is
+    shared on.
+    """
+    program = getattr(visual, '_program', None)
+    if program is None or not hasattr(visual, '_vshare'):
+        return None, None
+    state = dict(presets.get(visual._vshare.gl_state.get('preset'), {}))
+    state.update((k, v) for k, v in visual._vshare.gl_state.items()
+                 if k != 'preset')
+    if state.get('blend') is False and state.get('depth_test') is True:
+        kind = 'opaque'
+    elif (state.get('blend') is True and state.get('depth_test') is False
+            and tuple(state.get('blend_func', ()))[1:] == ('one', )):
+        kind = 'additive'
+    else:
+        kind = None
+    state = tuple(sorted((k, repr(v)) for k, v in state.items()))
+    textures = tuple(sorted(id(v) for v in program._user_variables.values()
+                            if isinstance(v, gloo.texture.BaseTexture)))
+    return kind, (program._shaders, state, textures)
+
+
+def _sort_draw_queue(queue, presets):
+    """Sort a list of (visual, order) draw items.
+
+    Returns the sorted list of visuals and the number of (program, state,
+    texture) switches before and after sorting.
+    """
+    items = [_draw_item_key(visual, presets) + (order, visual)
+             for visual, order in queue]
+    before = _count_switches(items)
+    # Sort runs of items that can be drawn in any order
+    i = 0
+    while i < len(items):
+        kind, key, order, visual = items[i]
+        j = i + 1
+        if kind is not None:
+            while (j < len(items) and items[j][0] == kind and
+                    items[j][2] == order):
+                j += 1
+            items[i:j] = sorted(items[i:j], key=lambda item: item[1])
+        i = j
+    after = _count_switches(items)
+    return [item[3] for item in items], before, after
+
+
+def _count_switches(items):
+    """Count the (program, state, texture) switches between consecutive
+    draw items. Items without a key count as a switch of each kind.
+    """
+    counts = [0, 0, 0]
+    prev = None
+    for item in items:
+        key = item[1]
+        if prev is not None:
+            for i in range(3):
+                if key is None or prev[1] is None or key[i] != prev[1][i]:
+                    counts[i] += 1
+        prev = item
+    return counts
+
+
+def _framebuffer_corners(node):
+    """Return the corners of the bounding box of a visual node in
+    (homogeneous) framebuffer coordinates, or None if the bounds are unknown
+    or the box is (partly) behind the camera.
+    """
+    try:
+        bounds = [node.bounds(axis) for axis in range(3)]
+    except (AttributeError, NotImplementedError):
+        return None
+    if bounds[0] is None or bounds[1] is None:
+        return None
+    if bounds[2] is None:
+        bounds[2] = (0, 0)
+    corners = np.ones((8, 4))
+    corners[:, :3] = [(x, y, z) for x in bounds[0] for y in bounds[1]
+                      for z in bounds[2]]
+    fb = node.transforms.get_transform('visual', 'framebuffer').map(corners)
+    if (fb[:, 3] <= 0).any():
+        return None
+    return fb
+
+
+def _node_rect(node, margin=0):
+    """Return the (x0, y0, x1, y1) rectangle in framebuffer coordinates
+    around the bounds of a visual node, or None if unknown.
+    """
+    fb = _framebuffer_corners(node)
+    if fb is None:
+        return None
+    xy = fb[:, :2] / fb[:, 3:]
+    x0, y0 = xy.min(axis=0) - margin
+    x1, y1 = xy.max(axis=0) + margin
+    return (x0, y0, x1, y1)
+
+
+def _rect_union(a, b):
+    if a[2] <= a[0] or a[3] <= a[1]:
+        return b
+    return (min(a[0], b[0]), min(a[1], b[1]),
+            max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _rect_intersection(a, b):
+    return (max(a[0], b[0]), max(a[1], b[1]),
+            min(a[2], b[2]), min(a[3], b[3]))
+
+
+def _rects_intersect(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _is_culled(node, margin=0):
+    """Whether the bounding box of a visual node, padded by *margin* pixels,
+    is outside the clip volume or outside the region of one of its clippers.
+    """
+    fb = _framebuffer_corners(node)
+    if fb is None:
+        return False
+    if margin:
+        fb = fb[:, :3] / fb[:, 3:]
+        lo, hi = fb.min(axis=0), fb.max(axis=0)
+        lo[:2] -= margin
+        hi[:2] += margin
+        fb = np.ones((8, 4))
+        fb[:, :3] = [(x, y, z) for x in (lo[0], hi[0])
+                     for y in (lo[1], hi[1]) for z in (lo[2], hi[2])]
+    # The clip volume in normalized device coordinates
+    ndc = node.transforms.get_transform('framebuffer', 'render').map(fb)
+    ndc = ndc[:, :3] / ndc[:, 3:]
+    if (ndc < -1).all(axis=0).any() or (ndc > 1).all(axis=0).any():
+        return True
+    # The regions of clipping parents
+    for clipper in node._clippers.values():
+        pos = clipper.transform.map(fb)
+        x, y = pos[:, 0] / pos[:, 3], pos[:, 1] / pos[:, 3]
+        rect = clipper.bounds
+        if ((x < rect.left).all() or (x > rect.right).all() or
+                (y < rect.bottom).all() or (y > rect.top).all()):
+            return True
+    return False
+
+
+def _subtree_draw_order(node):
+    """Return the draw order of a node and its children (see
+    SceneCanvas._generate_draw_order), without recursion.
+    """
+    order = []
+    stack = [(node, True)]
+    while stack:
+        node, start = stack.pop()
+        order.append((node, start))
+        if start:
+            stack.append((node, False))
+            children = node.children
+            children.sort(key=lambda ch: ch.order)
+            stack.extend((ch, True) for ch in reversed(children))
+    return order
+
+
+class _DrawOrder(object):
+    """The order in which to draw the nodes of a scene.
+
+    The order is generated when first needed, and is then kept up to date
+    using the children_change events of the scene: only the subtree of a
+    node that is added, removed or reordered is spliced in or out.
+
+    The (node, start) entries are kept in a doubly linked list, so that
+    the cost of a splice scales with the size of the subtree (and the
+    number of siblings) rather than with the size of the scene. The list
+    of entries is rebuilt from the linked list when next requested.
+
+    Parameters
+    ----------
+    scene : Node
+        The root node of the scene.
+    """
+
+    def __init__(self, scene):
+        self._scene = scene
+        self._next = None  # {entry: next entry}, None if not generated
+        self._prev = None  # {entry: previous entry}
+        self._order = None  # list of the entries, None if changed
+
+    @property
+    def order(self):
+        """List of (node, start) tuples, see
+        SceneCanvas._generate_draw_order.
+        """
+        if self._order is None:
+            if self._next is None:
+                order = _subtree_draw_order(self._scene)
+                self._next = dict(zip(order[:-1], order[1:]))
+                self._prev = dict(zip(order[1:], order[:-1]))
+            else:
+                next_ = self._next
+                entry = (self._scene, True)
+                order = [entry]
+                while entry in next_:
+                    entry = next_[entry]
+                    order.append(entry)
+            self._order = order
+        return self._order
+
+    def invalidate(self):
+        """Generate the whole order again when it is next needed"""
+        self._next = self._prev = self._order = None
+
+    def update(self, event):
+        """Update the order for a children_change event
+
+        Parameters
+        ----------
+        event : instance of Event
+            The children_change event, emitted by the parent node.
+        """
+        if self._next is None:
+            return
+        parent = event.sources[0]
+        self._order = None
+        try:
+            removed = getattr(event, 'removed', None)
+            if removed is not None:
+                self._remove(removed)
+            added = getattr(event, 'added', None)
+            if added is not None:
+                self._insert(parent, added, _subtree_draw_order(added))
+            reordered = getattr(event, 'reordered', None)
+            if reordered is not None:
+                self._insert(parent, reordered, self._remove(reordered))
+        except KeyError:
+            # Node not found; the order is out of sync with the scene
+            logger.debug('Regenerating draw order')
+            self.invalidate()
+
+    def _remove(self, node):
+        """Remove the subtree of node from the order, and return it"""
+        next_, prev = self._next, self._prev
+        entry = (node, True)
+        stop = (node, False)
+        before = prev.pop(entry)
+        subtree = [entry]
+        while entry != stop:
+            entry = next_.pop(entry)
+            del prev[entry]
+            subtree.append(entry)
+        after = next_.pop(stop)
+        next_[before] = after
+        prev[after] = before
+        return subtree
+
+    def _insert(self, parent, node, subtree):
+        """Insert the subtree of a child of parent in the order"""
+        next_, prev = self._next, self._prev
+        if subtree[0] in next_:
+            raise KeyError(subtree[0])  # already in the order
+        # Children are sorted by their order, and otherwise drawn in the
+        # order in which they were added; find the sibling to insert before
+        siblings = parent.children
+        siblings.sort(key=lambda ch: ch.order)
+        i = siblings.index(node)
+        if i + 1 < len(siblings):
+            after = (siblings[i + 1], True)
+        else:
+            after = (parent, False)
+        entry = prev[after]
+        for e in subtree:
+            next_[entry] = e
+            prev[e] = entry
+            entry = e
+        next_[entry] = after
+        prev[after] = entry
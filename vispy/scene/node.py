@@ -35,10 +35,28 @@ class Node(object):
         The name used to identify the node.
     transforms : instance of TransformSystem | None
         The associated transforms.
+
+    Notes
+    -----
+    Nodes are cheap to create, so that scenes can hold many of them: the
+    events, transform system, transform and clipper dictionary of a node
+    are only created when they are first used, and the attributes of
+    Node are stored in slots.
     """
-    
-    # Needed to allow subclasses to repr() themselves before Node.__init__()
-    _name = None
+
+    __slots__ = ('_name', '_visible', '_canvas', '_document_node',
+                 '_scene_node', '_opacity', '_order', '_picking', '_cache',
+                 '_inherited_clippers', '_clip_children', '_clipper',
+                 '_scissor_clip', '_transforms', '_events', '_children',
+                 '_transform', '_parent', '_document', '__weakref__')
+
+    # Names of the events that Node adds to its EmitterGroup
+    _event_names = ('canvas_change', 'parent_change', 'children_change',
+                    'transform_change', 'mouse_press', 'mouse_move',
+                    'mouse_release', 'mouse_wheel', 'key_press', 'key_release')
+
+    # {class: bool}, see _has_event_handlers()
+    _event_handler_classes = {}
 
     def __init__(self, parent=None, name=None, transforms=None):
         self.name = name
@@ -49,35 +67,84 @@ class Node(object):
         self._opacity = 1.0
         self._order = 0
         self._picking = False
+        self._cache = False
         
-        # clippers inherited from parents
-        self._clippers = weakref.WeakKeyDictionary()  # {node: clipper}
+        # clippers inherited from parents, see _clippers
+        self._inherited_clippers = None
 
         # whether this widget should clip its children
         self._clip_children = False
         self._clipper = None
-        
-        self.transforms = (TransformSystem() if transforms is None else 
-                           transforms)
-
-        # Add some events to the emitter groups:
-        events = ['canvas_change', 'parent_change', 'children_change', 
-                  'transform_change', 'mouse_press', 'mouse_move',
-                  'mouse_release', 'mouse_wheel', 'key_press', 'key_release']
-        # Create event emitter if needed (in subclasses that inherit from
-        # Visual, we already have an emitter to share)
-        if not hasattr(self, 'events'):
-            self.events = EmitterGroup(source=self, auto_connect=True,
-                                       update=Event)
-        self.events.add(**dict([(ev, Event) for ev in events]))
-        
+        # whether the canvas clips the children with the scissor test, to
+        # the framebuffer rectangle given by the bounds of the clipper
+        self._scissor_clip = False
+
         self._children = []
-        self._transform = NullTransform()
+        self._transform = None
         self._parent = None
+        self._document = None
+        
+        # The transform system is created when first needed (subclasses that
+        # inherit from Visual already have one)
+        if not hasattr(self, '_transforms'):
+            self._transforms = None
+        if transforms is not None:
+            self.transforms = transforms
+
+        # Add some events to the emitter groups. In subclasses that inherit
+        # from Visual, we already have an emitter to share. Otherwise the
+        # emitter group is created when first needed, unless the class has
+        # handlers that must be connected to the events.
+        if getattr(self, '_events', None) is not None:
+            self._events.add(**dict([(ev, Event)
+                                     for ev in self._event_names]))
+        else:
+            self._events = None
+            if _has_event_handlers(type(self)):
+                self._create_events()
+        
         if parent is not None:
             self.parent = parent
-            
-        self._document = None
+
+    @property
+    def events(self):
+        """The EmitterGroup of this node.
+        """
+        if self._events is None:
+            self._create_events()
+        return self._events
+
+    @events.setter
+    def events(self, events):
+        self._events = events
+
+    def _create_events(self):
+        events = EmitterGroup(source=self, auto_connect=True, update=Event)
+        events.add(**dict([(ev, Event) for ev in self._event_names]))
+        self._events = events
+        # Chain the events with those of the parent and children, as done
+        # in _add_child
+        parent = self.parent
+        if parent is not None:
+            events.children_change.connect(parent.events.children_change)
+            parent.events.parent_change.connect(events.parent_change)
+        for ch in self._children:
+            if ch._events is not None:
+                ch._events.children_change.connect(events.children_change)
+                events.parent_change.connect(ch._events.parent_change)
+
+    @property
+    def transforms(self):
+        """The TransformSystem of this node.
+        """
+        if self._transforms is None:
+            self._transforms = TransformSystem()
+            self._set_transforms_canvas(self.canvas)
+        return self._transforms
+
+    @transforms.setter
+    def transforms(self, transforms):
+        self._transforms = transforms
     
     @property
     def visible(self):
@@ -93,7 +160,8 @@ class Node(object):
     
     @property
     def name(self):
-        return self._name
+        # Subclasses may repr() themselves before Node.__init__()
+        return getattr(self, '_name', None)
 
     @name.setter
     def name(self, n):
@@ -118,6 +186,14 @@ class Node(object):
         """
         pass
 
+    @property
+    def _clippers(self):
+        """The clippers inherited from parents, {node: clipper}.
+        """
+        if self._inherited_clippers is None:
+            self._inherited_clippers = weakref.WeakKeyDictionary()
+        return self._inherited_clippers
+
     @property
     def clip_children(self):
         """Boolean indicating whether children of this node will inherit its
@@ -131,8 +207,12 @@ class Node(object):
             return
         self._clip_children = clip
         
-        for ch in self.children:
-            ch._set_clipper(self, self.clipper) 
+        clipper = self.clipper if clip else None
+        stack = self.children
+        while stack:
+            ch = stack.pop()
+            ch._set_clipper(self, clipper)
+            stack.extend(ch.children)
 
     @property
     def clipper(self):
@@ -153,8 +233,30 @@ class Node(object):
     @order.setter
     def order(self, o):
         self._order = o
+        parent = self.parent
+        if parent is not None:
+            parent.events.children_change(reordered=self)
         self.update()
         
+    @property
+    def cache(self):
+        """Whether this node and its children are rendered to a texture
+        that is reused in later draws.
+
+        This is useful for subtrees that are expensive to draw but rarely
+        change, such as a static backdrop. The texture is rendered again
+        when any node in the subtree is updated, when the subtree changes,
+        or when the viewport or framebuffer changes. The texture is drawn
+        without depth information, on top of what was drawn before.
+        Default False.
+        """
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = bool(cache)
+        self.update()
+
     @property
     def children(self):
         """ A copy of the list of children of this node. Do not add
@@ -189,8 +291,9 @@ class Node(object):
         if prev is not None:
             prev._remove_child(self)
             # remove all clippers inherited from parents
-            for k in list(self._clippers):
-                self._set_clipper(k, None)
+            if self._inherited_clippers:
+                for k in list(self._inherited_clippers):
+                    self._set_clipper(k, None)
         if parent is None:
             self._set_canvas(None)
             self._parent = None
@@ -205,21 +308,33 @@ class Node(object):
                     self._set_clipper(p, p.clipper)
                 p = p.parent
         
-        self.events.parent_change(new=parent, old=prev)
-        self._update_trsys(None)
+        # Nodes in the subtree without events do not get the parent_change
+        # event, so reset their cached scene node here
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node._scene_node = None
+            stack.extend(node._children)
+        if self._events is not None:
+            self._events.parent_change(new=parent, old=prev)
+        self._transform_system_changed()
         self.update()
 
     def _add_child(self, node):
         self._children.append(node)
         self.events.children_change(added=node)
-        node.events.children_change.connect(self.events.children_change)
-        self.events.parent_change.connect(node.events.parent_change)
+        # Nodes without events are chained when their events are created
+        if node._events is not None:
+            node._events.children_change.connect(self.events.children_change)
+            self.events.parent_change.connect(node._events.parent_change)
 
     def _remove_child(self, node):
         self._children.remove(node)
         self.events.children_change(removed=node)
-        node.events.children_change.disconnect(self.events.children_change)
-        self.events.parent_change.disconnect(node.events.parent_change)
+        if node._events is not None:
+            node._events.children_change.disconnect(
+                self.events.children_change)
+            self.events.parent_change.disconnect(node._events.parent_change)
 
     def on_parent_change(self, event):
         """Parent change event handler
@@ -306,29 +421,40 @@ class Node(object):
         if old is c:
             return
         
-        # Use canvas/framebuffer transforms from canvas
-        self.transforms.canvas = c
-        if c is None:
-            self._canvas = None
-        else:
-            self._canvas = weakref.ref(c)
-            tr = c.transforms
-            self.transforms.canvas_transform = tr.canvas_transform
-            self.transforms.framebuffer_transform = tr.framebuffer_transform
+        self._canvas = None if c is None else weakref.ref(c)
+        if self._transforms is not None:
+            self._set_transforms_canvas(c)
         
         # update all children
         for ch in self.children:
             ch._set_canvas(c)
 
-        self.events.canvas_change(old=old, new=c)
+        if self._events is not None:
+            self._events.canvas_change(old=old, new=c)
+
+    def _set_transforms_canvas(self, c):
+        """Use the canvas/framebuffer transforms from canvas *c*.
+        """
+        self._transforms.canvas = c
+        if c is not None:
+            tr = c.transforms
+            self._transforms.canvas_transform = tr.canvas_transform
+            self._transforms.framebuffer_transform = tr.framebuffer_transform
 
     def update(self):
         """
         Emit an event to inform listeners that properties of this Node have
         changed. Also request a canvas update.
+
+        Inside ``SceneCanvas.batch()``, this is done once when the batch
+        ends.
         """
-        self.events.update()
         c = getattr(self, 'canvas', None)
+        if c is not None and c._batch is not None:
+            c._batch.updated[self] = None
+            return
+        if self._events is not None:
+            self._events.update()
         if c is not None:
             c.update(node=self)
 
@@ -357,6 +483,8 @@ class Node(object):
         """ The transform that maps the local coordinate frame to the
         coordinate frame of the parent.
         """
+        if self._transform is None:
+            self._transform = NullTransform()
         return self._transform
 
     @transform.setter
@@ -366,7 +494,7 @@ class Node(object):
         assert isinstance(tr, BaseTransform)
         if tr is not self._transform:
             self._transform = tr
-            self._update_trsys(None)
+            self._transform_system_changed()
 
     def set_transform(self, type_, *args, **kwargs):
         """ Create a new transform of *type* and assign it to this node.
@@ -384,6 +512,16 @@ class Node(object):
         """
         self.transform = create_transform(type_, *args, **kwargs)
 
+    def _transform_system_changed(self):
+        """Update the transform systems of this node and its children, or
+        defer that until the end of the active ``SceneCanvas.batch()``.
+        """
+        c = self.canvas
+        if c is not None and c._batch is not None:
+            c._batch.transformed[self] = None
+        else:
+            self._update_trsys(None)
+
     def _update_trsys(self, event):
         """Called when  has changed.
         
@@ -396,7 +534,8 @@ class Node(object):
         """
         for ch in self.children:
             ch._update_trsys(event)
-        self.events.transform_change()
+        if self._events is not None:
+            self._events.transform_change()
         self.update()
 
     def parent_chain(self):
@@ -626,3 +765,17 @@ class Node(object):
         for c in self.children:
             c.picking = p
         self._picking = p
+
+
+def _has_event_handlers(cls):
+    """Whether a Node class defines handlers (e.g. ``on_canvas_change``) that
+    the EmitterGroup of its instances connects to automatically, in which
+    case the events must be created with the node.
+    """
+    has = Node._event_handler_classes.get(cls)
+    if has is None:
+        names = ['on_%s' % ev for ev in Node._event_names + ('update', )]
+        has = any(name in vars(c) for c in cls.__mro__ if c is not Node
+                  for name in names)
+        Node._event_handler_classes[cls] = has
+    return has
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 from vispy.scene.node import Node
+from vispy.scene.subscene import SubScene
+from vispy.scene.canvas import (_DrawOrder, _subtree_draw_order, _is_culled,
+                                _sort_draw_queue, _node_rect, _rect_union,
+                                _rects_intersect)
 from vispy.testing import (requires_application, TestingCanvas,
                            run_tests_if_main, raises)
-from vispy.visuals.transforms import STTransform
+from vispy.visuals.filters import Clipper
+from vispy.visuals.transforms import (STTransform, MatrixTransform,
+                                      NullTransform, TransformSystem)
 import numpy as np
+from numpy.testing import assert_array_equal
 
 
 class EventCheck(object):
@@ -80,6 +87,40 @@ def test_topology():
     assert n2.document_node is c.scene
 
 
+def test_lazy_node():
+    root = Node()
+    child_check = EventCheck(root.events.children_change)
+    n1 = Node(parent=root)
+    n2 = Node(parent=n1)
+    assert n2._events is None and n2._transforms is None
+    assert n2._transform is None and n2._inherited_clippers is None
+    assert not hasattr(n2, '__dict__')
+    assert len(child_check.events) == 2
+
+    # Events created later are chained with those of the parent
+    n3 = Node(parent=n2)
+    assert n2._events is not None and n3._events is None
+    assert len(child_check.events) == 1
+    parent_check = EventCheck(n3.events.parent_change)
+    n4 = Node(parent=n3)
+    assert n4.scene_node is n4
+    n1.parent = None
+    assert len(parent_check.events) == 1
+
+    # The cached scene node is reset also in nodes without events
+    scene = SubScene()
+    n1.parent = scene
+    assert n4._events is None and n4.scene_node is scene
+    assert isinstance(n3.transforms, TransformSystem)
+    assert isinstance(n3.transform, NullTransform)
+
+    # Classes with event handlers get their events right away
+    class Handler(Node):
+        def on_canvas_change(self, event):
+            pass
+    assert Handler()._events is not None
+
+
 def test_transforms():
     # test transform mapping between nodes
     root = Node()
@@ -138,5 +179,354 @@ def test_transforms():
     assert np.all(n2.node_transform(n4).map(pts) == 
                   n2.node_transform(n4).simplified.map(pts))    
 
-    
+
+def test_draw_order():
+    root = Node(name='root')
+    draw_order = _DrawOrder(root)
+    root.events.children_change.connect(draw_order.update)
+    nodes = [Node(parent=root, name='n%d' % i) for i in range(5)]
+
+    def names():
+        return [n.name for n, start in draw_order.order if start]
+    assert names() == ['root', 'n0', 'n1', 'n2', 'n3', 'n4']
+
+    # Topology changes splice the order
+    nodes[1].parent = nodes[3]
+    Node(parent=nodes[1], name='n5')
+    nodes[4].order = -1
+    assert names() == ['root', 'n4', 'n0', 'n2', 'n3', 'n1', 'n5']
+    nodes[3].order = -1  # equal orders keep the order in which they were added
+    assert names() == ['root', 'n3', 'n1', 'n5', 'n4', 'n0', 'n2']
+    nodes[0].parent = None
+    Node(parent=nodes[0], name='n6')  # not in the scene
+    nodes[0].parent = nodes[1]
+    assert names() == ['root', 'n3', 'n1', 'n5', 'n0', 'n6', 'n4', 'n2']
+    assert draw_order.order == _subtree_draw_order(root)
+
+    # Random churn gives the same order as generating it again
+    rng = np.random.RandomState(0)
+    nodes = [root]
+    for i in range(300):
+        op = rng.randint(3)
+        if op == 0 or len(nodes) < 10:
+            nodes.append(Node(parent=nodes[rng.randint(len(nodes))]))
+        elif op == 1:
+            node = nodes.pop(rng.randint(1, len(nodes)))
+            node.parent = None
+            nodes = [n for n in nodes if n is root or not node.is_child(n)]
+        else:
+            nodes[rng.randint(1, len(nodes))].order = rng.randint(-2, 3)
+    assert draw_order.order == _subtree_draw_order(root)
+    # Removed subtrees are unlinked
+    assert len(draw_order._next) == len(draw_order._prev) == \
+        len(draw_order.order) - 1
+
+    # Deep trees do not hit the recursion limit (use light stand-in nodes
+    # to keep the test fast)
+    class StandIn(object):
+        order = 0
+
+        def __init__(self, child=None):
+            self.children = [] if child is None else [child]
+
+    node = StandIn()
+    for i in range(4999):
+        node = StandIn(node)
+    order = _subtree_draw_order(node)
+    assert len(order) == 10000
+    assert order[0] == (node, True) and order[-1] == (node, False)
+
+
+def test_culling():
+    from vispy.scene.visuals import Markers
+    root = Node()
+    markers = Markers(parent=root)
+    markers.set_data(np.array([[0, 0], [0.5, 0.5]], np.float32))
+    assert not _is_culled(markers)
+    markers.transform = STTransform(translate=(0.9, 0))  # partly visible
+    assert not _is_culled(markers)
+    markers.transform = STTransform(translate=(5, 0))
+    assert _is_culled(markers)
+    markers.transform = STTransform(translate=(0, -2))
+    assert _is_culled(markers)
+    # The margin keeps visuals that draw beyond their bounds
+    markers.transform = STTransform(translate=(1.1, 0))
+    assert _is_culled(markers)
+    assert not _is_culled(markers, margin=0.2)
+
+    # Visible in the clip volume, but outside the region of a clipper
+    markers.transform = STTransform()
+    markers._clippers[root] = Clipper(bounds=(0.6, 0, 1, 1))
+    assert _is_culled(markers)
+    assert not _is_culled(markers, margin=0.2)
+    markers._clippers[root].bounds = (0.2, 0.2, 1, 1)
+    assert not _is_culled(markers)
+
+    # Visuals without bounds are always drawn
+    markers.set_data(np.zeros((0, 2), np.float32))
+    assert not _is_culled(markers)
+
+
+def test_dirty_rects():
+    from vispy.scene.visuals import Markers
+    root = Node()
+    markers = Markers(parent=root)
+    markers.set_data(np.array([[0, 0], [0.5, 0.25]], np.float32))
+    markers.transform = STTransform(scale=(10, 10), translate=(5, 0))
+    assert_array_equal(_node_rect(markers), (5, 0, 10, 2.5))
+    assert_array_equal(_node_rect(markers, 1), (4, -1, 11, 3.5))
+    assert _node_rect(root) is None
+
+    assert _rect_union((0, 0, 0, 0), (1, 2, 3, 4)) == (1, 2, 3, 4)
+    assert _rect_union((0, 0, 2, 2), (1, 1, 3, 4)) == (0, 0, 3, 4)
+    assert _rects_intersect((0, 0, 2, 2), (1, 1, 3, 4))
+    assert not _rects_intersect((0, 0, 2, 2), (2, 0, 3, 4))
+    assert not _rects_intersect((0, 0, 2, 2), (0, 3, 2, 4))
+
+
+def test_render_queue():
+    from vispy.gloo import Texture2D
+    from vispy.gloo.wrappers import BaseGlooFunctions
+    from vispy.visuals import CompoundVisual, Visual
+    presets = BaseGlooFunctions().get_state_presets()
+
+    class Program(object):
+        def __init__(self, code, texture=None):
+            self._shaders = code, code
+            self._user_variables = dict(u_texture=texture)
+
+    class StandInVisual(Visual):
+        def _prepare_transforms(self, view):
+            pass
+
+    def make_visual(program, preset, **kwargs):
+        visual = StandInVisual()
+        visual._program = program
+        visual.set_gl_state(preset, **kwargs)
+        return visual
+
+    texture = Texture2D(shape=(2, 2))
+    p1, p2 = Program('p1', texture), Program('p2')
+    a1, a2 = [make_visual(p, 'opaque') for p in (p1, p2)]
+    # Programs with the same source are grouped
+    b1, b2 = [make_visual(p, 'opaque')
+              for p in (Program('p1', texture), Program('p2'))]
+    t1, t2 = [make_visual(p, 'translucent') for p in (p1, p2)]
+    add1, add2 = [make_visual(p, 'additive') for p in (p1, p2)]
+
+    # Opaque and additive runs are sorted, translucent visuals stay put
+    queue = [(v, 0) for v in (a1, a2, b1, b2, t1, add1, add2, t2)]
+    visuals, before, after = _sort_draw_queue(queue, presets)
+    assert visuals[:4] in ([a1, b1, a2, b2], [a2, b2, a1, b1])
+    assert visuals[4:] in ([t1, add1, add2, t2], [t1, add2, add1, t2])
+    assert before == [5, 3, 5]
+    assert after[0] < 5 and after[1] == 3 and after[2] < 5
+
+    # Different order values and incomplete GL states are barriers
+    c1 = make_visual(p1, None, blend=False)
+    queue = [(a2, 0), (a1, 1), (c1, 1), (b2, 1)]
+    visuals, before, after = _sort_draw_queue(queue, presets)
+    assert visuals == [a2, a1, c1, b2]
+    assert before == after
+
+    # Compound visuals are queued as their subvisuals
+    compound = CompoundVisual([a1, t1, a2])
+    t1.visible = False
+    assert compound._draw_items() == [a1, a2]
+    compound.visible = False
+    assert compound._draw_items() == []
+
+
+def test_render_queue_programs():
+    from vispy.gloo.wrappers import BaseGlooFunctions
+    from vispy.visuals import MarkersVisual, MeshVisual
+    presets = BaseGlooFunctions().get_state_presets()
+    pos = np.random.normal(size=(10, 2)).astype(np.float32)
+    m1, m2 = MarkersVisual(), MarkersVisual()
+    m1.set_data(pos, face_color='red')
+    m2.set_data(pos[::-1], face_color='blue', size=5)
+    mesh = MeshVisual(vertices=pos, faces=[[0, 1, 2]])
+    for visual in (m1, mesh, m2):
+        visual.set_gl_state('additive')
+        visual.transforms = TransformSystem(None)
+        visual._prepare_draw(view=visual)
+        visual._program.build_if_needed()
+    assert m1._program is not m2._program
+
+    # Visuals of the same type are grouped by their shader source
+    visuals, before, after = _sort_draw_queue(
+        [(v, 0) for v in (m1, mesh, m2)], presets)
+    assert visuals in ([m1, m2, mesh], [mesh, m1, m2])
+    assert before[0] == 2 and after[0] == 1
+
+
+@requires_application()
+def test_render_cache():
+    from vispy.scene.visuals import Image
+    with TestingCanvas(size=(40, 30)) as c:
+        root = Node(parent=c.scene)
+        data = np.zeros((30, 40, 4), np.float32)
+        data[..., 0] = data[..., 3] = 1
+        image = Image(data, parent=root)
+        expected = c.render()
+        assert len(c._render_caches) == 0
+
+        # The cached subtree looks the same
+        root.cache = True
+        assert_array_equal(c.render(), expected)
+        assert c._render_caches[root].valid
+
+        # Changes in the subtree invalidate the cache
+        data[..., :3] = 0, 0, 1
+        image.set_data(data)
+        assert not c._render_caches[root].valid
+        img = c.render()
+        assert (img[..., 2] == 255).all() and (img[..., 0] == 0).all()
+        image.parent = None
+        assert not c._render_caches[root].valid
+        assert (c.render()[..., 2] == 0).all()
+
+        root.cache = False
+        assert len(c._render_caches) == 0
+
+
+@requires_application()
+def test_render_cache_blending():
+    from vispy.scene.visuals import Image
+    with TestingCanvas(size=(40, 30), bgcolor=(0.2, 0.4, 0.6)) as c:
+        root = Node(parent=c.scene)
+        for color, rows, preset in (((1, 0, 0, 0.5), slice(None), None),
+                                    ((0, 1, 0, 0.3), slice(15), None),
+                                    ((0, 0, 1, 0.5), slice(10, 20),
+                                     'additive')):
+            data = np.zeros((30, 40, 4), np.float32)
+            data[rows] = color
+            image = Image(data, parent=root)
+            image.set_gl_state(preset or 'translucent', depth_test=False)
+        expected = c.render().astype(int)
+
+        # Translucent content looks the same when drawn from the cache
+        root.cache = True
+        img = c.render().astype(int)
+        assert c._render_caches[root].valid
+        assert np.abs(img - expected).max() <= 2
+
+
+@requires_application()
+def test_partial_redraw():
+    from vispy.scene.visuals import Image
+    with TestingCanvas(size=(40, 30)) as c:
+        data = np.zeros((10, 10, 4), np.float32)
+        data[..., 0] = data[..., 3] = 1
+        left = Image(data, parent=c.scene)
+        right = Image(data, parent=c.scene)
+        right.transform = STTransform(translate=(25, 0))
+        c.partial_redraw = True
+        c.partial_redraw_margin = 0
+        c._draw_scene()
+        assert c._node_rects[left] is not None
+
+        # Only the region of the changed visual is drawn again
+        data[..., :3] = 0, 0, 1
+        right.set_data(data)
+        assert list(c._dirty_nodes) == [right]
+        assert c._dirty_region() == (25, 20, 35, 30)
+        c._dirty_nodes.add(right)
+        c._draw_scene()
+        assert c.cull_stats == dict(drawn=1, culled=1)
+        c.partial_redraw = False
+        expected = c.render()
+        c.partial_redraw = True
+        c._draw_scene()
+        c._draw_scene()  # nothing changed
+        assert_array_equal(c._frame.fbo.read(), expected)
+
+
+@requires_application()
+def test_progressive_upload():
+    from vispy.scene.visuals import Image
+    with TestingCanvas(size=(40, 30)) as c:
+        data = np.ones((20, 20, 4), np.float32)
+        image = Image(data, parent=c.scene, upload_budget=data.nbytes // 4)
+        scheduled = []
+        c._backend._vispy_update = lambda: scheduled.append(True)
+        c.partial_redraw = True
+        c._draw_scene()
+        texture = image._texture
+        assert texture.pending_upload_nbytes > 0
+        for i in range(100):
+            if not texture.pending_upload_nbytes:
+                break
+            # Each draw schedules the next one, for the image only
+            assert scheduled and list(c._dirty_nodes) == [image]
+            del scheduled[:]
+            c._draw_scene()
+        assert texture.pending_upload_nbytes == 0
+        assert not scheduled and len(c._dirty_nodes) == 0
+
+
+@requires_application()
+def test_update_batch():
+    from vispy.scene.visuals import Markers
+    with TestingCanvas(size=(40, 30)) as c:
+        root = Node(parent=c.scene)
+        markers = [Markers(parent=root) for i in range(3)]
+        updates = []
+        for m in markers:
+            m.events.update.connect(updates.append)
+        transform_check = EventCheck(root.events.transform_change)
+        with c.batch():
+            root.transform = STTransform(translate=(1, 0))
+            with c.batch():
+                for m in markers:
+                    m.transform = STTransform(scale=(2, 2))
+                    m.visible = False
+                    m.update()
+            # Nothing happens until the outermost batch ends
+            assert len(updates) == 0 and len(transform_check.events) == 0
+            assert c._batch is not None
+        assert c._batch is None
+        assert len(transform_check.events) == 1
+        assert len(updates) == 3
+        tr = markers[0].get_transform('visual', 'scene')
+        assert_array_equal(tr.map((1, 1))[:2], (3, 2))
+
+
+def test_scissor_clip():
+    from vispy.scene.widgets import ViewBox
+    from vispy.scene.visuals import Markers
+    from vispy.scene.widgets.viewbox import _is_axis_aligned
+    vb = ViewBox(size=(100, 50), parent=SubScene())
+    markers = Markers(parent=vb.scene)
+    sub = Markers(parent=markers)
+    assert vb.clip_method == 'auto'
+    assert vb.scene._scissor_clip and not vb.scene.clip_children
+    assert len(markers._clippers) == 0 and len(sub._clippers) == 0
+
+    # Rotated viewboxes fall back to the fragment clipper
+    tr = MatrixTransform()
+    tr.rotate(30, (0, 0, 1))
+    vb.transform = tr
+    assert not vb.scene._scissor_clip and vb.scene.clip_children
+    assert markers._clippers[vb.scene] is vb.scene.clipper
+    assert sub._clippers[vb.scene] is vb.scene.clipper
+    tr.reset()
+    tr.rotate(90, (0, 0, 1))
+    assert vb.scene._scissor_clip
+    assert len(markers._clippers) == 0 and len(sub._clippers) == 0
+
+    vb.clip_method = 'fragment'
+    assert not vb.scene._scissor_clip and vb.scene.clip_children
+    vb.clip_method = 'scissor'
+    assert vb.scene._scissor_clip and not vb.scene.clip_children
+    with raises(ValueError):
+        vb.clip_method = 'stencil'
+
+    corners = np.array([(0, 0, 0, 1), (2, 0, 0, 1), (2, 1, 0, 1),
+                        (0, 1, 0, 1)], np.float64)
+    assert _is_axis_aligned(STTransform(), corners)
+    corners[2, 0] = 3
+    assert not _is_axis_aligned(STTransform(), corners)
+
+
 run_tests_if_main()
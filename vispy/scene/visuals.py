@@ -24,6 +24,10 @@ class VisualNode(Node):
     _next_id = 1
     _visual_ids = weakref.WeakValueDictionary()
 
+    # Use the TransformSystem of the visual instead of the one that Node
+    # creates when first needed
+    transforms = visuals.BaseVisual.transforms
+
     def __init__(self, parent=None, name=None):
         Node.__init__(self, parent=parent, name=name,
                       transforms=self.transforms)
@@ -97,6 +101,11 @@ class VisualNode(Node):
             return
         self._visual_superclass.draw(self)
 
+    def _draw_items(self):
+        if self.picking and not self.interactive:
+            return []
+        return self._visual_superclass._draw_items(self)
+
 
 def create_visual_node(subclass):
     # Create a new subclass of Node.
@@ -237,6 +246,7 @@ GridLines = create_visual_node(visuals.GridLinesVisual)
 GridMesh = create_visual_node(visuals.GridMeshVisual)
 Histogram = create_visual_node(visuals.HistogramVisual)
 Image = create_visual_node(visuals.ImageVisual)
+InstancedMesh = create_visual_node(visuals.InstancedMeshVisual)
 InfiniteLine = create_visual_node(visuals.InfiniteLineVisual)
 Isocurve = create_visual_node(visuals.IsocurveVisual)
 Isoline = create_visual_node(visuals.IsolineVisual)
@@ -34,12 +34,16 @@ class ViewBox(Widget):
         The camera through which to view the SubScene. If None, then a
         PanZoomCamera (2D interaction) is used. If str, then the string is
         used as the argument to :func:`make_camera`.
+    clip_method : str
+        How the children of the ViewBox are clipped to its area. See
+        `clip_method`. Default 'auto'.
     **kwargs : dict
         Extra keyword arguments to pass to `Widget`.
     """
-    def __init__(self, camera=None, **kwargs):
+    def __init__(self, camera=None, clip_method='auto', **kwargs):
         self._camera = None
         self._scene = None
+        self._clip_method = None
         Widget.__init__(self, **kwargs)
         self.interactive = True
 
@@ -52,7 +56,7 @@ class ViewBox(Widget):
             
         self._scene = SubScene(name=name, parent=self)
         self._scene._clipper = Clipper()
-        self._scene.clip_children = True
+        self.clip_method = clip_method
         self.transforms.changed.connect(self._update_scene_clipper)
         
         # Camera is a helper object that handles scene transformation
@@ -113,6 +117,28 @@ class ViewBox(Widget):
         else:
             raise ValueError('Not a camera object.')
 
+    @property
+    def clip_method(self):
+        """ Get/set how the children of this ViewBox are clipped.
+
+        'fragment' attaches a clipping filter to every visual in the scene,
+        which discards the fragments outside the ViewBox. 'scissor' lets the
+        canvas enable the scissor test while drawing the scene, which needs
+        no extra shader code, but only works when the ViewBox is mapped to an
+        axis-aligned rectangle in the framebuffer. 'auto' (the default) uses
+        'scissor' when possible, and 'fragment' otherwise (e.g. when the
+        ViewBox is rotated or has a nonlinear transform).
+        """
+        return self._clip_method
+
+    @clip_method.setter
+    def clip_method(self, method):
+        if method not in ('auto', 'scissor', 'fragment'):
+            raise ValueError('clip_method must be "auto", "scissor" or '
+                             '"fragment", not %r' % (method,))
+        self._clip_method = method
+        self._update_scene_clipper()
+
     def is_in_scene(self, node):
         """Get whether the given node is inside the scene of this viewbox.
 
@@ -196,4 +222,35 @@ class ViewBox(Widget):
         
     def _update_scene_clipper(self, event=None):
         tr = self.get_transform('visual', 'framebuffer')
-        self._scene._clipper.bounds = tr.map(self.inner_rect)
+        rect = self.inner_rect
+        self._scene._clipper.bounds = tr.map(rect)
+
+        corners = [(rect.left, rect.bottom), (rect.right, rect.bottom),
+                   (rect.right, rect.top), (rect.left, rect.top)]
+        fb = tr.map(np.array(corners, dtype=np.float64))
+
+        scissor = self._clip_method == 'scissor'
+        if self._clip_method == 'auto':
+            scissor = _is_axis_aligned(tr, fb)
+        if scissor != self._scene._scissor_clip:
+            self._scene._scissor_clip = scissor
+            self.update()
+        self._scene.clip_children = not scissor
+
+
+def _is_axis_aligned(tr, corners):
+    """Whether a linear transform maps a rectangle to an axis-aligned
+    rectangle, given the mapped (homogeneous) corners of the rectangle
+    in counterclockwise order.
+    """
+    if not tr.Linear or (corners[:, 3] <= 0).any():
+        return False
+    xy = corners[:, :2] / corners[:, 3:]
+    eps = 1e-6 * max(1, np.abs(xy).max())
+    # Either the edges from the first corner are horizontal and vertical,
+    # or vertical and horizontal
+    a, b, c, d = xy
+    return bool(((abs(a[1] - b[1]) < eps and abs(b[0] - c[0]) < eps and
+                  abs(c[1] - d[1]) < eps and abs(d[0] - a[0]) < eps) or
+                 (abs(a[0] - b[0]) < eps and abs(b[1] - c[1]) < eps and
+                  abs(c[0] - d[0]) < eps and abs(d[1] - a[1]) < eps)))
@@ -115,7 +115,9 @@ VisPy command line arguments:
     Enables error checking for all OpenGL calls.
 
   --vispy-glir-file
-    Export glir commands to specified file.
+    Export glir commands to specified file. If the filename ends with
+    .glirb, a binary stream is written that can be replayed with
+    vispy.gloo.glir.replay_glir().
 
   --vispy-profile=locations
     Measure performance at specific code locations and display results. 
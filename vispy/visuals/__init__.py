@@ -27,7 +27,7 @@ from .line import LineVisual, ArrowVisual  # noqa
 from .linear_region import LinearRegionVisual  # noqa
 from .line_plot import LinePlotVisual  # noqa
 from .markers import MarkersVisual, marker_types  # noqa
-from .mesh import MeshVisual  # noqa
+from .mesh import MeshVisual, InstancedMeshVisual  # noqa
 from .plane import PlaneVisual  # noqa
 from .polygon import PolygonVisual  # noqa
 from .rectangle import RectangleVisual  # noqa
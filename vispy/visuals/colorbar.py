@@ -10,7 +10,7 @@ import numpy as np
 
 from . import Visual, TextVisual, CompoundVisual, _BorderVisual
 # from .border import _BorderVisual
-from .shaders import Function
+from .colormap_lut import ColormapFunction
 from ..color import get_colormap
 
 VERT_SHADER = """
@@ -70,6 +70,8 @@ class _CoreColorBarVisual(Visual):
         The orientation of the colorbar, used for rendering. The
         orientation can be thought of as the position of the label
         relative to the color bar.
+    cmap_lut : bool
+        Whether to use a lookup table texture of the colormap.
 
     Note
     ----
@@ -85,9 +87,11 @@ class _CoreColorBarVisual(Visual):
     def __init__(self, pos, halfdim,
                  cmap,
                  orientation,
+                 cmap_lut=False,
                  **kwargs):
 
         self._cmap = get_colormap(cmap)
+        self._cmap_function = ColormapFunction(cmap_lut)
         self._pos = pos
         self._halfdim = halfdim
         self._orientation = orientation
@@ -107,9 +111,8 @@ class _CoreColorBarVisual(Visual):
                                [0, 0], [1, 1], [0, 1]],
                               dtype=np.float32)
 
-        glsl_map_fn = Function(self._cmap.glsl_map)
-
-        self.shared_program.frag['color_transform'] = glsl_map_fn
+        self.shared_program.frag['color_transform'] = \
+            self._cmap_function.function(self._cmap)
         self.shared_program['a_texcoord'] = tex_coords.astype(np.float32)
 
         self._update()
@@ -190,7 +193,9 @@ class _CoreColorBarVisual(Visual):
     @cmap.setter
     def cmap(self, cmap):
         self._cmap = get_colormap(cmap)
-        self._program.frag['color_transform'] = Function(self._cmap.glsl_map)
+        self._program.frag['color_transform'] = \
+            self._cmap_function.function(self._cmap)
+        self.update()
 
     @staticmethod
     def _prepare_transforms(view):
@@ -202,6 +207,7 @@ class _CoreColorBarVisual(Visual):
 
     def _prepare_draw(self, view):
         self._draw_mode = "triangles"
+        self._cmap_function.bind_texture()
         return True
 
 
@@ -269,6 +275,9 @@ class ColorBarVisual(CompoundVisual):
     border_color : str | vispy.color.Color
         The color of the border of the colormap. This can either be a
         str as the color's name or an actual instace of a vipy.color.Color
+    cmap_lut : bool
+        If True, color the bar with a lookup table texture of the colormap
+        (see ``vispy.visuals.colormap_lut``).
     """
     # The padding multiplier that's used to place the text
     # next to the Colorbar. Makes sure the text isn't
@@ -282,6 +291,7 @@ class ColorBarVisual(CompoundVisual):
                  clim=(0.0, 1.0),
                  border_width=1.0,
                  border_color="black",
+                 cmap_lut=False,
                  **kwargs):
 
         self._label_str = label_str
@@ -308,7 +318,8 @@ class ColorBarVisual(CompoundVisual):
         self._halfdim = (width * 0.5, height * 0.5)
 
         self._colorbar = _CoreColorBarVisual(pos, self._halfdim,
-                                             cmap, orientation)
+                                             cmap, orientation,
+                                             cmap_lut=cmap_lut)
 
         self._border = _BorderVisual(pos, self._halfdim,
                                      border_width, border_color)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+"""
+Lookup table textures of colormaps, shared between visuals.
+
+Visuals that support a ``cmap_lut`` mode map values to colors with the
+colormap's ``glsl_lut_map`` function instead of its ``glsl_map``. The GLSL
+code is the same for all colormaps, so switching colormaps swaps the
+texture bound to ``$lut`` instead of compiling a new program.
+"""
+
+import weakref
+
+from ..ext.ordereddict import OrderedDict
+from ..gloo import Texture2D
+from ..gloo.context import get_current_canvas
+from .shaders import Function
+
+# Number of textures kept per GL namespace
+_TEXTURE_CACHE_SIZE = 64
+
+# The textures of each GL namespace (GLShared), as textures cannot be used
+# by contexts that do not share objects: {GLShared: {key: Texture2D}}
+_textures = weakref.WeakKeyDictionary()
+# The textures created while no canvas is current
+_default_textures = OrderedDict()
+
+
+def get_colormap_texture(cmap):
+    """Get the lookup table texture of a colormap
+
+    Colormaps with the same lookup table share one texture in each GL
+    namespace (i.e. group of contexts that share objects). Textures are
+    created in the namespace of the current canvas, so this should be called
+    when the visual is about to be drawn.
+
+    Parameters
+    ----------
+    cmap : instance of BaseColormap
+        The colormap.
+
+    Returns
+    -------
+    texture : instance of Texture2D
+        A texture of shape (1, LUT_SIZE) with the colors of
+        ``cmap.texture_lut()``, to bind to the ``$lut`` template variable
+        of ``cmap.glsl_lut_map``.
+
+    Notes
+    -----
+    Textures requested while no canvas is current are shared by all such
+    calls, and are created in the context that first draws them. They
+    should therefore not be used with contexts that do not share objects.
+    ``ColormapFunction`` only requests textures when drawing.
+    """
+    canvas = get_current_canvas()
+    if canvas is None:
+        textures = _default_textures
+    else:
+        textures = _textures.get(canvas.context.shared, None)
+        if textures is None:
+            textures = _textures[canvas.context.shared] = OrderedDict()
+
+    lut = cmap.texture_lut()
+    key = (cmap.lut_interpolation, lut.tobytes())
+    texture = textures.pop(key, None)
+    if texture is None:
+        texture = Texture2D(lut.reshape(1, -1, 4),
+                            interpolation=cmap.lut_interpolation)
+        if len(textures) >= _TEXTURE_CACHE_SIZE:
+            textures.popitem(last=False)
+    textures[key] = texture
+    return texture
+
+
+class ColormapFunction(object):
+    """The shader function that maps values to colors for a visual
+
+    In lookup table mode, the same Function is returned for every colormap
+    and the texture of the colormap is bound to it by ``bind_texture``,
+    which the visual calls in ``_prepare_draw``.
+
+    Parameters
+    ----------
+    lut : bool
+        Whether to use a lookup table texture of the colormap.
+    """
+
+    def __init__(self, lut=False):
+        self._lut = bool(lut)
+        self._lut_function = None
+        self._cmap = None
+        self._need_texture_update = False
+
+    def function(self, cmap):
+        """Get the Function that maps values to the colors of a colormap
+
+        Parameters
+        ----------
+        cmap : instance of BaseColormap
+            The colormap.
+
+        Returns
+        -------
+        function : instance of Function
+            The ``glsl_lut_map`` Function in lookup table mode, or else a
+            new Function of ``cmap.glsl_map``.
+        """
+        self._cmap = cmap
+        if not self._lut:
+            return Function(cmap.glsl_map)
+        if self._lut_function is None:
+            self._lut_function = Function(cmap.glsl_lut_map)
+        self._need_texture_update = True
+        return self._lut_function
+
+    def bind_texture(self):
+        """Bind the lookup table texture of the colormap, if it changed"""
+        if self._need_texture_update:
+            self._lut_function['lut'] = get_colormap_texture(self._cmap)
+            self._need_texture_update = False
@@ -9,6 +9,7 @@ import numpy as np
 from ..gloo import Texture2D, VertexBuffer
 from ..color import get_colormap
 from .shaders import Function, FunctionChain
+from .colormap_lut import ColormapFunction
 from .transforms import NullTransform
 from .visual import Visual
 from ..ext.six import string_types
@@ -129,6 +130,13 @@ class ImageVisual(Visual):
                 'catrom', 'mitchell', 'spline16', 'spline36', 'gaussian',
                 'bessel', 'sinc', 'lanczos', 'blackman'
 
+    cmap_lut : bool
+        If True, map luminance to colors with a lookup table texture of the
+        colormap (see ``vispy.visuals.colormap_lut``).
+    upload_budget : int | None
+        The maximum number of bytes of image data to upload per draw. Large
+        images are then uploaded progressively over several frames (see
+        ``Texture2D.upload_budget``). Default None (upload at once).
     **kwargs : dict
         Keyword arguments to pass to `Visual`.
 
@@ -139,8 +147,11 @@ class ImageVisual(Visual):
     """
     def __init__(self, data=None, method='auto', grid=(1, 1),
                  cmap='viridis', clim='auto',
-                 interpolation='nearest', **kwargs):
+                 interpolation='nearest', cmap_lut=False, upload_budget=None,
+                 **kwargs):
         self._data = None
+        self._cmap_function = ColormapFunction(cmap_lut)
+        self._cmap_chain = None
 
         # load 'float packed rgba8' interpolation kernel
         # to load float interpolation kernel use
@@ -191,6 +202,7 @@ class ImageVisual(Visual):
         self._need_interpolation_update = True
         self._texture = Texture2D(np.zeros((1, 1, 4)),
                                   interpolation=texture_interpolation)
+        self._texture.upload_budget = upload_budget
         self._subdiv_position = VertexBuffer()
         self._subdiv_texcoord = VertexBuffer()
 
@@ -385,8 +397,12 @@ class ImageVisual(Visual):
     def _build_color_transform(self):
         data = self._data
         if data.ndim == 2 or data.shape[2] == 1:
-            fun = FunctionChain(None, [Function(_c2l),
-                                       Function(self._cmap.glsl_map)])
+            cmap_fun = self._cmap_function.function(self._cmap)
+            if self._cmap_chain is None or self._cmap_chain[1] is not cmap_fun:
+                self._cmap_chain = FunctionChain(None, [Function(_c2l),
+                                                        cmap_fun])
+            fun = self._cmap_chain
+            self._cmap_function.bind_texture()
         else:
             fun = Function(_null_color_transform)
         self.shared_program.frag['color_transform'] = fun
@@ -403,3 +403,141 @@ class MeshVisual(Visual):
         if self._bounds is None:
             return None
         return self._bounds[axis]
+
+
+# Apply a per-instance matrix (given as four column attributes)
+instanced_vec3to4_template = """
+vec4 instanced_vec3to4(vec3 xyz) {
+    return mat4($col0, $col1, $col2, $col3) * vec4(xyz, 1.0);
+}
+"""
+
+
+class InstancedMeshVisual(MeshVisual):
+    """Mesh visual that draws many copies of the same mesh in a single
+    draw call
+
+    Each instance has its own transform and (optionally) its own color.
+    This is much cheaper than using one MeshVisual per copy, which costs
+    a program, a set of uniforms and a draw call for each copy. Lighting
+    is not supported.
+
+    Parameters
+    ----------
+    vertices : array-like | None
+        The vertices.
+    faces : array-like | None
+        The faces.
+    vertex_colors : array-like | None
+        Colors to use for each vertex.
+    face_colors : array-like | None
+        Colors to use for each face.
+    color : instance of Color
+        The color to use.
+    meshdata : instance of MeshData | None
+        The meshdata.
+    transforms : array-like | None
+        Array of shape (N, 4, 4) with the matrix of each instance, using
+        the same convention as ``MatrixTransform.matrix``. If None, a
+        single instance with the identity transform is drawn.
+    instance_colors : array-like | None
+        Array of shape (N, 4) with the color of each instance. If None,
+        the vertex, face or uniform colors of the mesh are used.
+    mode : str
+        The drawing mode.
+    **kwargs : dict
+        Keyword arguments to pass to `Visual`.
+    """
+    def __init__(self, vertices=None, faces=None, vertex_colors=None,
+                 face_colors=None, color=(0.5, 0.5, 1, 1), meshdata=None,
+                 transforms=None, instance_colors=None, mode='triangles',
+                 **kwargs):
+        # Per-instance buffers, must exist before MeshVisual sets the data
+        self._instance_cols = [VertexBuffer(np.zeros((0, 4), np.float32),
+                                            divisor=1) for i in range(4)]
+        self._instance_colors = VertexBuffer(np.zeros((0, 4), np.float32),
+                                             divisor=1)
+        self._instance_transform = Function(instanced_vec3to4_template)
+        self._instance_matrices = np.zeros((0, 4, 4), np.float32)
+        self._instance_bounds = None
+        MeshVisual.__init__(self, vertices=vertices, faces=faces,
+                            vertex_colors=vertex_colors,
+                            face_colors=face_colors, color=color,
+                            meshdata=meshdata, shading=None, mode=mode,
+                            **kwargs)
+        for i, col in enumerate(self._instance_cols):
+            self._instance_transform['col%i' % i] = col
+        self.set_instances(transforms, instance_colors)
+
+    def set_instances(self, transforms=None, colors=None):
+        """Set the transforms and colors of the instances
+
+        Parameters
+        ----------
+        transforms : array-like | None
+            Array of shape (N, 4, 4) with the matrix of each instance. If
+            None, a single instance with the identity transform is drawn.
+        colors : array-like | None
+            Array of shape (N, 4) with the color of each instance. If None,
+            the colors of the mesh are used.
+        """
+        if transforms is None:
+            transforms = np.eye(4, dtype=np.float32)[np.newaxis]
+        transforms = np.asarray(transforms, dtype=np.float32)
+        if transforms.ndim != 3 or transforms.shape[1:] != (4, 4):
+            raise ValueError('transforms must have shape (N, 4, 4), not %s'
+                             % (transforms.shape, ))
+        n = transforms.shape[0]
+        if colors is not None:
+            colors = np.asarray(colors, dtype=np.float32)
+            if colors.shape != (n, 4):
+                raise ValueError('colors must have shape (%i, 4), not %s'
+                                 % (n, colors.shape))
+        else:
+            colors = np.zeros((0, 4), np.float32)
+        had_colors = self._instance_colors.size > 0
+        # The rows of the matrix become the columns of the GLSL mat4
+        for i, col in enumerate(self._instance_cols):
+            col.set_data(np.ascontiguousarray(transforms[:, i, :]))
+        self._instance_colors.set_data(colors)
+        self._instance_matrices = transforms
+        self._instances = n
+        self._instance_bounds = None
+        self._bounds_changed()
+        if had_colors != (colors.size > 0):
+            # The shader gets its colors from another input
+            self.mesh_data_changed()
+        else:
+            self.update()
+
+    @property
+    def instance_count(self):
+        """The number of instances that are drawn"""
+        return self._instance_matrices.shape[0]
+
+    def mesh_data_changed(self):
+        self._instance_bounds = None
+        MeshVisual.mesh_data_changed(self)
+
+    def _update_data(self):
+        if MeshVisual._update_data(self) is False:
+            return False
+        self.shared_program.vert['to_vec4'] = self._instance_transform
+        if self._instance_colors.size > 0:
+            self.shared_program.vert[self._color_var] = self._instance_colors
+
+    def _compute_bounds(self, axis, view):
+        if self._bounds is None or self.instance_count == 0:
+            return None
+        if self._instance_bounds is None:
+            # Map the corners of the bounding box of the mesh
+            ranges = [self._bounds[i] if i < len(self._bounds) else (0, 0)
+                      for i in range(3)]
+            corners = np.ones((8, 4), np.float32)
+            corners[:, :3] = [(x, y, z) for x in ranges[0]
+                              for y in ranges[1] for z in ranges[2]]
+            mapped = np.dot(corners, self._instance_matrices)  # (8, N, 4)
+            mapped = mapped[..., :3] / mapped[..., 3:]
+            self._instance_bounds = list(zip(mapped.min(axis=(0, 1)),
+                                             mapped.max(axis=(0, 1))))
+        return self._instance_bounds[axis]
@@ -46,6 +46,38 @@ class Compiler(object):
         """
         return self._object_names[item]
 
+    def structure(self):
+        """ Return a hashable key describing the structure of all shaders,
+        and the list of objects that the key refers to.
+
+        The key covers the code templates, the names and the variable types
+        of all objects, but not the values of variables. Shaders with equal
+        keys compile to the same code, where objects at the same position in
+        the list get the same name. The key is None if some object cannot
+        describe its structure.
+        """
+        objects = []
+        indices = {}
+
+        def index(obj):
+            i = indices.get(obj, None)
+            if i is None:
+                i = indices[obj] = len(objects)
+                objects.append(obj)
+            return i
+
+        walks = []
+        for shader_name, shader in self.shaders.items():
+            deps = tuple(index(dep) for dep in shader.dependencies(sort=True))
+            walks.append((shader_name, deps))
+        structures = []
+        for obj in objects:  # objects may be appended while iterating
+            structure = obj._structure(index)
+            if structure is None:
+                return None, objects
+            structures.append(structure)
+        return (tuple(walks), tuple(structures)), objects
+
     def compile(self, pretty=True):
         """ Compile all code and return a dict {name: code} where the keys
         are determined by the keyword arguments passed to __init__().
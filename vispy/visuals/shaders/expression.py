@@ -40,6 +40,9 @@ class TextExpression(Expression):
         self._text = t
         self.changed()
 
+    def _structure(self, index):
+        return self.__class__, self._text
+
     def __eq__(self, a):
         if isinstance(a, TextExpression):
             return a._text == self._text
@@ -98,3 +101,7 @@ class FunctionCall(Expression):
         args = ', '.join(str_args)
         fname = self.function.expression(names)
         return '%s(%s)' % (fname, args)
+
+    def _structure(self, index):
+        return (self.__class__, index(self._function),
+                tuple(index(arg) for arg in self._args))
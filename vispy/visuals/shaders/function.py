@@ -476,6 +476,16 @@ class Function(ShaderObject):
 
     def expression(self, names):
         return names[self]
+
+    def _structure(self, index):
+        def ref(obj):
+            return index(obj) if isinstance(obj, ShaderObject) else obj
+        return (self.__class__, self._code,
+                tuple(self._replacements.items()),
+                tuple((key, ref(val))
+                      for key, val in self._expressions.items()),
+                tuple((ref(key), ref(val))
+                      for key, val in self._assignments.items()))
     
     def _clean_code(self, code):
         """ Return *code* with indentation and leading/trailing blank lines
@@ -732,6 +742,10 @@ class FunctionChain(Function):
     def static_names(self):
         return []
 
+    def _structure(self, index):
+        return (self.__class__, self._name,
+                tuple(index(func) for func in self._funcs))
+
     def __repr__(self):
         fn = ",\n                ".join(map(repr, self.functions))
         return "<FunctionChain [%s] at 0x%x>" % (fn, id(self))
@@ -775,3 +789,7 @@ class StatementList(ShaderObject):
         for item, pos in self.order:
             code += item.expression(obj_names) + ';\n'
         return code
+
+    def _structure(self, index):
+        return (self.__class__,
+                tuple((index(item), pos) for item, pos in self.items.items()))
@@ -5,6 +5,7 @@
 from __future__ import division
 
 import re
+from functools import wraps
 
 # regular expressions for parsing GLSL
 re_type = r'(?:void|int|float|vec2|vec3|vec4|mat2|mat3|mat4|\
@@ -52,6 +53,39 @@ re_func_prot = ("(" + re_type + ")\s+" + re_func_name + "\((void|" +
                 re_anon_arg_list + ")\)\s*;")
 
 
+# Results of the parse functions below, by function and code. The same GLSL
+# snippets (transforms, colormaps, markers, ...) are parsed for every
+# visual, so each code string is only parsed once. The cache is cleared
+# when it gets full.
+_parse_cache = {}
+_PARSE_CACHE_SIZE = 4096
+
+
+def _memoize(copy):
+    """ Decorator that caches the result of a parse function by the code
+    string. Results are returned through *copy*, so that callers can
+    modify them.
+    """
+    def decorator(func):
+        @wraps(func)
+        def cached_func(code):
+            key = func, code
+            result = _parse_cache.get(key, None)
+            if result is None:
+                result = func(code)
+                if len(_parse_cache) >= _PARSE_CACHE_SIZE:
+                    _parse_cache.clear()
+                _parse_cache[key] = result
+            return copy(result)
+        return cached_func
+    return decorator
+
+
+def _copy_signatures(signatures):
+    return [(name, list(args), rtype) for name, args, rtype in signatures]
+
+
+@_memoize(lambda sig: (sig[0], list(sig[1]), sig[2]))
 def parse_function_signature(code):
     """
     Return the name, arguments, and return type of the first function
@@ -70,6 +104,7 @@ def parse_function_signature(code):
     return name, args, rtype
 
 
+@_memoize(_copy_signatures)
 def find_functions(code):
     """
     Return a list of (name, arguments, return type) for all function 
@@ -93,6 +128,7 @@ def find_functions(code):
         code = code[m.end():]
 
 
+@_memoize(_copy_signatures)
 def find_prototypes(code):
     """
     Return a list of signatures for each function prototype declared in *code*.
@@ -115,6 +151,7 @@ def find_prototypes(code):
     return prots
 
 
+@_memoize(dict)
 def find_program_variables(code):
     """
     Return a dict describing program variables::
@@ -133,6 +170,7 @@ def find_program_variables(code):
     return vars
 
 
+@_memoize(list)
 def find_template_variables(code):
     """
     Return a list of template variables found in *code*.
@@ -10,11 +10,20 @@ from ...gloo import Program
 from ...gloo.preprocessor import preprocess
 from ...util import logger
 from ...util.event import EventEmitter
+from ...ext.ordereddict import OrderedDict
 from .function import MainFunction
 from .variable import Variable
 from .compiler import Compiler
 
 
+# Compiled code of recently built programs, keyed by the structure of their
+# shaders (see Compiler.structure): {key: (code, names)}, where *names* gives
+# the name of each object in the structure. This way, programs of the same
+# structure (e.g. many instances of one visual) are compiled only once.
+_code_cache = OrderedDict()
+_CODE_CACHE_SIZE = 256
+
+
 class ModularProgram(Program):
     """
     Shader program using Function instances as basis for its shaders.
@@ -29,6 +38,9 @@ class ModularProgram(Program):
 
         # Cache state of Variables so we know which ones require update
         self._variable_state = {}
+        # [(name, Variable)] for all attributes and uniforms; only changes
+        # when the code changes
+        self._variable_bindings = None
 
         self._vert = MainFunction('')
         self._frag = MainFunction('')
@@ -69,6 +81,7 @@ class ModularProgram(Program):
             
         if code_changed:
             self._need_build = True
+            self._variable_bindings = None
         self.changed(code_changed=code_changed, 
                      value_changed=value_changed)
     
@@ -87,29 +100,67 @@ class ModularProgram(Program):
     def _build(self):
         logger.debug("Rebuild ModularProgram: %s", self)
         self.compiler = Compiler(vert=self.vert, frag=self.frag)
-        code = self.compiler.compile()
+        key, objects = self.compiler.structure()
+        cached = _code_cache.pop(key, None) if key is not None else None
+        if cached is None:
+            code = self.compiler.compile()
+            names = self.compiler._object_names
+            cached = code, [names.get(obj, None) for obj in objects]
+        else:
+            code, names = cached
+            self.compiler = Compiler(
+                namespace=dict((obj, name) for obj, name in
+                               zip(objects, names) if name is not None),
+                vert=self.vert, frag=self.frag)
+            self.compiler.code = code
+        if key is not None:
+            # Move to the end; the least recently used code is dropped
+            _code_cache[key] = cached
+            if len(_code_cache) > _CODE_CACHE_SIZE:
+                _code_cache.popitem(last=False)
         self.set_shaders(code['vert'], code['frag'])
+        self._variable_bindings = None
         logger.debug('==== Vertex Shader ====\n\n%s\n', code['vert'])
         logger.debug('==== Fragment shader ====\n\n%s\n', code['frag'])
         # Note: No need to reset _variable_state, gloo.Program resends
         # attribute/uniform data on setting shaders
 
-    def update_variables(self):
-        # Clear any variables that we may have set another time.
-        # Otherwise we get lots of warnings.
-        self._pending_variables = {}
-        # set all variables
+    def _get_variable_bindings(self):
+        """ Return [(name, Variable)] for all attributes and uniforms in the
+        shaders, in dependency order.
+        """
+        bindings = []
+        seen = set()
         settable_vars = 'attribute', 'uniform'
-        logger.debug("Apply variables:")
         deps = self.vert.dependencies() + self.frag.dependencies()
         for dep in deps:
             if not isinstance(dep, Variable) or dep.vtype not in settable_vars:
                 continue
-            name = self.compiler[dep]
+            if dep in seen:
+                continue
+            seen.add(dep)
+            bindings.append((self.compiler[dep], dep))
+        return bindings
+
+    def update_variables(self):
+        # Clear any variables that we may have set another time.
+        # Otherwise we get lots of warnings.
+        self._pending_variables = {}
+        # The bindings are cached; walking the dependencies on each draw is
+        # expensive for complex visuals
+        if self._variable_bindings is None:
+            self._variable_bindings = self._get_variable_bindings()
+        # set all variables
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Apply variables:")
+        variable_state = self._variable_state
+        for name, dep in self._variable_bindings:
             state_id = dep.state_id
-            if self._variable_state.get(name, None) != state_id:
+            if variable_state.get(name, None) != state_id:
                 self[name] = dep.value
-                self._variable_state[name] = state_id
-                logger.debug("    %s = %s **", name, dep.value)
-            else:
+                variable_state[name] = state_id
+                if debug:
+                    logger.debug("    %s = %s **", name, dep.value)
+            elif debug:
                 logger.debug("    %s = %s", name, dep.value)
@@ -104,6 +104,17 @@ class ShaderObject(object):
         determining object names.
         """
         return []
+
+    def _structure(self, index):
+        """ Return a hashable description of everything that determines the
+        compiled code of this object, but not the values of its variables.
+        Other objects are referred to by ``index(obj)``.
+
+        Objects with equal structures compile to the same code (up to the
+        names of their dependencies); see ``Compiler.structure()``. Return
+        None if the structure cannot be described.
+        """
+        return None
     
     def _add_dep(self, dep):
         """ Increment the reference count for *dep*. If this is a new 
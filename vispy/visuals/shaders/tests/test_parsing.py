@@ -3,7 +3,12 @@
 # Distributed under the (new) BSD License. See LICENSE.txt for more info.
 import re
 
-from vispy.visuals.shaders.parsing import re_identifier, find_program_variables
+from vispy.visuals.shaders import parsing
+from vispy.visuals.shaders.parsing import (re_identifier,
+                                           find_program_variables,
+                                           find_functions,
+                                           find_template_variables,
+                                           parse_function_signature)
 from vispy.testing import run_tests_if_main
 
 
@@ -54,4 +59,32 @@ def test_find_variables():
     assert len(vars) == 0
 
 
+def test_parse_cache():
+    code = """
+    uniform vec2 s;
+    vec4 f(vec4 pos, float scale) { return pos * scale * $gain; }
+    void main() { gl_Position = f($position, 2.0); }
+    """
+    parsing._parse_cache.clear()
+    funcs = find_functions(code)
+    variables = find_program_variables(code)
+    templates = find_template_variables(code)
+    sig = parse_function_signature(code)
+    assert len(parsing._parse_cache) == 4
+
+    # Cached results are equal, but callers get their own copy to modify
+    assert find_functions(code) == funcs
+    assert find_functions(code) is not funcs
+    funcs[0][1].append(('int', 'x'))
+    assert find_functions(code)[0][1] == [('vec4', 'pos'), ('float', 'scale')]
+    variables.pop('s')
+    assert find_program_variables(code) == {'s': ('uniform', 'vec2')}
+    templates.append('junk')
+    assert find_template_variables(code) == ['$gain', '$position']
+    sig[1].append(('int', 'x'))
+    assert parse_function_signature(code) == (
+        'f', [('vec4', 'pos'), ('float', 'scale')], 'vec4')
+    assert len(parsing._parse_cache) == 4
+
+
 run_tests_if_main()
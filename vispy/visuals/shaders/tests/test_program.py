@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2015, Vispy Development Team.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+from vispy.visuals.shaders import (ModularProgram, Function, Variable,
+                                   Compiler)
+from vispy.visuals.shaders import program as program_module
+from vispy.visuals.transforms import STTransform, MatrixTransform
+from vispy.testing import run_tests_if_main
+
+
+vert = """
+attribute vec2 a_pos;
+void main() {
+    gl_Position = $transform(vec4(a_pos, 0, 1));
+    gl_PointSize = $size;
+}
+"""
+
+frag = """
+void main() {
+    gl_FragColor = $color;
+}
+"""
+
+
+def make_program(scale, transform=None):
+    prog = ModularProgram(vert, frag)
+    if transform is None:
+        transform = STTransform(scale=(scale, 1)) * MatrixTransform()
+    prog.vert['transform'] = transform
+    prog.vert['size'] = 3.0 * scale
+    prog.frag['color'] = (1, 0, 0, scale / 10.)
+    return prog
+
+
+def test_structure():
+    p1 = make_program(1)
+    p2 = make_program(2)
+    key1, objects1 = Compiler(vert=p1.vert, frag=p1.frag).structure()
+    key2, objects2 = Compiler(vert=p2.vert, frag=p2.frag).structure()
+    assert key1 is not None
+    assert key1 == key2 and hash(key1) == hash(key2)
+    assert len(objects1) == len(objects2)
+    assert p1.vert in objects1 and p1.vert not in objects2
+
+    # values do not matter, but code and variable types do
+    p2.vert['size'] = 4.0
+    assert Compiler(vert=p2.vert, frag=p2.frag).structure()[0] == key1
+    p2.vert['size'] = Variable('uniform int u_size', 4)
+    assert Compiler(vert=p2.vert, frag=p2.frag).structure()[0] != key1
+    p3 = make_program(1, transform=STTransform())
+    assert Compiler(vert=p3.vert, frag=p3.frag).structure()[0] != key1
+    p3.vert['transform'] = Function('vec4 f(vec4 pos) { return pos; }')
+    p3.frag.replace('gl_FragColor = ', 'gl_FragColor = 0.5 * ')
+    assert Compiler(vert=p3.vert, frag=p3.frag).structure()[0] != key1
+
+
+def test_code_cache():
+    program_module._code_cache.clear()
+    progs = [make_program(i) for i in range(1, 4)]
+    for prog in progs:
+        prog.build_if_needed()
+    assert len(program_module._code_cache) == 1
+
+    # All programs get the code and variable names of a full compile
+    for prog in progs:
+        compiler = Compiler(vert=prog.vert, frag=prog.frag)
+        code = compiler.compile()
+        assert prog.shaders == (code['vert'], code['frag'])
+        for name in ('size', 'color'):
+            func = prog.vert if name == 'size' else prog.frag
+            assert prog.compiler[func[name]] == compiler[func[name]]
+    for i, prog in enumerate(progs):
+        assert prog['u_size'] == 3.0 * (i + 1)
+
+    # A different structure is compiled separately
+    prog = make_program(1, transform=STTransform())
+    prog.build_if_needed()
+    assert len(program_module._code_cache) == 2
+
+
+def test_variable_bindings():
+    transform = MatrixTransform()
+    prog = make_program(2, transform=transform)
+    prog.build_if_needed()
+    bindings = prog._variable_bindings
+    assert sorted(name for name, var in bindings) == ['u_color', 'u_matrix',
+                                                      'u_size']
+
+    # Changing values reuses the bindings
+    prog.vert['size'] = 5.0
+    transform.scale((4, 1, 1))
+    prog.build_if_needed()
+    assert prog._variable_bindings is bindings
+    assert prog['u_size'] == 5.0
+    assert prog['u_matrix'][0] == 4
+
+    # Changing code invalidates them
+    prog.frag['color'] = Variable('uniform vec4 u_rgba', (0, 1, 0, 1))
+    assert prog._variable_bindings is None
+    prog.build_if_needed()
+    assert 'u_rgba' in [name for name, var in prog._variable_bindings]
+    assert list(prog['u_rgba']) == [0, 1, 0, 1]
+
+
+run_tests_if_main()
@@ -159,6 +159,10 @@ class Variable(ShaderObject):
     def expression(self, names):
         return names[self]
     
+    def _structure(self, index):
+        value = str(self.value) if self.vtype == 'const' else None
+        return self.__class__, self.name, self.vtype, self.dtype, value
+
     def definition(self, names):
         if self.vtype is None:
             raise RuntimeError("Variable has no vtype: %r" % self)
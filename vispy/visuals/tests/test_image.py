@@ -2,6 +2,8 @@
 import numpy as np
 
 from vispy.scene.visuals import Image
+from vispy.visuals import ColorBarVisual, ImageVisual, VolumeVisual
+from vispy.visuals.transforms import TransformSystem
 from vispy.testing import (requires_application, TestingCanvas,
                            run_tests_if_main)
 from vispy.testing.image_tester import assert_image_approved
@@ -22,4 +24,43 @@ def test_image():
                                   ("_rgb" if three_d else "_mono"))
 
 
+def test_image_cmap_lut():
+    """Test image visuals that share colormap lookup table textures"""
+    data = np.random.rand(10, 20)
+    images = []
+    for i in range(2):
+        image = ImageVisual(data, cmap='viridis', cmap_lut=True)
+        image.transforms = TransformSystem(None)
+        image._prepare_draw(image)
+        images.append(image)
+    lut_fun = images[0].shared_program.frag['color_transform'][1]
+    texture = lut_fun['lut'].value
+    assert images[1].shared_program.frag['color_transform'][1]['lut'].value \
+        is texture
+
+    # Switching colormaps binds another texture but keeps the code
+    program = images[0]._program
+    program.build_if_needed()
+    shaders = program.shaders
+    images[0].cmap = 'hot'
+    images[0]._prepare_draw(images[0])
+    assert lut_fun['lut'].value is not texture
+    assert not program._need_build
+    assert program.shaders == shaders
+    images[0].cmap = 'viridis'
+    images[0]._prepare_draw(images[0])
+    assert lut_fun['lut'].value is texture
+
+    # Other visuals with cmap_lut share the texture
+    vol = np.random.rand(4, 4, 4).astype(np.float32)
+    volume = VolumeVisual(vol, cmap='viridis', cmap_lut=True)
+    volume._prepare_draw(volume)
+    assert volume.shared_program.frag['cmap']['lut'].value is texture
+    colorbar = ColorBarVisual('viridis', 'right', (100, 10),
+                              cmap_lut=True)._colorbar
+    colorbar._prepare_draw(colorbar)
+    assert colorbar.shared_program.frag['color_transform']['lut'].value \
+        is texture
+
+
 run_tests_if_main()
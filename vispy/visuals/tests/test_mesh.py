@@ -2,6 +2,7 @@
 
 import numpy as np
 from vispy import scene
+from vispy.visuals import InstancedMeshVisual
 
 from vispy.geometry import create_cube
 from vispy.testing import run_tests_if_main, requires_pyopengl
@@ -26,4 +27,44 @@ def test_mesh_color():
     np.testing.assert_allclose(vertices['position'], new_vertices)
 
 
+def test_instanced_mesh():
+    vertices, filled_indices, outline_indices = create_cube()
+    transforms = np.tile(np.eye(4, dtype=np.float32), (3, 1, 1))
+    transforms[:, 3, 0] = [0, 10, 20]  # translate along x
+    mesh = InstancedMeshVisual(vertices['position'], filled_indices,
+                               transforms=transforms)
+    assert mesh.instance_count == 3
+    assert mesh._instances == 3
+    np.testing.assert_allclose(mesh._compute_bounds(0, mesh), (-1, 21))
+    np.testing.assert_allclose(mesh._compute_bounds(1, mesh), (-1, 1))
+
+    # Per-instance data ends up in divisor-1 attributes of the program
+    colors = np.random.rand(3, 4).astype(np.float32)
+    mesh.set_instances(transforms[:2], colors[:2])
+    assert mesh.instance_count == 2
+    np.testing.assert_allclose(mesh._compute_bounds(0, mesh), (-1, 11))
+    mesh._prepare_draw(mesh)
+    mesh._program.build_if_needed()
+    assert 'mat4(' in mesh._program.shaders[0]
+    buffers = [v for v in mesh._program._user_variables.values()
+               if getattr(v, 'divisor', 0)]
+    assert len(buffers) == 5  # four matrix columns and the colors
+
+    # Updating the instances does not upload the mesh data again
+    transforms[:, 3, 1] = 5
+    mesh.set_instances(transforms, colors)
+    assert not mesh._data_changed
+    assert mesh._instances == 3
+    np.testing.assert_allclose(mesh._compute_bounds(1, mesh), (4, 6))
+
+    # Default is a single instance with identity transform
+    mesh.set_instances()
+    assert mesh.instance_count == 1
+    np.testing.assert_allclose(mesh._compute_bounds(2, mesh), (-1, 1))
+    np.testing.assert_raises(ValueError, mesh.set_instances,
+                             np.eye(3))
+    np.testing.assert_raises(ValueError, mesh.set_instances,
+                             transforms, colors[:2])
+
+
 run_tests_if_main()
@@ -37,7 +37,8 @@ class TextureFont(object):
         SDF renderer to use.
     """
     def __init__(self, font, renderer):
-        self._atlas = TextureAtlas()
+        self._atlas = TextureAtlas(max_shape=(4096, 4096),
+                                   evict=self._evict_glyph)
         self._atlas.wrapping = 'clamp_to_edge'
         self._kernel, _ = load_spatial_filters()
         self._renderer = renderer
@@ -51,6 +52,8 @@ class TextureFont(object):
         self._spread = 32
         assert self._spread % self.ratio == 0
         self._glyphs = {}
+        self._region_chars = {}  # atlas region -> char
+        self._atlas_shape = self._atlas.shape[:2]
 
     @property
     def ratio(self):
@@ -67,7 +70,28 @@ class TextureFont(object):
             raise TypeError('index must be a 1-character string')
         if char not in self._glyphs:
             self._load_char(char)
-        return self._glyphs[char]
+        glyph = self._glyphs[char]
+        self._atlas.use_region(glyph['region'])
+        if self._atlas.shape[:2] != self._atlas_shape:
+            # The atlas has grown, update all texture coordinates
+            self._atlas_shape = self._atlas.shape[:2]
+            for g in self._glyphs.values():
+                self._set_texcoords(g)
+        return glyph
+
+    def _set_texcoords(self, glyph):
+        x, y, w, h = glyph['region']
+        x, y, w, h = x + 1, y + 1, w - 2, h - 2
+        u0 = x / float(self._atlas.shape[1])
+        v0 = y / float(self._atlas.shape[0])
+        u1 = (x+w) / float(self._atlas.shape[1])
+        v1 = (y+h) / float(self._atlas.shape[0])
+        glyph['texcoords'] = (u0, v0, u1, v1)
+
+    def _evict_glyph(self, region):
+        """Forget a glyph whose atlas region was evicted"""
+        char = self._region_chars.pop(region)
+        del self._glyphs[char]
 
     def _load_char(self, char):
         """Build and store a glyph corresponding to an individual character
@@ -95,17 +119,15 @@ class TextureFont(object):
         width = data.shape[1] // self.ratio
         region = self._atlas.get_free_region(width + 2, height + 2)
         if region is None:
+            del self._glyphs[char]
             raise RuntimeError('Cannot store glyph')
+        self._region_chars[region] = char
         x, y, w, h = region
         x, y, w, h = x + 1, y + 1, w - 2, h - 2
 
         self._renderer.render_to_texture(data, self._atlas, (x, y), (w, h))
-        u0 = x / float(self._atlas.shape[1])
-        v0 = y / float(self._atlas.shape[0])
-        u1 = (x+w) / float(self._atlas.shape[1])
-        v1 = (y+h) / float(self._atlas.shape[0])
-        texcoords = (u0, v0, u1, v1)
-        glyph.update(dict(size=(w, h), texcoords=texcoords))
+        glyph.update(dict(size=(w, h), region=region))
+        self._set_texcoords(glyph)
 
 
 class FontManager(object):
@@ -130,7 +152,11 @@ class FontManager(object):
 
 
 def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
-    """Convert text characters to VBO"""
+    """Convert text characters to VBO
+
+    The atlas regions of the glyphs are locked, so that loading the other
+    glyphs of the text cannot evict them; the caller unlocks the atlas.
+    """
     # Necessary to flush commands before requesting current viewport because
     # There may be a set_viewport command waiting in the queue.
     # TODO: would be nicer if each canvas just remembers and manages its own
@@ -155,6 +181,7 @@ def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
     orig_viewport = canvas.context.get_viewport()
     for ii, char in enumerate(text):
         glyph = font[char]
+        font._atlas.use_region(glyph['region'], lock=True)
         kerning = glyph['kerning'].get(prev, 0.) * ratio
         x0 = x_off + glyph['offset'][0] * ratio + kerning
         y0 = glyph['offset'][1] * ratio + slop
@@ -177,6 +204,7 @@ def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
     # vertical alignment can be very inconsistent
     for char in 'hy':
         glyph = font[char]
+        font._atlas.use_region(glyph['region'], lock=True)
         y0 = glyph['offset'][1] * ratio + slop
         y1 = y0 - glyph['size'][1]
         ascender = max(ascender, y0 - slop)
@@ -334,6 +362,7 @@ class TextVisual(Visual):
         self._font_manager = font_manager or FontManager()
         self._font = self._font_manager.get_font(face, bold, italic)
         self._vertices = None
+        self._atlas_version = None
         self._anchors = (anchor_x, anchor_y)
         # Init text properties
         self.color = color
@@ -431,16 +460,33 @@ class TextVisual(Visual):
         # attributes / uniforms are not available until program is built
         if len(self.text) == 0:
             return False
+        atlas = self._font._atlas
+        if self._atlas_version != atlas.version:
+            # Glyphs moved or were evicted
+            self._vertices = None
         if self._vertices is None:
             text = self.text
             if isinstance(text, string_types):
                 text = [text]
             n_char = sum(len(t) for t in text)
             # we delay creating vertices because it requires a context,
-            # which may or may not exist when the object is initialized
-            self._vertices = np.concatenate([
-                _text_to_vbo(t, self._font, self._anchors[0], self._anchors[1],
-                             self._font._lowres_size) for t in text])
+            # which may or may not exist when the object is initialized.
+            # Loading glyphs can grow the atlas, which moves the glyphs
+            # that were loaded before, so we retry until the atlas is
+            # unchanged. The glyphs of the text are locked while loading,
+            # so that they do not evict each other and the second pass
+            # does not change the atlas.
+            try:
+                while True:
+                    self._atlas_version = atlas.version
+                    self._vertices = np.concatenate([
+                        _text_to_vbo(t, self._font, self._anchors[0],
+                                     self._anchors[1], self._font._lowres_size)
+                        for t in text])
+                    if self._atlas_version == atlas.version:
+                        break
+            finally:
+                atlas.unlock_regions()
             self._vertices = VertexBuffer(self._vertices)
             idx = (np.array([0, 1, 2, 0, 2, 3], np.uint32) +
                    np.arange(0, 4*n_char, 4, dtype=np.uint32)[:, np.newaxis])
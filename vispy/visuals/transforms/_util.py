@@ -122,6 +122,72 @@ def arg_to_vec4(func, self_, arg, *args, **kwargs):
         raise TypeError("Cannot convert argument to 4D vector: %s" % arg)
 
 
+def map_blocks(func, coords, out=None, dtype=None, chunk_size=None):
+    """
+    Apply a block mapping function to an (N, D) array of coordinates,
+    writing the results to an (N, 4) output array.
+
+    Parameters
+    ----------
+    func : callable
+        Function ``func(coords, out)`` that maps a block of coordinates
+        with shape (n, D) into a block of *out* with shape (n, 4). Missing
+        coordinates default to z=0 and w=1, as in `as_vec4`. The two
+        arguments may be the same array.
+    coords : array-like
+        Coordinates with shape (N, D), where D <= 4.
+    out : ndarray | None
+        Floating point array with shape (N, 4) that receives the results.
+        This may be *coords* itself to map in place.
+    dtype : dtype | None
+        The dtype of the output array if *out* is None (default float64).
+    chunk_size : int | None
+        If given, map at most this many coordinates at a time. This bounds
+        the size of the temporary arrays.
+
+    Returns
+    -------
+    out : ndarray
+        The mapped coordinates.
+    """
+    coords = np.asarray(coords)
+    if coords.ndim != 2 or coords.shape[1] > 4:
+        raise TypeError("Array shape %s cannot be converted to (N, 4)"
+                        % (coords.shape,))
+    n = coords.shape[0]
+    if out is None:
+        out = np.empty((n, 4), dtype=np.float64 if dtype is None else dtype)
+    else:
+        if out.shape != (n, 4):
+            raise ValueError("out must have shape %s, not %s"
+                             % ((n, 4), out.shape))
+        if dtype is not None and np.dtype(dtype) != out.dtype:
+            raise ValueError("dtype does not match the dtype of out")
+    if out.dtype.kind != 'f':
+        raise TypeError("out must have a floating point dtype")
+    if chunk_size is None:
+        chunk_size = n
+    chunk_size = max(int(chunk_size), 1)
+    inplace = coords is out
+    for start in range(0, n, chunk_size):
+        block = out[start:start + chunk_size]
+        func(block if inplace else coords[start:start + chunk_size], block)
+    return out
+
+
+def vec4_block(coords, out):
+    """
+    Copy a block of (n, D) coordinates into an (n, 4) block, filling
+    missing coordinates with z=0 and w=1.
+    """
+    d = coords.shape[1]
+    if coords is not out:
+        out[:, :d] = coords
+    out[:, d:3] = 0
+    if d < 4:
+        out[:, 3] = 1
+
+
 class TransformCache(object):
     """ Utility class for managing a cache of ChainTransforms.
 
@@ -165,8 +231,8 @@ class TransformCache(object):
 
     def _create(self, path):
         # import here to avoid import cycle
-        from .chain import ChainTransform
-        return ChainTransform(path)
+        from .chain import FusedChainTransform
+        return FusedChainTransform(path)
 
     def roll(self):
         """ Increase the age of all items in the cache by 1. Items whose age
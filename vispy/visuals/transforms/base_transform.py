@@ -20,6 +20,7 @@ from __future__ import division
 
 from ..shaders import Function
 from ...util.event import EventEmitter
+from ._util import as_vec4, map_blocks
 
 
 class BaseTransform(object):
@@ -95,6 +96,59 @@ class BaseTransform(object):
         """
         raise NotImplementedError()
 
+    def map_bulk(self, coords, out=None, dtype=None, chunk_size=None):
+        """
+        Map a large array of coordinates through the forward
+        transformation.
+
+        Unlike `map`, this writes the results to a preallocated array and
+        avoids float64 temporaries, so it is suited to millions of points.
+
+        Parameters
+        ----------
+        coords : array-like
+            Coordinates with shape (N, D), where D <= 4. Missing coordinates
+            default to z=0 and w=1.
+        out : ndarray | None
+            Floating point array with shape (N, 4) that receives the mapped
+            coordinates. This may be *coords* itself to map in place.
+        dtype : dtype | None
+            The dtype of the output array if *out* is None (default
+            float64). Use float32 to halve memory use.
+        chunk_size : int | None
+            If given, map at most this many coordinates at a time to bound
+            the size of temporary arrays.
+
+        Returns
+        -------
+        out : ndarray
+            The mapped coordinates, with shape (N, 4).
+        """
+        return map_blocks(self._map_block, coords, out, dtype, chunk_size)
+
+    def imap_bulk(self, coords, out=None, dtype=None, chunk_size=None):
+        """
+        Map a large array of coordinates through the inverse
+        transformation.
+
+        See `map_bulk` for the parameters.
+        """
+        return map_blocks(self._imap_block, coords, out, dtype, chunk_size)
+
+    def _map_block(self, coords, out):
+        """
+        Map a block of (n, D) coordinates into an (n, 4) block of *out*,
+        which may be the same array as *coords*. Subclasses should override
+        this with an implementation that does not go through `map`.
+        """
+        out[...] = self.map(as_vec4(coords))
+
+    def _imap_block(self, coords, out):
+        """
+        See _map_block.
+        """
+        out[...] = self.imap(as_vec4(coords))
+
     @property
     def inverse(self):
         """ The inverse of this transform. 
@@ -201,6 +255,9 @@ class InverseTransform(BaseTransform):
         self._inverse = transform
         self.map = transform.imap
         self.imap = transform.map
+        self._map_block = transform._imap_block
+        self._imap_block = transform._map_block
+        transform.changed.connect(self.changed)
     
     @property
     def Linear(self):
@@ -4,9 +4,12 @@
 
 from __future__ import division
 
+import numpy as np
+
 from ..shaders import FunctionChain
+from ._util import vec4_block
 from .base_transform import BaseTransform
-from .linear import NullTransform
+from .linear import NullTransform, MatrixTransform
 
 
 class ChainTransform(BaseTransform):
@@ -165,6 +168,12 @@ class ChainTransform(BaseTransform):
             coords = tr.imap(coords)
         return coords
 
+    def _map_block(self, coords, out):
+        _map_chain_block(self.transforms[::-1], coords, out, 'map')
+
+    def _imap_block(self, coords, out):
+        _map_chain_block(self.transforms, coords, out, 'imap')
+
     def shader_map(self):
         return self._shader_map
 
@@ -293,3 +302,198 @@ class SimplifiedChainTransform(ChainTransform):
             tr = new_tr
 
         self.transforms = tr
+
+
+class FusedChainTransform(ChainTransform):
+    """ChainTransform that folds each run of consecutive linear transforms
+    into a single MatrixTransform.
+
+    Nested chains are flattened first. Transforms that are not linear, or
+    that are flagged as ``dynamic``, stay separate links. When a transform in
+    a run changes, only the matrix of that run is computed again: the GLSL
+    code of the chain stays the same, and only a matrix uniform changes. The
+    inverse of each matrix is cached.
+
+    The ``transforms`` property still gives the original transforms; the
+    folded links are given by ``fused_transforms``. TransformSystem uses
+    this class for the transforms returned by ``get_transform()``.
+
+    Arguments:
+
+    transforms : list of BaseTransform instances
+        See ``transforms`` property.
+    """
+
+    def __init__(self, *transforms):
+        self._structure = None
+        self._fused = []
+        self._runs = []  # [(folded transform, list of transforms)]
+        self._leaf_runs = {}  # {id(transform): [index in _runs]}
+        ChainTransform.__init__(self, *transforms)
+
+    @property
+    def fused_transforms(self):
+        """The list of transforms that are used for mapping: the flattened
+        transforms of the chain, with runs of linear transforms replaced by
+        a MatrixTransform.
+        """
+        return self._fused
+
+    def map(self, coords):
+        """Map coordinates
+
+        Parameters
+        ----------
+        coords : array-like
+            Coordinates to map.
+
+        Returns
+        -------
+        coords : ndarray
+            Coordinates.
+        """
+        for tr in reversed(self._fused):
+            coords = tr.map(coords)
+        return coords
+
+    def imap(self, coords):
+        """Inverse map coordinates
+
+        Parameters
+        ----------
+        coords : array-like
+            Coordinates to inverse map.
+
+        Returns
+        -------
+        coords : ndarray
+            Coordinates.
+        """
+        for tr in self._fused:
+            coords = tr.imap(coords)
+        return coords
+
+    def _map_block(self, coords, out):
+        _map_chain_block(self._fused[::-1], coords, out, 'map')
+
+    def _imap_block(self, coords, out):
+        _map_chain_block(self._fused, coords, out, 'imap')
+
+    def _rebuild_shaders(self):
+        self._fuse()
+
+    def _subtr_changed(self, ev):
+        """One of the internal transforms changed; fold the runs that
+        contain it again and propagate the signal.
+        """
+        runs = None
+        if ev is not None:
+            for source in ev.sources:
+                runs = self._leaf_runs.get(id(source))
+                if runs is not None:
+                    break
+        if runs is None:
+            # A nested chain changed; its transforms may be different
+            self._fuse()
+        else:
+            for i in runs:
+                self._fold(i)
+        self.update(ev)
+
+    def _fuse(self):
+        """Flatten the chain and fold its runs of linear transforms. The
+        shaders are only rebuilt if this changes the links of the chain.
+        """
+        # Flatten the chain by expanding all nested chains
+        leaves = []
+        transforms = self._transforms[:]
+        while len(transforms) > 0:
+            tr = transforms.pop(0)
+            if isinstance(tr, ChainTransform) and not tr.dynamic:
+                transforms = tr.transforms[:] + transforms
+            else:
+                leaves.append(tr)
+        foldable = [bool(tr.Linear) and not tr.dynamic for tr in leaves]
+        structure = [(id(tr), f) for tr, f in zip(leaves, foldable)]
+        if structure == self._structure:
+            for i in range(len(self._runs)):
+                self._fold(i)
+            return
+        self._structure = structure
+
+        # Group the runs of foldable transforms, reusing the folded
+        # transforms of the previous structure
+        folded = [run[0] for run in self._runs]
+        self._fused = []
+        self._runs = []
+        self._leaf_runs = {}
+        i = 0
+        while i < len(leaves):
+            j = i + 1
+            if foldable[i]:
+                while j < len(leaves) and foldable[j]:
+                    j += 1
+            run = leaves[i:j]
+            if len(run) == 1:
+                self._fused.append(run[0])
+                self._leaf_runs.setdefault(id(run[0]), [])
+            else:
+                tr = folded.pop(0) if folded else _FoldedTransform()
+                for leaf in run:
+                    self._leaf_runs.setdefault(id(leaf), []).append(
+                        len(self._runs))
+                self._runs.append((tr, run))
+                self._fold(len(self._runs) - 1)
+                self._fused.append(tr)
+            i = j
+
+        trs = self._fused
+        if len(trs) == 0:
+            trs = [self._null_transform]
+        self._shader_map.functions = [tr.shader_map() for tr in reversed(trs)]
+        self._shader_imap.functions = [tr.shader_imap() for tr in trs]
+
+    def _fold(self, index):
+        """Compute the matrix of a run of linear transforms.
+        """
+        folded, run = self._runs[index]
+        # The last transform in the run is applied first
+        m = np.eye(4)
+        for tr in reversed(run):
+            m = tr.map(m)
+        folded.matrix = m
+
+
+def _map_chain_block(transforms, coords, out, direction):
+    """Map a block of coordinates through a list of transforms, in order;
+    all but the first transform work in place on *out*.
+    """
+    if len(transforms) == 0:
+        vec4_block(coords, out)
+        return
+    for tr in transforms:
+        getattr(tr, '_%s_block' % direction)(coords, out)
+        coords = out
+
+
+class _FoldedTransform(MatrixTransform):
+    """MatrixTransform holding the product of a run of linear transforms in a
+    FusedChainTransform.
+
+    Such products can be singular (e.g. when a canvas has no size yet), so
+    the inverse falls back to the pseudo-inverse.
+    """
+
+    @property
+    def inv_matrix(self):
+        if self._inv_matrix is None:
+            m = self.matrix
+            try:
+                self._inv_matrix = np.linalg.inv(m)
+            except np.linalg.LinAlgError:
+                try:
+                    self._inv_matrix = np.linalg.pinv(m)
+                except np.linalg.LinAlgError:
+                    self._inv_matrix = np.empty((4, 4))
+                    self._inv_matrix.fill(np.nan)
+        return self._inv_matrix
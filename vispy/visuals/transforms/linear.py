@@ -8,10 +8,38 @@ import numpy as np
 
 from ...util import transforms
 from ...geometry import Rect
-from ._util import arg_to_vec4, as_vec4
+from ._util import arg_to_vec4, as_vec4, vec4_block
 from .base_transform import BaseTransform
 
 
+def _copy_w(coords, out):
+    """Copy the w coordinate of a block of coordinates (default 1).
+    """
+    if coords.shape[1] == 4:
+        if coords is not out:
+            out[:, 3] = coords[:, 3]
+    else:
+        out[:, 3] = 1
+
+
+def _dot_block(coords, matrix, out):
+    """Multiply a block of (n, D) coordinates by the first D rows of a
+    (transposed) 4x4 matrix, adding the last row for the default w=1.
+    """
+    d = coords.shape[1]
+    matrix = np.asarray(matrix, dtype=out.dtype)
+    # np.dot can only write to an output with the dtype of its inputs, and
+    # not to one of its inputs
+    if coords.dtype != out.dtype or np.may_share_memory(coords, out):
+        coords = coords.astype(out.dtype)
+    if out.flags.c_contiguous:
+        np.dot(coords, matrix[:d], out=out)
+    else:
+        out[...] = np.dot(coords, matrix[:d])
+    if d < 4:
+        out += matrix[3]
+
+
 class NullTransform(BaseTransform):
     """ Transform having no effect on coordinates (identity transform).
     """
@@ -44,6 +72,12 @@ class NullTransform(BaseTransform):
         """
         return coords
 
+    def _map_block(self, coords, out):
+        vec4_block(coords, out)
+
+    def _imap_block(self, coords, out):
+        vec4_block(coords, out)
+
     def __mul__(self, tr):
         return tr
 
@@ -133,6 +167,41 @@ class STTransform(BaseTransform):
         m[:, 3] = coords[:, 3]
         return m
 
+    def _map_block(self, coords, out):
+        scale = self._scale
+        translate = self._translate
+        d = coords.shape[1]
+        tmp = np.empty(len(out), dtype=out.dtype) if d == 4 else None
+        for i in range(3):
+            if i < d:
+                np.multiply(coords[:, i], scale[i], out=out[:, i])
+            else:
+                out[:, i] = 0
+            if tmp is None:
+                out[:, i] += translate[i]
+            elif translate[i] != 0:
+                np.multiply(coords[:, 3], translate[i], out=tmp)
+                out[:, i] += tmp
+        _copy_w(coords, out)
+
+    def _imap_block(self, coords, out):
+        scale = self._scale
+        translate = self._translate
+        d = coords.shape[1]
+        tmp = np.empty(len(out), dtype=out.dtype) if d == 4 else None
+        for i in range(3):
+            if i >= d:
+                out[:, i] = 0
+            elif coords is not out:
+                out[:, i] = coords[:, i]
+            if tmp is None:
+                out[:, i] -= translate[i]
+            elif translate[i] != 0:
+                np.multiply(coords[:, 3], translate[i], out=tmp)
+                out[:, i] -= tmp
+            out[:, i] /= scale[i]
+        _copy_w(coords, out)
+
     def shader_map(self):
         return self._shader_map
 
@@ -378,6 +447,12 @@ class MatrixTransform(BaseTransform):
         """
         return np.dot(coords, self.inv_matrix)
 
+    def _map_block(self, coords, out):
+        _dot_block(coords, self.matrix, out)
+
+    def _imap_block(self, coords, out):
+        _dot_block(coords, self.inv_matrix, out)
+
     def shader_map(self):
         fn = super(MatrixTransform, self).shader_map()
         fn['matrix'] = self.matrix  # uniform mat4
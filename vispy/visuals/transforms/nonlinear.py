@@ -6,7 +6,7 @@ from __future__ import division
 
 import numpy as np
 
-from ._util import arg_to_array, arg_to_vec4, as_vec4
+from ._util import arg_to_array, arg_to_vec4, as_vec4, vec4_block
 from .base_transform import BaseTransform
 from ... import gloo
 
@@ -84,15 +84,36 @@ class LogTransform(BaseTransform):
             if base[i] > 1.0:
                 ret[..., i] = np.log(coords[..., i]) / np.log(base[i])
             elif base[i] < -1.0:
-                ret[..., i] = -base[i] ** coords[..., i]
+                ret[..., i] = (-base[i]) ** coords[..., i]
             else:
                 ret[..., i] = coords[..., i]
+        for i in range(3, ret.shape[-1]):  # copy any further axes
+            ret[..., i] = coords[..., i]
         return ret
 
     @arg_to_array
     def imap(self, coords):
         return self.map(coords, -self.base)
 
+    def _map_block(self, coords, out, base=None):
+        if base is None:
+            base = self._base
+        vec4_block(coords, out)
+        tmp = None
+        for i in range(3):
+            col = out[:, i]
+            if base[i] > 1.0:
+                # np.log is much slower in place on a strided column
+                if tmp is None:
+                    tmp = np.empty(len(out), dtype=out.dtype)
+                np.log(col, out=tmp)
+                np.divide(tmp, np.log(base[i]), out=col)
+            elif base[i] < -1.0:
+                np.power(-base[i], col, out=col)
+
+    def _imap_block(self, coords, out):
+        self._map_block(coords, out, -self._base)
+
     def shader_map(self):
         fn = super(LogTransform, self).shader_map()
         fn['base'] = self.base  # uniform vec3
@@ -151,6 +172,24 @@ class PolarTransform(BaseTransform):
             ret[..., i] = coords[..., i]
         return ret
 
+    def _map_block(self, coords, out):
+        vec4_block(coords, out)
+        theta = out[:, 0]
+        r = out[:, 1]
+        y = np.sin(theta)
+        y *= r
+        np.cos(theta, out=theta)
+        theta *= r
+        r[:] = y
+
+    def _imap_block(self, coords, out):
+        vec4_block(coords, out)
+        x = out[:, 0]
+        y = out[:, 1]
+        theta = np.arctan2(x, y)
+        np.hypot(x, y, out=y)
+        x[:] = theta
+
 
 #class BilinearTransform(BaseTransform):
 #    # TODO
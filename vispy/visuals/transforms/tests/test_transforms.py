@@ -6,7 +6,8 @@ import numpy as np
 
 import vispy.visuals.transforms as tr
 from vispy.geometry import Rect
-from vispy.testing import run_tests_if_main
+from vispy.testing import run_tests_if_main, raises
+from vispy.visuals.transforms._util import as_vec4
 
 NT = tr.NullTransform
 ST = tr.STTransform
@@ -231,4 +232,91 @@ def test_inverse():
     #assert np.allclose(abs_pos, tr.inverse.map(tr.map(abs_pos))[:,:3])
 
 
+def test_fused_chain():
+    from vispy.visuals.transforms.chain import FusedChainTransform
+    s1 = ST(scale=(2, 3), translate=(1, 1))
+    s2 = ST(translate=(3, 4))
+    m = AT()
+    m.rotate(30, (0, 0, 1))
+    p = PT()
+    s3 = ST(scale=(0.5, 2))
+    inner = CT(m, s2)
+    chain = FusedChainTransform(s1, inner, p, s3, s3.inverse)
+    ref = CT(s1, m, s2, p, s3, s3.inverse)
+
+    # runs of linear transforms are folded, nested chains flattened
+    fused = chain.fused_transforms
+    assert len(fused) == 3
+    assert isinstance(fused[0], AT)
+    assert fused[1] is p
+    assert isinstance(fused[2], AT)
+    assert chain.transforms == [s1, inner, p, s3, s3.inverse]
+
+    pos = np.random.normal(size=(10, 2)) + 5
+    assert np.allclose(chain.map(pos), ref.map(pos))
+    assert np.allclose(chain.imap(pos), ref.imap(pos))
+
+    # changing a member refolds its run; the shader code stays the same
+    code = chain.shader_map().compile()
+    events = []
+    chain.changed.connect(lambda ev: events.append(ev))
+    s2.translate = (-1, 7)
+    m.rotate(10, (0, 0, 1))
+    s3.scale = (3, 3)
+    assert len(events) == 4  # s3.inverse forwards the change of s3
+    assert chain.fused_transforms[0] is fused[0]
+    assert chain.shader_map().compile() == code
+    assert np.allclose(chain.map(pos), ref.map(pos))
+
+    # changing the structure of a nested chain rebuilds the links
+    inner.append(tr.LogTransform(base=(2, 0, 0)))
+    ref = CT(s1, m, s2, inner.transforms[-1], p, s3, s3.inverse)
+    assert len(chain.fused_transforms) == 4
+    assert np.allclose(chain.map(pos), ref.map(pos), equal_nan=True)
+
+
+def test_map_bulk():
+    from vispy.visuals.transforms.chain import FusedChainTransform
+    m = np.random.normal(size=(4, 4))
+    m[:, 3] = (0, 0, 0, 1)
+    s = ST(scale=(2, -3, 4), translate=(1, 1, -5))
+    transforms = [
+        NT(),
+        s,
+        AT(m),
+        LT(base=(2, 0, 10)),
+        PT(),
+        CT(s, PT(), AT(m)),
+        CT(),
+        FusedChainTransform(s, AT(m), PT(), s, s),
+        s.inverse,
+    ]
+
+    np.random.seed(0)
+    pos = np.abs(np.random.normal(size=(100, 3))) + 0.5
+    for trn in transforms:
+        for func, bulk in ((trn.map, trn.map_bulk),
+                           (trn.imap, trn.imap_bulk)):
+            ref = func(as_vec4(pos))
+            for d in (2, 3):
+                assert np.allclose(bulk(pos[:, :d]),
+                                   func(as_vec4(pos[:, :d])))
+            out = bulk(pos)
+            assert out.dtype == np.float64 and out.shape == (100, 4)
+            assert np.allclose(out, ref)
+            out = bulk(pos, dtype=np.float32, chunk_size=7)
+            assert out.dtype == np.float32
+            assert np.allclose(out, ref, rtol=1e-4, atol=1e-4)
+            out = as_vec4(pos).astype(np.float32)
+            assert bulk(out, out=out, chunk_size=30) is out
+            assert np.allclose(out, ref, rtol=1e-4, atol=1e-4)
+
+    with raises(TypeError):
+        s.map_bulk(np.zeros((10, 5)))
+    with raises(ValueError):
+        s.map_bulk(pos, out=np.empty((10, 4)))
+    with raises(TypeError):
+        s.map_bulk(pos, out=np.empty((100, 4), dtype=int))
+
+
 run_tests_if_main()
@@ -209,6 +209,15 @@ class BaseVisual(Frozen):
     def draw(self):
         raise NotImplementedError(self)
 
+    def _draw_items(self):
+        """Return the list of visuals whose ``draw()`` methods draw this
+        visual, when called in order.
+
+        This allows the draw calls of different visuals to be queued and
+        sorted together (see ``SceneCanvas.render_queue``).
+        """
+        return [self]
+
     def attach(self, filt, view=None):
         """Attach a Filter to this visual.
 
@@ -322,6 +331,7 @@ class Visual(BaseVisual):
         if vshare is None:
             self._vshare.draw_mode = None
             self._vshare.index_buffer = None
+            self._vshare.instances = None
             if program is None:
                 self._vshare.program = MultiProgram(vcode, fcode)
             else:
@@ -425,6 +435,14 @@ class Visual(BaseVisual):
     def _index_buffer(self, buf):
         self._vshare.index_buffer = buf
 
+    @property
+    def _instances(self):
+        return self._vshare.instances
+
+    @_instances.setter
+    def _instances(self, n):
+        self._vshare.instances = n
+
     def draw(self):
         if not self.visible:
             return
@@ -437,10 +455,14 @@ class Visual(BaseVisual):
                              self)
         try:
             self._program.draw(self._vshare.draw_mode,
-                               self._vshare.index_buffer)
+                               self._vshare.index_buffer,
+                               instances=self._vshare.instances)
         except Exception:
             logger.warn("Error drawing visual %r" % self)
             raise
+        # Keep drawing until progressive texture uploads are done
+        if self._program.pending_upload_nbytes:
+            self.update()
 
     def _configure_gl_state(self):
         gloo.set_state(**self._vshare.gl_state)
@@ -587,6 +609,17 @@ class CompoundVisual(BaseVisual):
             if v.visible:
                 v.draw()
 
+    def _draw_items(self):
+        if not self.visible:
+            return []
+        if self._prepare_draw(view=self) is False:
+            return []
+        items = []
+        for v in self._subvisuals:
+            if v.visible:
+                items.extend(v._draw_items())
+        return items
+
     def _prepare_draw(self, view):
         pass
 
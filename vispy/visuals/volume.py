@@ -35,7 +35,7 @@ coordinates).
 
 from ..gloo import Texture3D, TextureEmulated3D, VertexBuffer, IndexBuffer
 from . import Visual
-from .shaders import Function
+from .colormap_lut import ColormapFunction
 from ..color import get_colormap
 
 import numpy as np
@@ -393,11 +393,18 @@ class VolumeVisual(Visual):
     emulate_texture : bool
         Use 2D textures to emulate a 3D texture. OpenGL ES 2.0 compatible,
         but has lower performance on desktop platforms.
+    cmap_lut : bool
+        If True, map values to colors with a lookup table texture of the
+        colormap (see ``vispy.visuals.colormap_lut``).
+    upload_budget : int | None
+        The maximum number of bytes of volume data to upload per draw, to
+        spread the upload of a large volume over several frames. Default
+        None (upload at once).
     """
 
     def __init__(self, vol, clim=None, method='mip', threshold=None, 
                  relative_step_size=0.8, cmap='grays',
-                 emulate_texture=False):
+                 emulate_texture=False, cmap_lut=False, upload_budget=None):
         
         tex_cls = TextureEmulated3D if emulate_texture else Texture3D
 
@@ -408,6 +415,7 @@ class VolumeVisual(Visual):
 
         # Set the colormap
         self._cmap = get_colormap(cmap)
+        self._cmap_function = ColormapFunction(cmap_lut)
 
         # Create gloo objects
         self._vertices = VertexBuffer()
@@ -424,6 +432,7 @@ class VolumeVisual(Visual):
             ], dtype=np.float32))
         self._tex = tex_cls((10, 10, 10), interpolation='linear', 
                             wrapping='clamp_to_edge')
+        self._tex.upload_budget = upload_budget
 
         # Create program
         Visual.__init__(self, vcode=VERT_SHADER, fcode="")
@@ -509,7 +518,8 @@ class VolumeVisual(Visual):
     @cmap.setter
     def cmap(self, cmap):
         self._cmap = get_colormap(cmap)
-        self.shared_program.frag['cmap'] = Function(self._cmap.glsl_map)
+        self.shared_program.frag['cmap'] = \
+            self._cmap_function.function(self._cmap)
         self.update()
 
     @property
@@ -545,7 +555,8 @@ class VolumeVisual(Visual):
         self.shared_program.frag = frag_dict[method]
         self.shared_program.frag['sampler_type'] = self._tex.glsl_sampler_type
         self.shared_program.frag['sample'] = self._tex.glsl_sample
-        self.shared_program.frag['cmap'] = Function(self._cmap.glsl_map)
+        self.shared_program.frag['cmap'] = \
+            self._cmap_function.function(self._cmap)
         self.update()
     
     @property
@@ -639,3 +650,5 @@ class VolumeVisual(Visual):
     def _prepare_draw(self, view):
         if self._need_vertex_update:
             self._create_vertex_data()
+
+        self._cmap_function.bind_texture()